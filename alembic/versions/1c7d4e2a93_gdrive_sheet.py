@@ -0,0 +1,20 @@
+revision = '1c7d4e2a93'
+down_revision = '2b6e0f5c47'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('gdrive_sheet',
+        sa.Column('key', sa.Text(), nullable=False),
+        sa.Column('content_hash', sa.Text(), nullable=False),
+        sa.Column('etag', sa.Text(), nullable=True),
+        sa.Column('last_modified', sa.Text(), nullable=True),
+        sa.Column('time', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade():
+    op.drop_table('gdrive_sheet')
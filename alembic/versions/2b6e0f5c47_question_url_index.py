@@ -0,0 +1,14 @@
+revision = '2b6e0f5c47'
+down_revision = '4d8c3b9a71'
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index('ix_question_url', 'question', ['url'])
+    op.create_index('ix_answer_question_id', 'answer', ['question_id'])
+
+
+def downgrade():
+    op.drop_index('ix_answer_question_id')
+    op.drop_index('ix_question_url')
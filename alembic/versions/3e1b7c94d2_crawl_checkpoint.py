@@ -0,0 +1,22 @@
+revision = '3e1b7c94d2'
+down_revision = '67fb47689b'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+def upgrade():
+    op.create_table('crawl_checkpoint',
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('crawl', sa.Text(), nullable=False),
+        sa.Column('params', sa.Text(), nullable=False),
+        sa.Column('unit', sa.Text(), nullable=False),
+        sa.Column('time', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('crawl', 'params', 'unit'),
+    )
+
+
+def downgrade():
+    op.drop_table('crawl_checkpoint')
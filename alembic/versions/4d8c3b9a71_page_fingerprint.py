@@ -0,0 +1,22 @@
+revision = '4d8c3b9a71'
+down_revision = '5a02d6e8c1'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+def upgrade():
+    op.create_table('page_fingerprint',
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('crawl', sa.Text(), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('fingerprint', sa.Text(), nullable=False),
+        sa.Column('time', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('crawl', 'url'),
+    )
+
+
+def downgrade():
+    op.drop_table('page_fingerprint')
@@ -0,0 +1,26 @@
+revision = '5a02d6e8c1'
+down_revision = '3e1b7c94d2'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('crawl_page',
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('kind', sa.Text(), nullable=False),
+        sa.Column('first_fetch', sa.DateTime(), nullable=True),
+        sa.Column('last_fetch', sa.DateTime(), nullable=True),
+        sa.Column('last_change', sa.DateTime(), nullable=True),
+        sa.Column('fetch_count', sa.Integer(), nullable=False),
+        sa.Column('change_count', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.Text(), nullable=True),
+        sa.Column('priority', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('url'),
+    )
+    op.create_index('ix_crawl_page_kind', 'crawl_page', ['kind'])
+
+
+def downgrade():
+    op.drop_index('ix_crawl_page_kind', 'crawl_page')
+    op.drop_table('crawl_page')
@@ -0,0 +1,43 @@
+""" Setup and helpers shared by the benchmark scripts. Importing this module
+puts the project on `sys.path`, so that the scripts can run from a
+checkout:
+
+    from common import PROJECT_ROOT, PAGES_DIR, measure
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+PAGES_DIR = PROJECT_ROOT / 'testsuite' / 'pages'
+
+
+def time_per_item(func, items, repeat):
+    """ Average seconds that `func` takes for an item, over `repeat` passes
+    through `items` """
+    t0 = time.perf_counter()
+    for n in range(repeat):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - t0) / (repeat * len(items))
+
+
+def memory_per_item(func, items):
+    """ Average peak of the python memory that `func` allocates for an item,
+    in bytes """
+    peak_list = []
+    for item in items:
+        tracemalloc.start()
+        func(item)
+        peak_list.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sum(peak_list) / len(peak_list)
+
+
+def measure(func, items, repeat):
+    """ (seconds, peak memory) per item, for `func` """
+    return (time_per_item(func, items, repeat), memory_per_item(func, items))
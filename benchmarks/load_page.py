@@ -0,0 +1,50 @@
+""" Time and memory per page for loading the recorded cdep.ro pages, with the
+old utf-16 opener and with `Scraper.load_page`.
+
+    $ python benchmarks/load_page.py
+"""
+
+from common import PAGES_DIR, measure
+
+from pyquery import PyQuery as pq
+from mptracker.scraper.common import Scraper
+
+URL = 'http://www.cdep.ro/pls/steno/steno.stenograma?ids=7277&idm=1'
+
+
+def load_utf16(content, url):
+    """ the page loader before `load_page` """
+    text = content.decode('iso-8859-2')
+    page = pq(text.encode('utf-16'), parser='html')
+    page.make_links_absolute(url)
+    return page
+
+
+def load_bytes(content, url):
+    return Scraper().load_page(content, url)
+
+
+class LazyLinksScraper(Scraper):
+    absolute_links = False
+
+
+def load_bytes_lazy_links(content, url):
+    return LazyLinksScraper().load_page(content, url)
+
+
+def main(repeat=10):
+    pages = [
+        p.read_bytes() for p in sorted(PAGES_DIR.iterdir())
+        if not p.name.endswith('.html')
+    ]
+    print("%d pages, %.1f kb on average" %
+          (len(pages), sum(len(p) for p in pages) / len(pages) / 1024))
+    for loader in [load_utf16, load_bytes, load_bytes_lazy_links]:
+        (seconds, peak) = measure(lambda content: loader(content, URL),
+                                  pages, repeat)
+        print("%-22s %7.2f ms/page %8.1f kb peak python memory/page"
+              % (loader.__name__, seconds * 1000, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
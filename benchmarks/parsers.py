@@ -0,0 +1,306 @@
+""" Benchmark every scraper parser on recorded cdep.ro pages, and compare
+with the numbers in `baseline.json`. For each parser it reports pages per
+second, the peak RSS of the process that ran it, and the memory that
+parsing a page allocates. The exit status is 1 if a parser got slower or
+hungrier than its baseline, beyond the tolerance.
+
+    $ python benchmarks/parsers.py
+    $ python benchmarks/parsers.py --save       # record a new baseline
+    $ python benchmarks/parsers.py --check      # as a regression gate
+
+The pages come from `testsuite/pages`, and `--archive` adds those of a
+page archive (see `mptracker.scraper.archive`):
+
+    $ python benchmarks/parsers.py --archive _data/pages
+
+A parser without pages is skipped, and one without a baseline is only
+measured; with `--check`, both count as failures.
+
+Timings depend on the machine, so record the baseline on the machine
+that runs the comparison.
+"""
+
+import re
+import sys
+import json
+import argparse
+import resource
+import multiprocessing
+from pathlib import Path
+from collections import namedtuple
+
+from common import PAGES_DIR, measure
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+CDEP = 'http://www.cdep.ro/pls/'
+
+# fraction by which each number may get worse before it's a regression
+TOLERANCE = {
+    'pages_per_second': 0.3,
+    'peak_rss_mb': 0.2,
+    'alloc_kb_per_page': 0.1,
+}
+
+
+class RecordedPages:
+    """ Page store for `ReplaySession`, filled from files or an archive """
+
+    def __init__(self, pages):
+        self.pages = dict(pages)
+
+    def latest(self, url):
+        return self.pages.get(url)
+
+
+def replay_session(pages):
+    from mptracker.scraper.archive import ReplaySession
+    return ReplaySession(RecordedPages(pages))
+
+
+def parse_vote(session, url):
+    from mptracker.scraper.common import url_args
+    from mptracker.scraper.votes import VoteScraper
+    return VoteScraper(session).scrape_vote(url_args(url).get('idv', type=int))
+
+
+def parse_transcript(session, url):
+    from mptracker.scraper.transcripts import TranscriptScraper
+    scraper = TranscriptScraper(session)
+    return list(scraper.iter_paragraphs(scraper.fetch_url(url), '00000/00'))
+
+
+def parse_question(session, url):
+    from mptracker.scraper.questions import QuestionScraper
+    return QuestionScraper(session=session).get_question(url)
+
+
+def parse_proposal(session, url):
+    from mptracker.scraper.common import url_args
+    from mptracker.scraper.proposals import ProposalScraper
+    args = url_args(url)
+    return ProposalScraper(session).scrape_proposal_page(
+        args.get('cam', type=int), args.get('idp', type=int))
+
+
+def parse_group(session, url):
+    from mptracker.scraper.common import url_args
+    from mptracker.scraper.groups import GroupScraper, GroupMembershipParser
+
+    class RecordedGroupMembershipParser(GroupMembershipParser):
+        # the recorded pages have the old headings, with diacritics
+        role_txt = "Funcţia"
+        person_txt = "Nume"
+
+    scraper = GroupScraper(session)
+    scraper.membership_parser_cls = RecordedGroupMembershipParser
+    year = url_args(url).get('leg', type=int)
+    return scraper.parse_group(scraper.fetch_url(url), url, year)
+
+
+def parse_committee(session, url):
+    from mptracker.scraper.common import url_args
+    from mptracker.scraper.committees import CommitteeScraper, Committee
+    scraper = CommitteeScraper(session)
+    args = url_args(url)
+    committee = Committee(
+        cdep_id=args.get('idc', type=int),
+        chamber_id=args.get('cam', type=int),
+        current_members=[],
+        former_members=[],
+    )
+    scraper.parse_committee_members(committee, scraper.fetch_url(url))
+    return committee
+
+
+def parse_people(session, url):
+    from mptracker.scraper.common import url_args
+    from mptracker.scraper.people import MandateScraper
+    year = url_args(url).get('leg', type=int)
+    return MandateScraper(session).fetch(year)
+
+
+# `url_pattern` picks the pages that are parsed; `fetched` the other pages
+# that the parser reads while at it
+Case = namedtuple('Case', ['name', 'url_pattern', 'parse', 'fetched'])
+Case.__new__.__defaults__ = ((),)
+
+CASES = [
+    Case('votes', r'/steno/evot\.nominal\?idv=\d+$', parse_vote),
+    Case('transcripts', r'/steno/steno\.stenograma\?', parse_transcript),
+    Case('questions', r'/parlam/interpelari\.detalii\?', parse_question),
+    Case('proposals', r'/proiecte/upl_pck\.proiect\?', parse_proposal),
+    Case('groups', r'/parlam/structura\.gp\?idg=', parse_group),
+    Case('committees', r'/parlam/structura\.co\?idc=', parse_committee),
+    Case('people', r'/parlam/structura\.de\?leg=\d+$', parse_people,
+         [r'/parlam/structura\.mp\?']),
+]
+
+# file name in `testsuite/pages` -> url it was recorded from
+RECORDED_FILES = [
+    (r'^evot\.nominal-(\d+)$',
+     CDEP + r'steno/evot.nominal?idv=\1'),
+    (r'^steno\.stenograma-(\d+)-(\d+)$',
+     CDEP + r'steno/steno.stenograma?ids=\1&idm=\2&idl=1'),
+    (r'^interpelari\.detalii-(\d+)$',
+     CDEP + r'parlam/interpelari.detalii?idi=\1&idl=1'),
+    (r'^proposal-(\d)-(\d+)$',
+     CDEP + r'proiecte/upl_pck.proiect?idp=\2&cam=\1'),
+    (r'^structura-group(\d+)$',
+     CDEP + r'parlam/structura.gp?idg=\1&leg=2012'),
+    # a committee's table of former members
+    (r'^table_committee_former_members\.html$',
+     CDEP + r'parlam/structura.co?idc=1&cam=2&leg=2012'),
+    (r'^structura\.de-(\d+)$',
+     CDEP + r'parlam/structura.de?leg=\1'),
+    # profile pages, which the people parser reads from the listing
+    (r'^structura\.mp-(\d+)-(\d+)$',
+     CDEP + r'parlam/structura.mp?idm=\1&cam=2&leg=\2'),
+]
+
+
+def recorded_pages(archive_path=None):
+    """ (url, content) of every recorded page """
+    pages = {}
+    for file_path in sorted(PAGES_DIR.iterdir()):
+        for pattern, url_template in RECORDED_FILES:
+            if re.match(pattern, file_path.name):
+                url = re.sub(pattern, url_template, file_path.name)
+                pages[url] = file_path.read_bytes()
+
+    if archive_path:
+        import sqlite3
+        from mptracker.scraper.archive import PageArchive
+        archive = PageArchive(archive_path)
+        patterns = [re.compile(pattern) for case in CASES
+                    for pattern in [case.url_pattern] + list(case.fetched)]
+        conn = sqlite3.connect(str(Path(archive_path) / 'index.sqlite'))
+        for (url,) in conn.execute('SELECT DISTINCT url FROM fetch'):
+            if url not in pages and any(p.search(url) for p in patterns):
+                pages[url] = archive.latest(url)
+
+    return pages
+
+
+def case_urls(case, pages):
+    return sorted(url for url in pages if re.search(case.url_pattern, url))
+
+
+def case_pages(case, pages):
+    """ The pages that `case` parses or fetches """
+    patterns = [case.url_pattern] + list(case.fetched)
+    return {
+        url: content for url, content in pages.items()
+        if any(re.search(pattern, url) for pattern in patterns)
+    }
+
+
+def measure_case(case_name, pages, repeat):
+    """ Run a case and return its numbers; meant for a fresh process, so
+    that the peak RSS is its own """
+    [case] = [case for case in CASES if case.name == case_name]
+    session = replay_session(pages)
+    url_list = case_urls(case, pages)
+
+    def parse(url):
+        return case.parse(session, url)
+
+    for url in url_list:
+        parse(url)
+    (seconds, alloc) = measure(parse, url_list, repeat)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'pages': len(url_list),
+        'pages_per_second': round(1 / seconds, 1),
+        'peak_rss_mb': round(peak_rss / 1024, 1),
+        'alloc_kb_per_page': round(alloc / 1024, 1),
+    }
+
+
+def run_case(case_name, pages, repeat):
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(measure_case, (case_name, pages, repeat))
+
+
+def regressions(result, baseline):
+    """ Descriptions of the numbers in `result` that are worse than
+    `baseline` by more than the tolerance """
+    rv = []
+    for key, tolerance in sorted(TOLERANCE.items()):
+        if key == 'pages_per_second':
+            worse = result[key] < baseline[key] * (1 - tolerance)
+        else:
+            worse = result[key] > baseline[key] * (1 + tolerance)
+        if worse:
+            rv.append("%s %.1f, baseline %.1f" %
+                      (key, result[key], baseline[key]))
+    return rv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--save', action='store_true',
+                        help="store the results as the new baseline")
+    parser.add_argument('--check', action='store_true',
+                        help="fail for parsers without pages or baseline")
+    parser.add_argument('--archive', help="also replay pages from this "
+                        "page archive")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('cases', nargs='*', help="only run these parsers")
+    args = parser.parse_args()
+
+    pages = recorded_pages(args.archive)
+    baseline = {}
+    if BASELINE_PATH.exists():
+        with BASELINE_PATH.open() as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+    print("%-12s %6s %10s %9s %12s" %
+          ("parser", "pages", "pages/s", "peak RSS", "alloc/page"))
+    for case in CASES:
+        if args.cases and case.name not in args.cases:
+            continue
+        if not case_urls(case, pages):
+            if args.check:
+                print("%-12s FAILED, no recorded pages" % case.name)
+                failed = True
+            else:
+                print("%-12s skipped, no recorded pages" % case.name)
+            continue
+
+        result = results[case.name] = \
+            run_case(case.name, case_pages(case, pages), args.repeat)
+        print("%-12s %6d %10.1f %6.1f mb %9.1f kb" % (
+            case.name, result['pages'], result['pages_per_second'],
+            result['peak_rss_mb'], result['alloc_kb_per_page']))
+
+        if args.save:
+            continue
+        if case.name not in baseline:
+            if args.check:
+                print("    FAILED, no baseline")
+                failed = True
+            continue
+        if baseline[case.name]['pages'] != result['pages']:
+            print("    baseline has %d pages, not comparing" %
+                  baseline[case.name]['pages'])
+            continue
+        for message in regressions(result, baseline[case.name]):
+            print("    REGRESSION: " + message)
+            failed = True
+
+    if args.save:
+        baseline.update(results)
+        with BASELINE_PATH.open('w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print("Saved the baseline to %s" % BASELINE_PATH)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
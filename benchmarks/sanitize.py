@@ -0,0 +1,64 @@
+""" Time per proposal page for sanitizing the cells of the recorded proposal
+pages, with the old `sanitize` and with `Sanitizer.clean_elements`.
+
+    $ python benchmarks/sanitize.py
+"""
+
+from common import PAGES_DIR, time_per_item
+
+from pyquery import PyQuery as pq
+from lxml import etree
+from lxml.html import fromstring, HTMLParser
+from lxml.html.clean import clean_html
+from mptracker.scraper.common import Scraper, Sanitizer
+
+URL = 'http://www.cdep.ro/pls/proiecte/upl_pck.proiect?idp=1&cam=2'
+
+
+def sanitize_old(html):
+    """ `sanitize` before `Sanitizer` """
+    if not html.strip():
+        return ''
+    parser = HTMLParser(encoding='utf-8')
+    try:
+        doc = fromstring(html, parser=parser)
+    except etree.ParserError:
+        return ''
+    cleaned = clean_html(doc)
+    doc = pq(cleaned)
+    if doc.find('body'):
+        return doc.find('body').html()
+    else:
+        return str(doc)
+
+
+def clean_old(cells):
+    rv = []
+    for td in cells:
+        html = pq(td).html()
+        rv.append(sanitize_old(html) if html else None)
+    return rv
+
+
+def clean_batch(cells, sanitizer=Sanitizer()):
+    return sanitizer.clean_elements(cells)
+
+
+def main(repeat=5):
+    loader = Scraper()
+    pages = [
+        list(loader.load_page(path.read_bytes(), URL)('td'))
+        for path in sorted(PAGES_DIR.glob('proposal-[12]-*'))
+    ]
+    for cells in pages:
+        assert clean_old(cells) == clean_batch(cells)
+    print("%d proposal pages, %d cells on average" %
+          (len(pages), sum(len(cells) for cells in pages) / len(pages)))
+
+    for clean in [clean_old, clean_batch]:
+        seconds = time_per_item(clean, pages, repeat)
+        print("%-12s %7.2f ms/page" % (clean.__name__, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+""" Time per table for reading membership tables, with the old row by row
+`TableParser` and with `TableParser.columns`.
+
+    $ python benchmarks/table_parser.py
+"""
+
+from common import PAGES_DIR, time_per_item
+
+from pyquery import PyQuery as pq
+from mptracker.scraper.common import (Scraper, MembershipParser, parse_date,
+                                      parse_profile_url)
+
+URL = 'http://www.cdep.ro/pls/parlam/structura.gp?idg=1'
+
+
+class OldTableRow:
+    """ `TableRow` before the header index """
+
+    def __init__(self, headings, tdpq, up_text_values):
+        self.headings = headings
+        self.tdpq = tdpq
+        self.text_values = [td.text() for td in self.tdpq.items()]
+        self.text_or_up_values = [
+            t or ut for t, ut in
+            zip(self.text_values, up_text_values)
+        ]
+
+    def _find_column(self, text):
+        for n, col_text in enumerate(self.headings):
+            if text in col_text:
+                return n
+
+    def td(self, header_text):
+        col = self._find_column(header_text)
+        assert col is not None, "No column named %r" % header_text
+        return self.tdpq.eq(col)
+
+    def text(self, header_text, inherit=False):
+        col = self._find_column(header_text)
+        if col is None:
+            return ""
+        values = self.text_or_up_values if inherit else self.text_values
+        return values[col]
+
+
+def iter_rows_old(table_root):
+    table = pq(table_root)
+    tr_iter = iter(table.children('tr').items())
+    headings = [td.text() for td in next(tr_iter).children().items()]
+    up_text_values = [""] * len(headings)
+    for tr in tr_iter:
+        table_row = OldTableRow(headings, tr.children('td'), up_text_values)
+        up_text_values = table_row.text_or_up_values
+        yield table_row
+
+
+class GroupTableParser(MembershipParser):
+
+    person_txt = "Nume"
+    date_fmt = 'ro_short_month'
+
+
+def parse_old(parser, table_root):
+    rv = []
+    for row in iter_rows_old(table_root):
+        name_link = row.td(parser.person_txt).find('a')
+        rv.append((
+            row.text(parser.role_txt, inherit=True),
+            name_link.text(),
+            parse_profile_url(name_link.attr('href')),
+            parse_date(row.text(parser.start_date_txt), parser.date_fmt),
+            parse_date(row.text(parser.end_date_txt), parser.date_fmt),
+        ))
+    return rv
+
+
+def parse_columns(parser, table_root):
+    return [
+        (m.role, m.mp_name, m.mp_ident, m.start_date, m.end_date)
+        for m in parser.parse_table(table_root)
+    ]
+
+
+def main(repeat=200):
+    page = Scraper().load_page(
+        (PAGES_DIR / 'table_ppdd_members.html').read_bytes(), URL)
+    table_root = page('table').eq(0)
+    parser = GroupTableParser()
+    parser.role_txt = "Funcţia"
+    assert parse_old(parser, table_root) == parse_columns(parser, table_root)
+    print("%d rows" % len(parse_old(parser, table_root)))
+
+    for parse in [parse_old, parse_columns]:
+        seconds = time_per_item(lambda table: parse(parser, table),
+                                [table_root], repeat)
+        print("%-14s %7.2f ms/table" % (parse.__name__, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
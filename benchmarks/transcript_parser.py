@@ -0,0 +1,78 @@
+""" Time and memory per chapter for parsing the recorded transcript pages,
+with the old pyquery parser and with `TranscriptScraper.iter_paragraphs`.
+
+    $ python benchmarks/transcript_parser.py
+"""
+
+from common import PAGES_DIR, measure
+
+from mptracker.scraper.common import Scraper, pqitems, parse_profile_url
+from mptracker.scraper.transcripts import TranscriptScraper, Transcript
+
+URL = 'http://www.cdep.ro/pls/steno/steno.stenograma?ids=7277&idm=%d'
+
+
+def parse_pyquery(scraper, page):
+    """ the transcript parser before `iter_paragraphs` """
+    paragraphs = []
+    paragraph_serial = 0
+    transcript = None
+
+    def save_paragraph():
+        transcript['text'] = "\n".join(transcript.pop('text_buffer'))
+        paragraphs.append(transcript)
+
+    for tr in pqitems(page, '#pageContent > table tr'):
+        for td in pqitems(tr, 'td'):
+            for paragraph in pqitems(td, 'p'):
+                speakers = paragraph('b font[color="#0000FF"]')
+                if speakers:
+                    if transcript:
+                        save_paragraph()
+                    paragraph_serial += 1
+                    link = speakers.parents('a')
+                    if not link:
+                        transcript = None
+                        continue
+                    (year, chamber, number) = \
+                        parse_profile_url(link.attr('href'))
+                    transcript = Transcript({
+                        'mandate_year': year,
+                        'mandate_chamber': chamber,
+                        'mandate_number': number,
+                        'speaker_name': scraper.trim_name(speakers.text()),
+                        'text_buffer': [],
+                        'serial': '07277/01-%03d' % paragraph_serial,
+                    })
+                elif transcript is not None:
+                    transcript['text_buffer'].append(paragraph.text())
+
+    if transcript:
+        save_paragraph()
+    return paragraphs
+
+
+def parse_streaming(scraper, page):
+    return list(scraper.iter_paragraphs(page, '07277/01'))
+
+
+def main(repeat=10):
+    loader = Scraper()
+    pages = [
+        loader.load_page(path.read_bytes(), URL % n)
+        for n, path in enumerate(
+            sorted(PAGES_DIR.glob('steno.stenograma-*')), 1)
+    ]
+    scraper = TranscriptScraper()
+    for page in pages:
+        assert parse_pyquery(scraper, page) == parse_streaming(scraper, page)
+    print("%d chapter pages" % len(pages))
+    for parser in [parse_pyquery, parse_streaming]:
+        (seconds, peak) = measure(lambda page: parser(scraper, page),
+                                  pages, repeat)
+        print("%-16s %7.2f ms/page %8.1f kb peak python memory/page"
+              % (parser.__name__, seconds * 1000, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
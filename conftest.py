@@ -1,5 +1,6 @@
 import pytest
 from mock import Mock
+from requests.utils import iter_slices
 
 
 class MockSession:
@@ -8,10 +9,14 @@ class MockSession:
         self.url_map = {}
         self.hooks = []
 
-    def get(self, url, hooks=[]):
+    def get(self, url, hooks=[], stream=False):
         file_path = self.url_map[url]
         content = file_path.bytes()
-        return Mock(content=content)
+        return Mock(
+            content=content,
+            status_code=200,
+            iter_content=lambda chunk_size: iter_slices(content, chunk_size),
+        )
 
 
 @pytest.fixture
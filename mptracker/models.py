@@ -234,7 +234,7 @@ class Question(db.Model):
     number = db.Column(db.Text)
     date = db.Column(db.Date, index=True)
     title = db.Column(db.Text)
-    url = db.Column(db.Text)
+    url = db.Column(db.Text, index=True)
     pdf_url = db.Column(db.Text)
     type = db.Column(db.Text)
     method = db.Column(db.Text)
@@ -279,7 +279,8 @@ class Answer(db.Model):
     id = db.Column(UUID, primary_key=True, default=random_uuid)
     pdf_url = db.Column(db.Text)
 
-    question_id = db.Column(UUID, db.ForeignKey('question.id'), nullable=False)
+    question_id = db.Column(UUID, db.ForeignKey('question.id'),
+                            nullable=False, index=True)
     question = db.relationship('Question',
         backref=db.backref('answer', uselist=False, cascade='all'))
 
@@ -621,6 +622,53 @@ class ScrapedProposalPage(db.Model):
     parsed = db.Column(db.Boolean, nullable=False, default=False)
 
 
+class CrawlCheckpoint(db.Model):
+    """ A unit of work done by a scraper run that hasn't finished yet """
+    __table_args__ = (
+        UniqueConstraint('crawl', 'params', 'unit'),
+    )
+    id = db.Column(UUID, primary_key=True, default=random_uuid)
+    crawl = db.Column(db.Text, nullable=False)
+    params = db.Column(db.Text, nullable=False)
+    unit = db.Column(db.Text, nullable=False)
+    time = db.Column(db.DateTime, default=lambda: datetime.utcnow())
+
+
+class CrawlPage(db.Model):
+    """ Fetch and change history of a page, for the recrawl scheduler """
+    url = db.Column(db.Text, primary_key=True)
+    kind = db.Column(db.Text, nullable=False, index=True)
+    first_fetch = db.Column(db.DateTime)
+    last_fetch = db.Column(db.DateTime)
+    last_change = db.Column(db.DateTime)
+    fetch_count = db.Column(db.Integer, nullable=False, default=0)
+    change_count = db.Column(db.Integer, nullable=False, default=0)
+    content_hash = db.Column(db.Text)
+    priority = db.Column(db.Float)
+
+
+class PageFingerprint(db.Model):
+    """ Fingerprint of a page as of the last successful run that
+    processed it """
+    __table_args__ = (
+        UniqueConstraint('crawl', 'url'),
+    )
+    id = db.Column(UUID, primary_key=True, default=random_uuid)
+    crawl = db.Column(db.Text, nullable=False)
+    url = db.Column(db.Text, nullable=False)
+    fingerprint = db.Column(db.Text, nullable=False)
+    time = db.Column(db.DateTime, default=lambda: datetime.utcnow())
+
+
+class GdriveSheet(db.Model):
+    """ Spreadsheet as of the last import that read it """
+    key = db.Column(db.Text, primary_key=True)
+    content_hash = db.Column(db.Text, nullable=False)
+    etag = db.Column(db.Text)
+    last_modified = db.Column(db.Text)
+    time = db.Column(db.DateTime, default=lambda: datetime.utcnow())
+
+
 class Text(db.Model):
     id = db.Column(UUID, primary_key=True, default=random_uuid)
     ns = db.Column(db.Text, nullable=False)
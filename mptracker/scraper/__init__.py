@@ -2,19 +2,18 @@ import logging
 from datetime import timedelta, date, datetime
 from collections import defaultdict
 import re
-import tempfile
 from contextlib import contextmanager
 import flask
 from flask.ext.script import Manager
 from psycopg2.extras import DateRange
 from path import path
 from pathlib import Path
-import requests
 from mptracker.scraper.common import get_cached_session, create_session, \
-                                     get_gdrive_csv, parse_interval
+                                     parse_interval, PROJECT_ROOT
+from mptracker.scraper.sheets import SheetImport
 from mptracker import models
 from mptracker.common import parse_date, model_to_dict, url_args, almost_eq, \
-                             generate_slug, iter_file, calculate_md5, temp_dir
+                             generate_slug, iter_file, calculate_md5
 from mptracker.patcher import TablePatcher
 
 logger = logging.getLogger(__name__)
@@ -67,6 +66,89 @@ def _get_config_cache_name():
     return flask.current_app.config.get('PAGE_CACHE')
 
 
+# session shared by all the commands of a `daily` or `daily_long` run
+_run_session = None
+
+
+def _create_session(cache_name=None, **kwargs):
+    """ `create_session` with the page cache, archive and throttle
+    settings from app config. Inside `_shared_session` this returns the
+    run's session instead, and the caller's settings don't apply. """
+    from mptracker.scraper.recrawl import PageTracker
+    if _run_session is not None:
+        ignored = dict(kwargs, cache_name=cache_name)
+        ignored = ["%s=%r" % (k, v) for k, v in sorted(ignored.items()) if v]
+        if ignored:
+            logger.warn("Using the run's shared session, ignoring %s",
+                        ", ".join(ignored))
+        return _run_session
+    config = flask.current_app.config
+    session = create_session(
+        cache_name=cache_name or _get_config_cache_name(),
+        revalidate=config.get('PAGE_CACHE_REVALIDATE', False),
+        archive_name=config.get('PAGE_ARCHIVE'),
+        archive_codec=config.get('PAGE_ARCHIVE_CODEC', 'gzip'),
+        throttle_floor=config.get('SCRAPER_THROTTLE_FLOOR'),
+        throttle_ceiling=config.get('SCRAPER_THROTTLE_CEILING'),
+        retries=config.get('SCRAPER_RETRIES', 3),
+        **kwargs
+    )
+    # remember which pages changed, for the recrawl scheduler
+    session.page_tracker = PageTracker()
+    session.hooks['response'].append(session.page_tracker)
+    return session
+
+
+@contextmanager
+def _shared_session(command_name, **kwargs):
+    """ Have every command called in the block use the same session, with
+    a pool of keep-alive connections. Stats are logged once, when the block
+    ends. """
+    global _run_session
+    config = flask.current_app.config
+    session = _create_session(
+        pool_size=config.get('SCRAPER_POOL_SIZE', 10),
+        **kwargs
+    )
+    _run_session = session
+    try:
+        yield session
+    finally:
+        _run_session = None
+        _save_page_tracker(session)
+        _log_http_stats(session, command_name)
+
+
+def _save_page_tracker(http_session):
+    page_tracker = getattr(http_session, 'page_tracker', None)
+    if page_tracker is not None:
+        page_tracker.save()
+
+
+def _log_http_stats(http_session, command_name):
+    """ Log the session's cache and telemetry summary, and save the
+    telemetry as JSON so that runs can be compared later. A run's
+    shared session is logged by `_shared_session`. """
+    if http_session is _run_session:
+        return
+    if hasattr(http_session, 'log_cache_stats'):
+        http_session.log_cache_stats()
+    telemetry = getattr(http_session, 'telemetry', None)
+    if telemetry is None:
+        return
+    telemetry.log_summary()
+    telemetry_dir = path(flask.current_app.config.get(
+        'SCRAPER_TELEMETRY_DIR',
+        PROJECT_ROOT / '_data' / 'telemetry',
+    ))
+    telemetry_dir.makedirs_p()
+    json_name = '%s-%s.json' % (
+        command_name,
+        datetime.now().strftime('%Y%m%d-%H%M%S'),
+    )
+    telemetry.save(telemetry_dir / json_name)
+
+
 @scraper_manager.command
 def get_questions(
         year=None,
@@ -74,17 +156,36 @@ def get_questions(
         cache_name=None,
         throttle=None,
         autoanalyze=False,
-        unanswered_reimport=False
+        unanswered_reimport=False,
+        replay=False,
+        stream=False,
+        scheduled=False,
+        incremental=False,
         ):
+    from itertools import chain
     from mptracker.scraper.questions import QuestionScraper
+    from mptracker.scraper.common import PageNotFoundError
     from mptracker.questions import ocr_question, ocr_answer
     from mptracker.policy import calculate_question
+    from mptracker.scraper.cursor import CrawlCursor
 
     if year is None:
         year = date.today().year
 
+    # each question is committed on its own, so an interrupted run can resume
+    cursor = CrawlCursor('get_questions', {
+        'year': int(year),
+        'existing_reimport': existing_reimport,
+        'unanswered_reimport': unanswered_reimport,
+        'scheduled': scheduled,
+        'incremental': incremental,
+    })
+
     if existing_reimport:
         known_urls = set()
+    elif incremental:
+        # new questions are looked up one by one, in the url index
+        known_urls = None
     else:
         if unanswered_reimport:
             url_query = (
@@ -99,15 +200,55 @@ def get_questions(
         known_urls = set(row[0] for row in url_query)
 
     def skip_question(url):
+        if known_urls is None:
+            query = models.Question.query.filter_by(url=url)
+            return models.db.session.query(query.exists()).scalar()
         return url in known_urls
 
-    http_session = create_session(cache_name=cache_name or
-                                       _get_config_cache_name(),
-                                  throttle=throttle and float(throttle),
-                                  counters=True)
+    http_session = _create_session(cache_name=cache_name,
+                                   throttle=throttle and float(throttle),
+                                   replay=replay)
     questions_scraper = QuestionScraper(session=http_session,
                                         skip=skip_question)
 
+    def iter_questions(url_iter):
+        for url in url_iter:
+            if cursor.is_done(url):
+                continue
+            try:
+                yield questions_scraper.get_question(url)
+            except PageNotFoundError:
+                logger.warn("Question page not found: %s", url)
+
+    if scheduled:
+        # fetch the questions picked by `plan_recrawl`, known or not
+        from mptracker.scraper.recrawl import scheduled_urls
+        question_iter = iter_questions(scheduled_urls('question'))
+
+    elif incremental:
+        question_iter = questions_scraper.run(int(year), stream=stream,
+                                              incremental=True,
+                                              cursor=cursor)
+        if unanswered_reimport:
+            # the index walk stops at known questions, so those that are
+            # still waiting for an answer get checked separately
+            unanswered_query = (
+                models.db.session.query(models.Question.url)
+                .outerjoin(models.Answer)
+                .filter(models.Answer.id == None)
+                .filter(models.Question.url != None)
+                .filter(models.Question.date >= date(int(year), 1, 1))
+                .filter(models.Question.date < date(int(year) + 1, 1, 1))
+            )
+            question_iter = chain(
+                question_iter,
+                iter_questions(row[0] for row in unanswered_query),
+            )
+
+    else:
+        question_iter = questions_scraper.run(int(year), stream=stream,
+                                              cursor=cursor)
+
     mandate_lookup = models.MandateLookup()
 
     question_patcher = TablePatcher(models.Question,
@@ -125,50 +266,52 @@ def get_questions(
 
     with question_patcher.process() as add, \
          answer_patcher.process() as add_answer:
-        for question in questions_scraper.run(int(year)):
-            person_list = question.pop('person')
-            question['addressee'] = '; '.join(question['addressee'])
-            answer_data = question.pop('answer', None)
-            result = add(question)
-            q = result.row
-
-            old_asked = {ask.mandate_id: ask for ask in q.asked}
-            for name, person_year, person_number in person_list:
-                mandate = mandate_lookup.find(name, person_year, person_number)
-                if mandate.id in old_asked:
-                    old_asked.pop(mandate.id)
-
-                else:
-                    ask = models.Ask(mandate=mandate)
-                    q.asked.append(ask)
-                    ask.set_meta('new', True)
-                    logger.info("Adding ask for %s: %s", q, mandate)
-                    new_ask_rows += 1
-
-            if result.is_changed:
-                changed_questions.append(q)
-
-            if old_asked:
-                logger.warn("Removing %d old 'ask' records", len(old_asked))
-                for ask in old_asked.values():
-                    models.db.session.delete(ask)
-
-            if answer_data:
-                assert q.id is not None
-                answer_data['question_id'] = q.id
-                answer_result = add_answer(answer_data)
-                if answer_result.is_changed:
-                    changed_answers.append(answer_result.row)
+        for question in question_iter:
+            with cursor.unit(question['url']):
+                person_list = question.pop('person')
+                question['addressee'] = '; '.join(question['addressee'])
+                answer_data = question.pop('answer', None)
+                result = add(question)
+                q = result.row
+
+                old_asked = {ask.mandate_id: ask for ask in q.asked}
+                for name, person_year, person_number in person_list:
+                    mandate = mandate_lookup.find(name, person_year,
+                                                  person_number)
+                    if mandate.id in old_asked:
+                        old_asked.pop(mandate.id)
+
+                    else:
+                        ask = models.Ask(mandate=mandate)
+                        q.asked.append(ask)
+                        ask.set_meta('new', True)
+                        logger.info("Adding ask for %s: %s", q, mandate)
+                        new_ask_rows += 1
+
+                if result.is_changed:
+                    changed_questions.append(q)
+
+                if old_asked:
+                    logger.warn("Removing %d old 'ask' records",
+                                len(old_asked))
+                    for ask in old_asked.values():
+                        models.db.session.delete(ask)
+
+                if answer_data:
+                    assert q.id is not None
+                    answer_data['question_id'] = q.id
+                    answer_result = add_answer(answer_data)
+                    if answer_result.is_changed:
+                        changed_answers.append(answer_result.row)
 
     models.db.session.commit()
+    cursor.finish()
+    _save_page_tracker(http_session)
 
     if new_ask_rows:
         logger.info("Added %d ask records", new_ask_rows)
 
-    counters = http_session.counters
-    logger.info("HTTP: %d kb in %s requests, %.2f seconds",
-                counters['bytes'] / 1024, counters['requests'],
-                counters['download_time'].total_seconds())
+    _log_http_stats(http_session, 'get_questions')
 
     if autoanalyze:
         logger.info("Scheduling jobs for %d questions", len(changed_questions))
@@ -191,14 +334,17 @@ def get_people(
     throttle=None,
     no_commit=False,
     add_people=False,
+    force=False,
 ):
     from mptracker.scraper.people import MandateScraper
+    from mptracker.scraper.fingerprint import PageFingerprints
 
-    http_session = create_session(
-        cache_name=cache_name or _get_config_cache_name(),
+    http_session = _create_session(
+        cache_name=cache_name,
         throttle=throttle and float(throttle),
     )
     mandate_scraper = MandateScraper(http_session)
+    mandate_scraper.fingerprints = PageFingerprints('get_people', force)
 
     mandate_patcher = TablePatcher(
         models.Mandate,
@@ -272,6 +418,8 @@ def get_people(
 
             add_mandate(row)
 
+    _log_http_stats(http_session, 'get_people')
+
     if new_people:
         logger.info("%d new people", new_people)
 
@@ -280,13 +428,14 @@ def get_people(
         models.db.session.rollback()
 
     else:
+        mandate_scraper.fingerprints.save()
         models.db.session.commit()
 
 
 @scraper_manager.command
-def get_pictures(year='2016'):
-    import subprocess
+def get_pictures(year='2016', workers=4, force=False):
     from sqlalchemy.orm import joinedload
+    from mptracker.scraper.pictures import update_pictures
 
     pictures_dir = Path(flask.current_app.static_folder) / 'pictures' / year
 
@@ -296,50 +445,19 @@ def get_pictures(year='2016'):
         .options(joinedload('person'))
     )
 
+    pictures = []
     for mandate in query:
         person = mandate.person
-        filename = '%s.jpg' % person.slug
-        fs_path = pictures_dir / filename
-
-        if fs_path.exists():
-            continue
-
         if mandate.picture_url is None:
             logger.warn("No picure available for %r", person.name_first_last)
             continue
         assert mandate.picture_url.lower().endswith('.jpg')
+        pictures.append((person.slug, mandate.picture_url))
 
-        logger.info("Downloading %r" % filename)
-
-        with temp_dir() as tmp:
-            tmp = Path(str(tmp))
-            orig_path = tmp / 'orig.jpg'
-            thumb_path = tmp / 'thumb.jpg'
-
-            resp = requests.get(mandate.picture_url, stream=True)
-            assert resp.status_code == 200
-            assert resp.headers['Content-Type'] == 'image/jpeg'
-
-            try:
-                with orig_path.open('wb') as f:
-                    for chunk in resp.iter_content(65536):
-                        f.write(chunk)
-            finally:
-                resp.close()
-
-            logger.info("Converting to thumbnail")
-            subprocess.check_call([
-                'convert',
-                str(orig_path),
-                '-geometry', '300x300^',
-                '-quality', '85',
-                str(thumb_path),
-            ])
-
-            logger.info("Uploading to gdrive")
-
-            thumb_path.rename(fs_path)
-            logger.info("Got photo: %r", filename)
+    http_session = create_session(pool_size=int(workers))
+    update_pictures(pictures, pictures_dir, http_session,
+                    workers=int(workers), force=force)
+    _log_http_stats(http_session, 'get_pictures')
 
 
 @scraper_manager.command
@@ -354,21 +472,28 @@ def get_groups(
         throttle=None,
         no_commit=False,
         year='2016',
+        force=False,
         ):
     year = int(year)
 
     from mptracker.scraper.groups import GroupScraper, Interval
+    from mptracker.scraper.fingerprint import PageFingerprints
 
-    http_session = create_session(cache_name=cache_name or
-                                       _get_config_cache_name(),
-                                  throttle=throttle and float(throttle))
+    http_session = _create_session(cache_name=cache_name,
+                                   throttle=throttle and float(throttle))
     group_scraper = GroupScraper(http_session)
+    group_scraper.fingerprints = PageFingerprints('get_groups', force)
 
     mandate_lookup = models.MandateLookup()
     mandate_intervals = defaultdict(list)
     term_interval = TERM_INTERVAL[year]
 
-    groups = list(group_scraper.fetch(year))
+    groups = group_scraper.fetch(year)
+    _log_http_stats(http_session, 'get_groups')
+    if groups is None:
+        logger.info("Group pages didn't change since the last run")
+        return
+
     independents = None
     if groups[0].is_independent:
         independents = groups[0]
@@ -413,7 +538,7 @@ def get_groups(
                 new_intervals.append(interval)
             elif interval_one.end > interval_two.start:
                 raise RuntimeError("Overlapping intervals; TODO add "
-                    " exception in GroupScraper.fetch_group")
+                    " exception in GroupScraper.parse_group")
 
         interval_list.extend(new_intervals)
         interval_list.sort()
@@ -479,6 +604,7 @@ def get_groups(
         models.db.session.rollback()
 
     else:
+        group_scraper.fingerprints.save()
         models.db.session.commit()
 
 
@@ -487,17 +613,25 @@ def get_committees(
     cache_name=None,
     throttle=None,
     no_commit=False,
+    force=False,
 ):
     from mptracker.scraper.committees import CommitteeScraper
+    from mptracker.scraper.fingerprint import PageFingerprints
 
     mandate_lookup = models.MandateLookup()
 
-    http_session = create_session(
-        cache_name=cache_name or _get_config_cache_name(),
+    http_session = _create_session(
+        cache_name=cache_name,
         throttle=throttle and float(throttle),
     )
 
     scraper = CommitteeScraper(http_session)
+    scraper.fingerprints = PageFingerprints('get_committees', force)
+    committees = scraper.fetch_committees()
+    if committees is None:
+        _log_http_stats(http_session, 'get_committees')
+        logger.info("Committee pages didn't change since the last run")
+        return
 
     committee_patcher = TablePatcher(
         models.MpCommittee,
@@ -513,7 +647,7 @@ def get_committees(
 
     with committee_patcher.process(remove=True) as add_committee, \
          membership_patcher.process(remove=True) as add_membership:
-        for committee in scraper.fetch_committees():
+        for committee in committees:
             res = add_committee(
                 committee.as_dict(['chamber_id', 'cdep_id', 'name']),
             )
@@ -545,29 +679,37 @@ def get_committees(
                     'mp_committee_id': mp_committee.id,
                 })
 
+    _log_http_stats(http_session, 'get_committees')
+
     if no_commit:
         logger.warn("Rolling back the transaction")
         models.db.session.rollback()
 
     else:
+        scraper.fingerprints.save()
         models.db.session.commit()
 
 
 @scraper_manager.command
-def committee_summaries(year=2016):
+def committee_summaries(year=2016, workers=None):
     from mptracker.scraper.committee_summaries import SummaryScraper
 
     patcher = TablePatcher(models.CommitteeSummary,
                            models.db.session,
                            key_columns=['pdf_url'])
 
-    summary_scraper = SummaryScraper(get_cached_session(),
-                                     get_cached_session('question-pdf'))
+    summary_scraper = SummaryScraper(
+        get_cached_session(),
+        get_cached_session('question-pdf'),
+        workers=workers and int(workers),
+    )
     records = summary_scraper.fetch_summaries(year, get_pdf_text=True)
 
     patcher.update(records)
 
     models.db.session.commit()
+    _log_http_stats(summary_scraper.session, 'committee_summaries')
+    _log_http_stats(summary_scraper.pdf_session, 'committee_summaries-pdf')
 
 
 @scraper_manager.command
@@ -575,31 +717,55 @@ def get_proposal_pages(
         throttle=None,
         cache_name=None,
         year=None,
+        replay=False,
+        stream=False,
+        scheduled=False,
+        rate=None,
+        workers=1,
+        processes=0,
+        batch_size=200,
         ):
-    from itertools import chain
     from mptracker.scraper.proposals import ProposalScraper
 
-    session = create_session(
-        cache_name=cache_name or _get_config_cache_name(),
+    session = _create_session(
+        cache_name=cache_name,
         throttle=float(throttle) if throttle else None,
+        rate=rate and float(rate),
+        replay=replay,
     )
-    scraper = ProposalScraper(session)
+    scraper = ProposalScraper(session, workers=int(workers),
+                              processes=int(processes))
 
-    db_page_date = {
-        (chamber, pk): date
-        for (chamber, pk, date) in models.db.session.query(
-            models.ScrapedProposalPage.chamber,
-            models.ScrapedProposalPage.pk,
-            models.ScrapedProposalPage.date,
-        )
-    }
+    if scheduled:
+        from mptracker.scraper.recrawl import scheduled_urls
+        keys = []
+        for url in scheduled_urls('proposal'):
+            args = url_args(url)
+            keys.append((args.get('cam', type=int), args.get('idp', type=int)))
 
-    for record in scraper.list_proposals(2, year):
-        old_date = db_page_date.get((record['chamber'], record['pk']))
-        if old_date and old_date >= record['date']:
-            continue
+    else:
+        db_page_date = {
+            (chamber, pk): date
+            for (chamber, pk, date) in models.db.session.query(
+                models.ScrapedProposalPage.chamber,
+                models.ScrapedProposalPage.pk,
+                models.ScrapedProposalPage.date,
+            )
+        }
 
-        get_proposal_single_page(record['chamber'], record['pk'], cache_name)
+        keys = []
+        for record in scraper.list_proposals(2, year, stream=stream):
+            old_date = db_page_date.get((record['chamber'], record['pk']))
+            if old_date and old_date >= record['date'] and not replay:
+                continue
+            keys.append((record['chamber'], record['pk']))
+
+    logger.info("Scraping %d proposal pages", len(keys))
+    _save_proposal_pages(scraper.scrape_proposal_pages(keys),
+                         int(batch_size))
+    scraper.close()
+    _save_page_tracker(session)
+    _log_http_stats(session, 'get_proposal_pages')
 
 
 @scraper_manager.command
@@ -607,37 +773,87 @@ def get_proposal_single_page(
         chamber,
         pk,
         cache_name=None,
+        replay=False,
     ):
-    import pickle
     from mptracker.scraper.proposals import ProposalScraper
 
-    session = create_session(cache_name=cache_name or _get_config_cache_name())
+    session = _create_session(cache_name=cache_name, replay=replay)
     scraper = ProposalScraper(session)
 
     pk = int(pk)
     chamber = int(chamber)
-
-    record = {
-        'pk': pk,
-        'chamber': chamber,
-        'date': date.today(),
-    }
-
-    old_rows = (
-        models.ScrapedProposalPage.query
-        .filter_by(chamber=chamber, pk=pk)
-    )
-    old_rows.delete()
-
     logger.info("scraping %d %d", chamber, pk)
     result = scraper.scrape_proposal_page(chamber, pk)
     if result is None:
         logger.warn("page not found %d %d", chamber, pk)
-        return
+    _replace_proposal_pages([(chamber, pk, result)])
+    _save_page_tracker(session)
+    _log_http_stats(session, 'get_proposal_single_page')
+
+
+def _save_proposal_pages(results, batch_size=200):
+    """ Store scraped proposal pages, in one transaction per `batch_size`
+    pages. `results` are (chamber, pk, result, error) tuples, as yielded by
+    `ProposalScraper.scrape_proposal_pages`; pages that failed keep their
+    old rows. """
+    counters = {'ok': 0, 'not_found': 0, 'failed': 0}
+    batch = []
+    for (chamber, pk, result, error) in results:
+        if error is not None:
+            logger.warn("failed to scrape %d %d: %r", chamber, pk, error)
+            counters['failed'] += 1
+            continue
+
+        if result is None:
+            logger.warn("page not found %d %d", chamber, pk)
+            counters['not_found'] += 1
+        else:
+            logger.info("scraped %d %d", chamber, pk)
+            counters['ok'] += 1
+
+        batch.append((chamber, pk, result))
+        if len(batch) >= batch_size:
+            _replace_proposal_pages(batch)
+            batch = []
+
+    if batch:
+        _replace_proposal_pages(batch)
 
-    scraped_page = models.ScrapedProposalPage(**record)
-    scraped_page.result = pickle.dumps(result)
-    models.db.session.add(scraped_page)
+    logger.info("Proposal pages: %d scraped, %d not found, %d failed",
+                counters['ok'], counters['not_found'], counters['failed'])
+
+
+def _replace_proposal_pages(batch):
+    """ Replace the `ScrapedProposalPage` rows for a list of (chamber, pk,
+    result) tuples and commit. A `result` of None only deletes the rows. """
+    import pickle
+
+    page_model = models.ScrapedProposalPage
+    pks_by_chamber = defaultdict(list)
+    for (chamber, pk, result) in batch:
+        pks_by_chamber[chamber].append(pk)
+
+    for chamber, pk_list in pks_by_chamber.items():
+        (
+            page_model.query
+            .filter_by(chamber=chamber)
+            .filter(page_model.pk.in_(pk_list))
+            .delete(synchronize_session=False)
+        )
+
+    today = date.today()
+    new_rows = [
+        {
+            'chamber': chamber,
+            'pk': pk,
+            'date': today,
+            'result': pickle.dumps(result),
+        }
+        for (chamber, pk, result) in batch
+        if result is not None
+    ]
+    if new_rows:
+        models.db.session.execute(page_model.__table__.insert(), new_rows)
 
     models.db.session.commit()
 
@@ -845,22 +1061,66 @@ def get_proposals(
 
 
 @scraper_manager.command
-def get_transcripts(start=None, n_sessions=1, cache_name=None, throttle=None):
+def get_transcripts(start=None, n_sessions=1, cache_name=None, throttle=None,
+                    max_in_flight=None, replay=False, processes=0):
     from mptracker.scraper.transcripts import TranscriptScraper
+    from mptracker.scraper.cursor import CrawlCursor
+
+    # each session is committed on its own, so an interrupted run can resume
+    cursor = CrawlCursor('get_transcripts',
+                         {'start': start, 'n_sessions': int(n_sessions)})
 
     if start is None:
-        max_serial = models.db.session.execute(
-            'select serial from transcript_chapter '
-            'order by serial desc limit 1').scalar()
-        start = int(max_serial.split('/')[0]) + 1
+        if cursor.done:
+            start = min(int(unit) for unit in cursor.done)
 
-    cdeppk = int(start) - 1
-    n_sessions = int(n_sessions)
+        else:
+            max_serial = models.db.session.execute(
+                'select serial from transcript_chapter '
+                'order by serial desc limit 1').scalar()
+            start = int(max_serial.split('/')[0]) + 1
+
+    cdeppk_list = [
+        cdeppk for cdeppk in
+        range(int(start), int(start) + int(n_sessions))
+        if not cursor.is_done(cdeppk)
+    ]
+    if not cdeppk_list:
+        logger.info("All sessions are already done")
 
     transcript_scraper = TranscriptScraper(
-            session=create_session(cache_name=cache_name or
-                                               _get_config_cache_name(),
-                                   throttle=throttle and float(throttle)))
+            session=_create_session(cache_name=cache_name,
+                                    throttle=throttle and float(throttle),
+                                    replay=replay),
+            processes=int(processes))
+
+    if max_in_flight and cdeppk_list:
+        logger.info("Fetching sessions %s to %s",
+                    cdeppk_list[0], cdeppk_list[-1])
+        session_list = transcript_scraper.fetch_sessions(
+            cdeppk_list,
+            max_in_flight=int(max_in_flight),
+        )
+        session_iter = zip(cdeppk_list, session_list)
+
+    elif transcript_scraper.processes:
+        def session_iter_pipeline():
+            for cdeppk in cdeppk_list:
+                logger.info("Fetching session %s", cdeppk)
+                yield (cdeppk,
+                       transcript_scraper.fetch_session_pipeline(cdeppk))
+
+        session_iter = session_iter_pipeline()
+
+    else:
+        def session_iter_serial():
+            for cdeppk in cdeppk_list:
+                logger.info("Fetching session %s", cdeppk)
+                # chapters are parsed and patched one page at a time
+                yield (cdeppk,
+                       transcript_scraper.fetch_session(cdeppk, stream=True))
+
+        session_iter = session_iter_serial()
 
     mandate_lookup = models.MandateLookup()
 
@@ -868,49 +1128,53 @@ def get_transcripts(start=None, n_sessions=1, cache_name=None, throttle=None):
                                       models.db.session,
                                       key_columns=['serial'])
 
-    with transcript_patcher.process() as add:
-        while n_sessions > 0:
-            n_sessions -= 1
-            cdeppk += 1
-            logger.info("Fetching session %s", cdeppk)
-            session_data = transcript_scraper.fetch_session(cdeppk)
-            if session_data is None:
-                logger.info("No content")
-                continue
-            for chapter in session_data.chapters:
-                chapter_row = (models.TranscriptChapter.query
-                                        .filter_by(serial=chapter.serial)
-                                        .first())
-                if chapter_row is None:
-                    chapter_row = models.TranscriptChapter(
-                        serial=chapter.serial)
-                    models.db.session.add(chapter_row)
-                    models.db.session.flush()
+    def add_session(session_data, add):
+        for chapter in session_data.chapters:
+            chapter_row = (models.TranscriptChapter.query
+                                    .filter_by(serial=chapter.serial)
+                                    .first())
+            if chapter_row is None:
+                chapter_row = models.TranscriptChapter(
+                    serial=chapter.serial)
+                models.db.session.add(chapter_row)
+                models.db.session.flush()
 
-                chapter_row.date = session_data.date
-                chapter_row.headline = chapter.headline
+            chapter_row.date = session_data.date
+            chapter_row.headline = chapter.headline
 
-                for paragraph in chapter.paragraphs:
-                    if paragraph['mandate_chamber'] != 2:
-                        continue
-                    try:
-                        mandate = mandate_lookup.find(
-                                paragraph['speaker_name'],
-                                paragraph['mandate_year'],
-                                paragraph['mandate_number'])
-                    except models.LookupError as e:
-                        logger.warn("at %s %s", paragraph['serial'], e)
-                        continue
-
-                    transcript_data = {
-                        'chapter_id': chapter_row.id,
-                        'text': paragraph['text'],
-                        'serial': paragraph['serial'],
-                        'mandate_id': mandate.id,
-                    }
-                    add(transcript_data)
+            for paragraph in chapter.paragraphs:
+                if paragraph['mandate_chamber'] != 2:
+                    continue
+                try:
+                    mandate = mandate_lookup.find(
+                            paragraph['speaker_name'],
+                            paragraph['mandate_year'],
+                            paragraph['mandate_number'])
+                except models.LookupError as e:
+                    logger.warn("at %s %s", paragraph['serial'], e)
+                    continue
+
+                transcript_data = {
+                    'chapter_id': chapter_row.id,
+                    'text': paragraph['text'],
+                    'serial': paragraph['serial'],
+                    'mandate_id': mandate.id,
+                }
+                add(transcript_data)
+
+    with transcript_patcher.process() as add:
+        for cdeppk, session_data in session_iter:
+            with cursor.unit(cdeppk):
+                if session_data is None:
+                    logger.info("No content for session %s", cdeppk)
+                else:
+                    add_session(session_data, add)
+
+    transcript_scraper.close()
+    _log_http_stats(transcript_scraper.session, 'get_transcripts')
 
     models.db.session.commit()
+    cursor.finish()
 
 
 @scraper_manager.command
@@ -1002,23 +1266,44 @@ def get_votes(
         throttle=None,
         no_commit=False,
         autoanalyze=False,
+        rate=None,
+        workers=1,
+        processes=0,
+        replay=False,
+        scheduled=False,
         ):
     from mptracker.scraper.votes import VoteScraper
+    from mptracker.scraper.cursor import CrawlCursor
+
+    days = int(days)
+
+    # each day is committed on its own, so an interrupted run can resume
+    cursor = None
+    if not no_commit:
+        cursor = CrawlCursor('get_votes', {
+            'start': start,
+            'days': days,
+            'scheduled': scheduled,
+        })
 
     if start is None:
-        start = models.db.session.execute(
-            'select date from voting_session '
-            'order by date desc limit 1').scalar() + ONE_DAY
+        if cursor is not None and cursor.done:
+            start = min(parse_date(unit) for unit in cursor.done)
+
+        else:
+            start = models.db.session.execute(
+                'select date from voting_session '
+                'order by date desc limit 1').scalar() + ONE_DAY
 
     else:
         start = parse_date(start)
 
-    days = int(days)
-
-    http_session = create_session(cache_name=cache_name or
-                                       _get_config_cache_name(),
-                                  throttle=throttle and float(throttle))
-    vote_scraper = VoteScraper(http_session)
+    http_session = _create_session(cache_name=cache_name,
+                                   throttle=throttle and float(throttle),
+                                   rate=rate and float(rate),
+                                   replay=replay)
+    vote_scraper = VoteScraper(http_session, workers=int(workers),
+                               processes=int(processes))
 
 
     voting_session_patcher = TablePatcher(
@@ -1040,13 +1325,13 @@ def get_votes(
 
     with voting_session_patcher.process() as add_voting_session:
         with vote_patcher.process() as add_vote:
-            the_date = start
-            while days > 0 and the_date < date.today():
+
+            def add_day(the_date):
                 logger.info("Scraping votes from %s", the_date)
 
-                today_has_votes = False
+                has_votes = False
                 for voting_session in vote_scraper.scrape_day(the_date):
-                    today_has_votes = True
+                    has_votes = True
                     record = model_to_dict(
                         voting_session,
                         ['cdeppk', 'subject', 'subject_html'],
@@ -1074,10 +1359,43 @@ def get_votes(
                         record['mandate_id'] = mandate.id
                         add_vote(record)
 
+                return has_votes
+
+            def iter_days():
+                if scheduled:
+                    # the days picked by `plan_recrawl`
+                    from mptracker.scraper.recrawl import scheduled_urls
+                    for url in scheduled_urls('vote_day'):
+                        yield datetime.strptime(url_args(url)['dat'],
+                                                '%Y%m%d').date()
+                    return
+
+                the_date = start
+                while days > 0 and the_date < date.today():
+                    yield the_date
+                    the_date += ONE_DAY
+
+            for the_date in iter_days():
+                if cursor is None:
+                    today_has_votes = add_day(the_date)
+
+                elif cursor.is_done(the_date):
+                    logger.info("Votes from %s are already done", the_date)
+                    today_has_votes = bool(
+                        models.VotingSession.query
+                        .filter_by(date=the_date)
+                        .count()
+                    )
+
+                else:
+                    with cursor.unit(the_date):
+                        today_has_votes = add_day(the_date)
+
                 if today_has_votes:
                     days -= 1
 
-                the_date += ONE_DAY
+    vote_scraper.close()
+    _log_http_stats(http_session, 'get_votes')
 
     if no_commit:
         logger.warn("Rolling back the transaction")
@@ -1085,6 +1403,8 @@ def get_votes(
 
     else:
         models.db.session.commit()
+        cursor.finish()
+        _save_page_tracker(http_session)
 
     if autoanalyze:
         from mptracker.votes import calculate_voting_session_loyalty
@@ -1094,7 +1414,54 @@ def get_votes(
 
 
 @scraper_manager.command
-def get_vote_controversy(no_commit=False):
+def backfill(
+        legislature=None,
+        processes=4,
+        chunk_days=30,
+        sessions=None,
+        session_chunk=20,
+        cache_name=None,
+        throttle=None,
+        ):
+    """ Load the votes of a whole legislature, and the transcripts of the
+    `sessions` range (e.g. 5000-5600), with a pool of processes """
+    from mptracker.scraper import bulkload
+
+    if legislature is None:
+        raise RuntimeError("Which legislature? e.g. --legislature 2008")
+    term = TERM_INTERVAL[int(legislature)]
+    end = min(term.upper or date.today(), date.today())
+
+    tasks = [
+        ('votes', chunk)
+        for chunk in bulkload.date_chunks(term.lower, end, int(chunk_days))
+    ]
+    if sessions:
+        (first, last) = [int(n) for n in sessions.split('-')]
+        tasks.extend(
+            ('transcripts', chunk)
+            for chunk in bulkload.number_chunks(first, last,
+                                                int(session_chunk))
+        )
+
+    logger.info("Backfilling %s in %d chunks", legislature, len(tasks))
+    failed = bulkload.run_pool(tasks, int(processes), {
+        'cache_name': cache_name,
+        'throttle': throttle and float(throttle),
+    })
+    bulkload.check_consistency(term.lower, end)
+
+    if failed:
+        logger.warn("%d chunks failed and can be run again: %s",
+                    len(failed), ', '.join('%s %r' % t for t in failed))
+
+
+@scraper_manager.command
+def get_vote_controversy(no_commit=False, force=False):
+    sheets = SheetImport('get_vote_controversy', [CONTROVERSY_CSV_KEY], force)
+    if not sheets.changed:
+        return
+
     controversy_patcher = TablePatcher(
         models.VotingSessionControversy,
         models.db.session,
@@ -1102,7 +1469,7 @@ def get_vote_controversy(no_commit=False):
     )
 
     with controversy_patcher.process(remove=True) as add_controversy:
-        for line in get_gdrive_csv(CONTROVERSY_CSV_KEY):
+        for line in sheets.reader(CONTROVERSY_CSV_KEY):
             add_controversy({
                 'title': line['title'],
                 'status': line['status'],
@@ -1118,11 +1485,24 @@ def get_vote_controversy(no_commit=False):
         models.db.session.rollback()
 
     else:
+        sheets.save()
         models.db.session.commit()
 
 
 @scraper_manager.command
-def get_position(no_commit=False):
+def get_position(no_commit=False, force=False):
+    sheets = SheetImport(
+        'get_position',
+        [
+            POSITION_PONTA2_CSV_KEY,
+            POSITION_PONTA3_CSV_KEY,
+            POSITION_BIROU_CDEP_CSV_KEY,
+        ],
+        force,
+    )
+    if not sheets.changed:
+        return
+
     name_search = models.NameSearch(
         models.Person.query
         .join(models.Mandate)
@@ -1137,8 +1517,8 @@ def get_position(no_commit=False):
     )
 
     def cabinet_position_row_iter():
-        yield from get_gdrive_csv(POSITION_PONTA2_CSV_KEY)
-        yield from get_gdrive_csv(POSITION_PONTA3_CSV_KEY)
+        yield from sheets.reader(POSITION_PONTA2_CSV_KEY)
+        yield from sheets.reader(POSITION_PONTA3_CSV_KEY)
 
     with position_patcher.process(remove=True) as add_position:
         for row in cabinet_position_row_iter():
@@ -1165,7 +1545,7 @@ def get_position(no_commit=False):
             else:
                 logger.warn("No matches for %r", name)
 
-        for row in get_gdrive_csv(POSITION_BIROU_CDEP_CSV_KEY):
+        for row in sheets.reader(POSITION_BIROU_CDEP_CSV_KEY):
             name = row['name'].strip()
             matches = name_search.find(name)
 
@@ -1185,11 +1565,16 @@ def get_position(no_commit=False):
         models.db.session.rollback()
 
     else:
+        sheets.save()
         models.db.session.commit()
 
 
 @scraper_manager.command
-def get_cabinet_party():
+def get_cabinet_party(force=False):
+    sheets = SheetImport('get_cabinet_party', [CABINET_PARTY_CSV_KEY], force)
+    if not sheets.changed:
+        return
+
     patcher = TablePatcher(
         models.CabinetMembership,
         models.db.session,
@@ -1199,7 +1584,7 @@ def get_cabinet_party():
     group_by_code = {g.short_name: g for g in models.MpGroup.query}
 
     with patcher.process(remove=True) as add_membership:
-        for row in get_gdrive_csv(CABINET_PARTY_CSV_KEY):
+        for row in sheets.reader(CABINET_PARTY_CSV_KEY):
             if row['legislature'] == '2016':
                 group = group_by_code[row['code']]
                 interval = parse_interval(row['start_date'], row['end_date'])
@@ -1208,11 +1593,16 @@ def get_cabinet_party():
                     'interval': interval,
                 })
 
+    sheets.save()
     models.db.session.commit()
 
 
 @scraper_manager.command
-def get_policy_domain():
+def get_policy_domain(force=False):
+    sheets = SheetImport('get_policy_domain', [POLICY_DOMAIN_CSV_KEY], force)
+    if not sheets.changed:
+        return
+
     patcher = TablePatcher(
         models.PolicyDomain,
         models.db.session,
@@ -1220,15 +1610,20 @@ def get_policy_domain():
     )
 
     with patcher.process(remove=True) as add_policy_domain:
-        for row in get_gdrive_csv(POLICY_DOMAIN_CSV_KEY):
+        for row in sheets.reader(POLICY_DOMAIN_CSV_KEY):
             add_policy_domain(row)
 
+    sheets.save()
     models.db.session.commit()
 
 
 @scraper_manager.command
-def get_stop_words():
+def get_stop_words(force=False):
     from mptracker.nlp import normalize_to_ascii
+    sheets = SheetImport('get_stop_words', [STOP_WORDS_CSV_KEY], force)
+    if not sheets.changed:
+        return
+
     patcher = TablePatcher(
         models.Stopword,
         models.db.session,
@@ -1236,14 +1631,15 @@ def get_stop_words():
     )
 
     with patcher.process(remove=True) as add_stop_word:
-        for row in get_gdrive_csv(STOP_WORDS_CSV_KEY):
+        for row in sheets.reader(STOP_WORDS_CSV_KEY):
             add_stop_word({'id': normalize_to_ascii(row['id'])})
 
+    sheets.save()
     models.db.session.commit()
 
 
 @scraper_manager.command
-def get_committee_attendance(no_commit=False):
+def get_committee_attendance(no_commit=False, force=False):
     # Nume
     # Comisia Permanenta 1
     # Numar sedinte comisia permanenta 1
@@ -1255,6 +1651,11 @@ def get_committee_attendance(no_commit=False):
     # Numar sedinte comisia speciala
     # Numar prezente deputat la sedintele comisiei speciale in 2013
 
+    sheets = SheetImport('get_committee_attendance',
+                         [COMMITTEE_ROLL_CALL_CSV_KEY], force)
+    if not sheets.changed:
+        return
+
     person_map = {
         p.name: p
         for p in (
@@ -1307,7 +1708,7 @@ def get_committee_attendance(no_commit=False):
         attendance_2013 = attended_2013 / meetings_2013
         return (committee, attendance_2013)
 
-    for row in get_gdrive_csv(COMMITTEE_ROLL_CALL_CSV_KEY):
+    for row in sheets.reader(COMMITTEE_ROLL_CALL_CSV_KEY):
         person = person_map[row['Nume'].strip()]
         mandate = (
             person.mandates
@@ -1344,6 +1745,7 @@ def get_committee_attendance(no_commit=False):
         models.db.session.rollback()
 
     else:
+        sheets.save()
         models.db.session.commit()
 
 
@@ -1462,11 +1864,30 @@ def assets(file_path, no_commit=False):
 
 
 
+@scraper_manager.command
+def plan_recrawl(budget=1000, vote_days=30):
+    """ Pick the known questions, proposals and vote days most likely to
+    have changed, within a budget of `budget` requests """
+    from mptracker.scraper.recrawl import plan
+    plan(int(budget), vote_days=int(vote_days))
+
+
+@scraper_manager.command
+def recrawl(budget=1000, vote_days=30, cache_name=None, throttle=None):
+    """ Plan a recrawl and fetch the pages on the schedule. New pages
+    are still found by the regular commands. """
+    plan_recrawl(budget, vote_days)
+    get_questions(cache_name=cache_name, throttle=throttle, scheduled=True)
+    get_proposal_pages(cache_name=cache_name, throttle=throttle,
+                       scheduled=True)
+    get_votes(cache_name=cache_name, throttle=throttle, scheduled=True)
+
+
 @scraper_manager.command
 def daily():
-    with log_to_sentry():
+    with log_to_sentry(), _shared_session('daily'):
         get_transcripts(n_sessions=20)
-        get_questions(autoanalyze=True)
+        get_questions(autoanalyze=True, incremental=True)
         get_votes(days=20, autoanalyze=True)
         get_groups()
         get_proposal_pages()
@@ -1475,7 +1896,7 @@ def daily():
 
 @scraper_manager.command
 def daily_long():
-    with log_to_sentry():
+    with log_to_sentry(), _shared_session('daily_long'):
         get_people()
         get_committees()
 
@@ -1495,10 +1916,14 @@ def daily_gdrive():
 
 
 @scraper_manager.command
-def update_person_xls():
+def update_person_xls(force=False):
     """ Update person contact data from csv"""
     from mptracker.scraper.person_xls import read_person_contact
 
+    sheets = SheetImport('update_person_xls', [MINORITIES_CSV_KEY], force)
+    if not sheets.changed:
+        return
+
     mandate_lookup = models.MandateLookup()
 
     people_data = []
@@ -1506,7 +1931,8 @@ def update_person_xls():
                                    models.db.session,
                                    key_columns=['year', 'cdep_number'])
     with mandate_patcher.process() as add:
-        for record in read_person_contact(MINORITIES_CSV_KEY):
+        for record in read_person_contact(
+                sheets.reader(MINORITIES_CSV_KEY)):
             mandate = mandate_lookup.find(record.pop('name'), record['year'],
                                           record['cdep_number'])
             person_data = record.pop('person_data')
@@ -1521,12 +1947,20 @@ def update_person_xls():
         for person_data in people_data:
             add(person_data)
 
+    sheets.save()
     models.db.session.commit()
 
 
 @scraper_manager.command
-def get_proposal_controversy():
+def get_proposal_controversy(force=False):
     """ Update proposal controversies from csv"""
+    sheets = SheetImport(
+        'get_proposal_controversy',
+        [PROPOSAL_CONTROVERSY_CSV_KEY],
+        force,
+    )
+    if not sheets.changed:
+        return
 
     def extract_proposal(url):
         return url[url.rfind('/') + 1:]
@@ -1535,7 +1969,7 @@ def get_proposal_controversy():
                                        models.db.session,
                                        key_columns=['proposal_id'])
     with controversy_patcher.process(remove=True) as add:
-        for row in get_gdrive_csv(PROPOSAL_CONTROVERSY_CSV_KEY):
+        for row in sheets.reader(PROPOSAL_CONTROVERSY_CSV_KEY):
             proposal_id = extract_proposal(row['Link MP Tracker'])
             if not proposal_id:
                 continue
@@ -1549,11 +1983,16 @@ def get_proposal_controversy():
             }
             add(record)
 
+    sheets.save()
     models.db.session.commit()
 
 
 @scraper_manager.command
-def get_member_count():
+def get_member_count(force=False):
+    sheets = SheetImport('get_member_count', [MEMBER_COUNT_CSV_KEY], force)
+    if not sheets.changed:
+        return
+
     patcher = TablePatcher(
         models.MemberCount,
         models.db.session,
@@ -1561,7 +2000,7 @@ def get_member_count():
     )
 
     with patcher.process(remove=True) as add_member_count:
-        for row in get_gdrive_csv(MEMBER_COUNT_CSV_KEY):
+        for row in sheets.reader(MEMBER_COUNT_CSV_KEY):
             short_name = row.pop('')
             for year, count in row.items():
                 add_member_count({
@@ -1570,11 +2009,20 @@ def get_member_count():
                     'count': int(count),
                 })
 
+    sheets.save()
     models.db.session.commit()
 
 
 @scraper_manager.command
-def get_committee_policy():
+def get_committee_policy(force=False):
+    sheets = SheetImport(
+        'get_committee_policy',
+        [COMMITTEE_POLICY_CSV_KEY],
+        force,
+    )
+    if not sheets.changed:
+        return
+
     patcher = TablePatcher(
         models.MpCommittee,
         models.db.session,
@@ -1582,7 +2030,7 @@ def get_committee_policy():
     )
 
     with patcher.process() as update_committee:
-        for row in get_gdrive_csv(COMMITTEE_POLICY_CSV_KEY):
+        for row in sheets.reader(COMMITTEE_POLICY_CSV_KEY):
             slug = row['policy']
 
             policy_id = None
@@ -1598,4 +2046,5 @@ def get_committee_policy():
                 create=False
             )
 
+    sheets.save()
     models.db.session.commit()
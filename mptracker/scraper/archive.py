@@ -0,0 +1,156 @@
+""" Compressed, content-addressed archive of fetched pages """
+
+import gzip
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from datetime import timedelta
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.hooks import dispatch_hook
+from path import path
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class GzipCodec:
+
+    suffix = '.gz'
+
+    def compress(self, data):
+        return gzip.compress(data)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
+
+
+class ZstdCodec:
+
+    suffix = '.zst'
+
+    def __init__(self):
+        import zstandard
+        self.compressor = zstandard.ZstdCompressor()
+        self.decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def decompress(self, data):
+        return self.decompressor.decompress(data)
+
+
+CODECS = {'gzip': GzipCodec, 'zstd': ZstdCodec}
+
+
+class PageArchive:
+    """ Each distinct page body is stored once, compressed, under
+    `objects/` and named after its sha1. `index.sqlite` records every
+    (url, fetch time, sha1) triple. New pages are compressed with
+    `compression`, one of `CODECS` (the `PAGE_ARCHIVE_CODEC` setting);
+    pages stored with another codec can still be read. """
+
+    def __init__(self, root, compression='gzip'):
+        self.root = path(root)
+        self.objects = self.root / 'objects'
+        self.objects.makedirs_p()
+        self.codec = CODECS[compression]()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.root / 'index.sqlite',
+                                    check_same_thread=False)
+        with self.lock, self.conn as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS fetch ('
+                         'url TEXT, fetched_at REAL, hash TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS fetch_url '
+                         'ON fetch (url, fetched_at)')
+
+    def _object_path(self, content_hash, suffix):
+        return self.objects / content_hash[:2] / (content_hash[2:] + suffix)
+
+    def _find_object(self, content_hash):
+        for codec_cls in CODECS.values():
+            object_path = self._object_path(content_hash, codec_cls.suffix)
+            if object_path.isfile():
+                if isinstance(self.codec, codec_cls):
+                    return (object_path, self.codec)
+                return (object_path, codec_cls())
+        return (None, None)
+
+    def save(self, url, content, fetched_at=None):
+        content_hash = hashlib.sha1(content).hexdigest()
+        (object_path, _) = self._find_object(content_hash)
+        if object_path is None:
+            object_path = self._object_path(content_hash, self.codec.suffix)
+            object_path.parent.makedirs_p()
+            tmp_path = object_path + '.tmp-%d' % threading.get_ident()
+            tmp_path.write_bytes(self.codec.compress(content))
+            tmp_path.rename(object_path)
+
+        with self.lock, self.conn as conn:
+            conn.execute('INSERT INTO fetch VALUES (?, ?, ?)',
+                         (url, fetched_at or time.time(), content_hash))
+        return content_hash
+
+    def latest_hash(self, url):
+        with self.lock, self.conn as conn:
+            row = conn.execute('SELECT hash FROM fetch WHERE url = ? '
+                               'ORDER BY fetched_at DESC LIMIT 1',
+                               (url,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, content_hash):
+        (object_path, codec) = self._find_object(content_hash)
+        if object_path is None:
+            return None
+        return codec.decompress(object_path.bytes())
+
+    def latest(self, url):
+        content_hash = self.latest_hash(url)
+        if content_hash is None:
+            return None
+        return self.load(content_hash)
+
+    def create_hook(self):
+        """ Response hook that archives every page downloaded from the
+        network. Streamed pages are archived once they have been read. """
+        from mptracker.scraper.common import with_content
+
+        def hook(response, **extra):
+            if response.status_code == 200 and \
+                    not getattr(response, 'from_cache', False):
+                # archive under the requested url, not the redirect target
+                first = response.history[0] if response.history else response
+                with_content(response,
+                             lambda content: self.save(first.url, content))
+            return response
+        return hook
+
+
+class ReplaySession:
+    """ Stand-in for `requests.Session` that serves the most recent
+    archived copy of each page, and 404 for pages that were never
+    fetched. """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.hooks = {'response': []}
+
+    def get(self, url, hooks=None, **kwargs):
+        content = self.archive.latest(url)
+        response = requests.Response()
+        response.url = url
+        response.headers = CaseInsensitiveDict()
+        response.elapsed = timedelta()
+        response.from_cache = True
+        if content is None:
+            logger.warn("Not in archive: %s", url)
+            response.status_code = 404
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = content
+        response._content_consumed = True
+        return dispatch_hook('response', hooks or self.hooks, response)
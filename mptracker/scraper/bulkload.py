@@ -0,0 +1,338 @@
+""" Load whole legislatures with a pool of processes, through bulk inserts """
+
+import logging
+from datetime import timedelta
+from multiprocessing import Pool
+from sqlalchemy import func
+from mptracker import models
+from mptracker.common import model_to_dict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ONE_DAY = timedelta(days=1)
+
+# set up in each worker process by `_init_worker`
+_worker = {}
+
+
+def date_chunks(start, end, chunk_days):
+    """ Split the days from `start` up to `end` into ranges of
+    `chunk_days` """
+    while start < end:
+        chunk_end = min(start + timedelta(days=chunk_days), end)
+        yield (start, chunk_end)
+        start = chunk_end
+
+
+def number_chunks(first, last, chunk_size):
+    """ Split the numbers `first` to `last`, inclusive, into ranges of
+    `chunk_size` """
+    for chunk_first in range(first, last + 1, chunk_size):
+        yield (chunk_first, min(chunk_first + chunk_size - 1, last))
+
+
+def load_votes(date_range):
+    """ Scrape the votes from a range of days and insert the voting
+    sessions we don't have yet """
+    from mptracker.scraper.votes import VoteScraper
+    (start, end) = date_range
+    scraper = VoteScraper(_worker['http_session'])
+    mandate_lookup = models.MandateLookup()
+    proposal_ids = dict(
+        models.db.session.query(
+            models.Proposal.cdeppk_cdep,
+            models.Proposal.id,
+        )
+        .filter(models.Proposal.cdeppk_cdep != None)
+    )
+    known = set(
+        row[0] for row in
+        models.db.session.query(models.VotingSession.cdeppk)
+        .filter(models.VotingSession.date >= start)
+        .filter(models.VotingSession.date < end)
+    )
+
+    voting_session_rows = []
+    vote_rows = []
+    day = start
+    while day < end:
+        for voting_session in scraper.scrape_day(day):
+            if voting_session.cdeppk in known:
+                continue
+            record = model_to_dict(
+                voting_session,
+                ['cdeppk', 'subject', 'subject_html'],
+            )
+            record['id'] = models.random_uuid()
+            record['date'] = day
+            proposal_cdeppk = voting_session.proposal_cdeppk
+            record['proposal_id'] = (proposal_ids.get(proposal_cdeppk)
+                                     if proposal_cdeppk else None)
+            record['final'] = bool("vot final" in record['subject'].lower())
+            voting_session_rows.append(record)
+
+            for vote in voting_session.votes:
+                mandate = mandate_lookup.find(
+                    vote.mandate_name,
+                    vote.mandate_year,
+                    vote.mandate_number,
+                )
+                vote_rows.append({
+                    'id': models.random_uuid(),
+                    'choice': vote.choice,
+                    'voting_session_id': record['id'],
+                    'mandate_id': mandate.id,
+                })
+        day += ONE_DAY
+
+    if voting_session_rows:
+        models.db.session.execute(models.VotingSession.__table__.insert(),
+                                  voting_session_rows)
+    if vote_rows:
+        models.db.session.execute(models.Vote.__table__.insert(), vote_rows)
+    models.db.session.commit()
+    return {'voting_sessions': len(voting_session_rows),
+            'votes': len(vote_rows)}
+
+
+def _serial_range(query, column, first, last):
+    # serials start with the zero-padded session number
+    return (
+        query
+        .filter(column >= '%05d/' % first)
+        .filter(column < '%05d/' % (last + 1))
+    )
+
+
+def load_transcripts(session_range):
+    """ Scrape a range of transcript sessions and insert the chapters and
+    paragraphs we don't have yet """
+    from mptracker.scraper.transcripts import TranscriptScraper
+    (first, last) = session_range
+    scraper = TranscriptScraper(session=_worker['http_session'])
+    mandate_lookup = models.MandateLookup()
+    known_chapters = dict(_serial_range(
+        models.db.session.query(
+            models.TranscriptChapter.serial,
+            models.TranscriptChapter.id,
+        ),
+        models.TranscriptChapter.serial, first, last,
+    ))
+    known_transcripts = set(row[0] for row in _serial_range(
+        models.db.session.query(models.Transcript.serial),
+        models.Transcript.serial, first, last,
+    ))
+
+    chapter_rows = []
+    transcript_rows = []
+    for cdeppk in range(first, last + 1):
+        session_data = scraper.fetch_session(cdeppk)
+        if session_data is None:
+            continue
+
+        for chapter in session_data.chapters:
+            chapter_id = known_chapters.get(chapter.serial)
+            if chapter_id is None:
+                chapter_id = models.random_uuid()
+                chapter_rows.append({
+                    'id': chapter_id,
+                    'serial': chapter.serial,
+                    'date': session_data.date,
+                    'headline': chapter.headline,
+                })
+
+            for paragraph in chapter.paragraphs:
+                if paragraph['mandate_chamber'] != 2:
+                    continue
+                if paragraph['serial'] in known_transcripts:
+                    continue
+                try:
+                    mandate = mandate_lookup.find(
+                            paragraph['speaker_name'],
+                            paragraph['mandate_year'],
+                            paragraph['mandate_number'])
+                except models.LookupError as e:
+                    logger.warn("at %s %s", paragraph['serial'], e)
+                    continue
+
+                transcript_rows.append({
+                    'id': models.random_uuid(),
+                    'chapter_id': chapter_id,
+                    'text': paragraph['text'],
+                    'serial': paragraph['serial'],
+                    'mandate_id': mandate.id,
+                })
+
+    if chapter_rows:
+        models.db.session.execute(
+            models.TranscriptChapter.__table__.insert(), chapter_rows)
+    if transcript_rows:
+        models.db.session.execute(
+            models.Transcript.__table__.insert(), transcript_rows)
+    models.db.session.commit()
+    return {'chapters': len(chapter_rows),
+            'transcripts': len(transcript_rows)}
+
+
+TASKS = {
+    'votes': load_votes,
+    'transcripts': load_transcripts,
+}
+
+
+def _init_worker(session_kwargs):
+    """ Each worker process gets its own app, with its own database
+    connections, and its own HTTP session """
+    from mptracker.app import create_app
+    from mptracker.scraper import _create_session
+    app = create_app()
+    app.app_context().push()
+    _worker['http_session'] = _create_session(**session_kwargs)
+
+
+def _run_task(task):
+    (kind, chunk) = task
+    try:
+        return (kind, chunk, TASKS[kind](chunk), None)
+    except Exception as e:
+        logger.exception("%s %r failed", kind, chunk)
+        models.db.session.rollback()
+        return (kind, chunk, None, repr(e))
+
+
+def run_pool(tasks, processes, session_kwargs):
+    """ Run (kind, chunk) tasks across a pool of processes. Returns the
+    tasks that failed, so they can be run again. """
+    failed = []
+    totals = {}
+    with Pool(processes, _init_worker, (session_kwargs,)) as pool:
+        for (kind, chunk, counts, error) in \
+                pool.imap_unordered(_run_task, tasks):
+            if error is not None:
+                logger.warn("Failed %s %r: %s", kind, chunk, error)
+                failed.append((kind, chunk))
+                continue
+            logger.info("Loaded %s %r: %s", kind, chunk, ', '.join(
+                '%d %s' % (n, name) for name, n in sorted(counts.items())))
+            for name, n in counts.items():
+                totals[name] = totals.get(name, 0) + n
+
+    for name, n in sorted(totals.items()):
+        logger.info("Total: %d new %s", n, name)
+    return failed
+
+
+def _referencing_columns(table):
+    """ Columns, in any table, with a foreign key to `table` """
+    return [
+        other_column
+        for other_table in models.db.metadata.sorted_tables
+        for other_column in other_table.columns
+        if any(fk.references(table) for fk in other_column.foreign_keys)
+    ]
+
+
+def remove_duplicates(model, column, children=()):
+    """ Keep a single row for each value of `column`: the one with the most
+    `children` rows, then the most filled-in columns. `children` are
+    (model, foreign key column) pairs of rows that go away along with the
+    duplicates; every other reference is moved to the row that's kept.
+    Returns the number of rows removed. """
+    table = model.__table__
+    child_keys = set(
+        (child_model.__table__.name, foreign_key.key)
+        for (child_model, foreign_key) in children
+    )
+
+    def completeness(row):
+        n_children = sum(
+            child_model.query.filter(foreign_key == row.id).count()
+            for (child_model, foreign_key) in children
+        )
+        n_filled = sum(1 for value in row if value not in (None, ''))
+        return (-n_children, -n_filled, row.id)
+
+    duplicates = (
+        models.db.session.query(column)
+        .group_by(column)
+        .having(func.count(model.id) > 1)
+        .all()
+    )
+    n_removed = 0
+    for (value,) in duplicates:
+        rows = sorted(
+            models.db.session.execute(
+                table.select().where(column == value)
+            ),
+            key=completeness,
+        )
+        keep_id = rows[0].id
+        remove_ids = [row.id for row in rows[1:]]
+
+        for ref_column in _referencing_columns(table):
+            ref_table = ref_column.table
+            if (ref_table.name, ref_column.name) in child_keys:
+                query = ref_table.delete()
+            else:
+                query = ref_table.update().values({ref_column.name: keep_id})
+            models.db.session.execute(
+                query.where(ref_column.in_(remove_ids))
+            )
+        models.db.session.execute(
+            table.delete().where(table.c.id.in_(remove_ids))
+        )
+        n_removed += len(remove_ids)
+    return n_removed
+
+
+def count_out_of_order(start, end):
+    """ Voting sessions between `start` and `end` whose date is earlier
+    than that of a session with a lower cdeppk """
+    query = (
+        models.db.session.query(
+            models.VotingSession.cdeppk,
+            models.VotingSession.date,
+        )
+        .filter(models.VotingSession.date >= start)
+        .filter(models.VotingSession.date < end)
+        .order_by(models.VotingSession.cdeppk)
+    )
+    n = 0
+    latest = None
+    for (cdeppk, the_date) in query:
+        if latest is not None and the_date < latest:
+            n += 1
+        else:
+            latest = the_date
+    return n
+
+
+def check_consistency(start, end):
+    """ Final pass after the workers are done: voting sessions and
+    transcript serials must be unique, and voting sessions should be
+    numbered in date order """
+    n_voting_sessions = remove_duplicates(
+        models.VotingSession,
+        models.VotingSession.cdeppk,
+        [(models.Vote, models.Vote.voting_session_id),
+         (models.GroupVote, models.GroupVote.voting_session_id)],
+    )
+    n_chapters = remove_duplicates(
+        models.TranscriptChapter,
+        models.TranscriptChapter.serial,
+        [(models.Transcript, models.Transcript.chapter_id)],
+    )
+    n_transcripts = remove_duplicates(
+        models.Transcript,
+        models.Transcript.serial,
+    )
+    models.db.session.commit()
+    logger.info("Removed %d duplicate voting sessions, %d chapters and "
+                "%d transcripts", n_voting_sessions, n_chapters,
+                n_transcripts)
+
+    n_out_of_order = count_out_of_order(start, end)
+    if n_out_of_order:
+        logger.warn("%d voting sessions are out of date order",
+                    n_out_of_order)
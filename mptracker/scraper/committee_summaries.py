@@ -1,11 +1,19 @@
+import os
 import re
+import logging
 from datetime import datetime
 import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
 from pyquery import PyQuery as pq
+from requests import HTTPError
 from flask import json
 from path import path
-from mptracker.scraper.common import (Scraper, pqitems, get_cached_session)
+from mptracker.scraper.common import (Scraper, pqitems, get_cached_session,
+                                      PageNotFoundError, FetchError)
+
+logger = logging.getLogger(__name__)
 
 
 with (path(__file__).parent / 'committee_names.json').open('rb') as f:
@@ -27,19 +35,62 @@ class SummaryScraper(Scraper):
                         '?nrc={offset}&an={year}&tip=1&sz=1')
     pdf_url_pattern = re.compile(r'cdep\.ro/comisii/(?P<committee>[^/]+)/pdf/')
 
-    def __init__(self, session=None, pdf_session=None):
-        super().__init__(session)
+    pdf_to_text = staticmethod(pdf_to_text)
+
+    def __init__(self, session=None, pdf_session=None, workers=None):
+        super().__init__(session, workers=workers or os.cpu_count() or 1)
         self.pdf_session = pdf_session or self.session
 
+    def get_pdf_text(self, pdf_url):
+        resp = self.pdf_session.get(pdf_url)
+        resp.raise_for_status()
+        return self.pdf_to_text(resp.content)
+
+    def with_text(self, row, future):
+        """ The row, with the text of its PDF. A PDF that can't be
+        downloaded costs only its own text. """
+        try:
+            text = future.result()
+        except (HTTPError, PageNotFoundError, FetchError) as e:
+            logger.warn("Can't get the text of %s: %s", row['pdf_url'], e)
+            text = None
+        return dict(row, text=text)
+
     def fetch_summaries(self, year=2013, get_pdf_text=False):
-        from collections import defaultdict
+        """ Yield the summaries listed for `year`. With `get_pdf_text`,
+        each row also gets the text of its PDF: `workers` threads download
+        the PDFs and run `pdftotext` on them, and the rows come out in
+        listing order. """
+        rows = self.iter_listing(year)
+        if not get_pdf_text:
+            yield from rows
+            return
+
+        # rows waiting for their text; enough to keep every worker busy,
+        # few enough not to hold hundreds of PDFs in memory
+        window = 2 * self.workers
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for row in rows:
+                future = pool.submit(self.get_pdf_text, row['pdf_url'])
+                pending.append((row, future))
+                if len(pending) >= window:
+                    (row, future) = pending.popleft()
+                    yield self.with_text(row, future)
+
+            for (row, future) in pending:
+                yield self.with_text(row, future)
+
+    def iter_listing(self, year):
+        """ Parse the listing pages for `year`, yielding a row for each
+        summary as soon as its page is parsed """
         for p in range(50):
             page_url = self.listing_page_url.format(offset=100*p, year=year)
             page = self.fetch_url(page_url)
             i_el = list(pqitems(page, ":contains('înregistrări')"))[-1]
             table = list(i_el.parents('table'))[-1]
             empty_page = True
-            table_rows = pqitems(pq(table), 'tr')
+            table_rows = iter(pqitems(pq(table), 'tr'))
             assert "înregistrări găsite:" in next(table_rows).text()
             assert next(table_rows).text() == "Nr. Crt. PDF Data Titlu Comisia"
             for tr in table_rows:
@@ -55,19 +106,12 @@ class SummaryScraper(Scraper):
                 assert pdf_url_m is not None, "can't parse url: %r" % pdf_url
                 committee_code = pdf_url_m.group('committee')
                 assert committee_names[committee_code] == col5.text()
-                row = {
+                yield {
                     'committee': committee_code,
                     'pdf_url': pdf_url,
                     'date': date_value,
                     'title': title,
                 }
 
-                if get_pdf_text:
-                    pdf_data = self.pdf_session.get(pdf_url).content
-                    text = pdf_to_text(pdf_data)
-                    row['text'] = text
-
-                yield row
-
             if empty_page:
                 break
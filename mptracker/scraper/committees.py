@@ -72,20 +72,27 @@ class CommitteeScraper(Scraper):
         'http://www.cdep.ro/pls/parlam/structura.co?'
 
     def fetch_committees(self):
+        """ Committees and their members. Returns None when `fingerprints`
+        show that none of the pages changed since the last run. """
+        changed = False
+        committee_pages = []
         for chamber_id in [0, 1, 2]:
             if chamber_id == 1:
                 for (id, name) in SENATE_2016_COMMITTEES:
-                    yield Committee(
+                    committee = Committee(
                         cdep_id=id,
                         chamber_id=1,
                         name=name,
                         current_members=[],
                         former_members=[],
                     )
+                    committee_pages.append((committee, None, None))
                 continue
 
             url = self.listing_page_url.format(chamber_id=chamber_id)
-            listing_page = self.fetch_url(url)
+            content = self.opener(url)
+            changed = self.page_changed(url, content) or changed
+            listing_page = self.parse_page(content, url)
 
             for row in listing_page.items('table.tip01 tr[valign=top]'):
                 cell = row('td').eq(1)
@@ -102,17 +109,27 @@ class CommitteeScraper(Scraper):
                     current_members=[],
                     former_members=[],
                 )
-                if chamber_id != 1:
-                    self.fetch_committee_members(committee, href, chamber_id)
-                yield committee
+                content = self.opener(href)
+                # check every page, so that all the fingerprints get recorded
+                changed = self.page_changed(href, content) or changed
+                committee_pages.append((committee, href, content))
 
-    def fetch_committee_members(self, committee, committee_url, chamber_id):
-        committee_page = self.fetch_url(committee_url)
+        if not changed:
+            return None
+
+        for (committee, committee_url, content) in committee_pages:
+            if content is not None:
+                committee_page = self.parse_page(content, committee_url)
+                self.parse_committee_members(committee, committee_page)
+
+        return [committee for (committee, _, _) in committee_pages]
+
+    def parse_committee_members(self, committee, committee_page):
         mp_tables = list(committee_page.items('table.tip01'))
 
-        if chamber_id == 0:
+        if committee.chamber_id == 0:
             membership_parser = CommonCommitteeMembershipParser()
-        elif chamber_id == 2:
+        elif committee.chamber_id == 2:
             membership_parser = CdepCommitteeMembershipParser()
 
         committee.current_members.extend(
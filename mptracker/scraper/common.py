@@ -1,20 +1,27 @@
+import os
 import time
-from datetime import date, timedelta
-from urllib.parse import urlencode, urlparse, parse_qs
+import random
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import date
+from urllib.parse import urlencode, urlparse, parse_qs, urljoin
 import logging
 import re
 import csv
 import io
-from collections import namedtuple
+from collections import namedtuple, deque
 from path import path
 import requests
 from werkzeug.urls import url_decode, url_parse
 from pyquery import PyQuery as pq
-from lxml.html.clean import clean_html
+from lxml.html.clean import Cleaner
 from lxml.html import fromstring, HTMLParser
 from lxml import etree
+import lxml.html
 from psycopg2.extras import DateRange
 from mptracker.common import parse_date as parse_iso_date
+from mptracker.scraper.telemetry import Telemetry, url_pattern
 
 logger = logging.getLogger(__name__)
 
@@ -33,26 +40,255 @@ class PageNotFoundError(RuntimeError):
     pass
 
 
+class FetchError(RuntimeError):
+    """ The server kept failing to serve a page (5xx errors, timeouts,
+    dropped connections), as opposed to `PageNotFoundError`, which means
+    the page isn't there """
+
+
+class RetryPolicy:
+    """ How many times to send a request that failed temporarily, and how
+    long to wait in between: exponential backoff with full jitter, i.e. a
+    random delay of up to `base * 2 ** attempt` seconds, at most `cap` """
+
+    def __init__(self, attempts=4, base=1.0, cap=60.0):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """ Holds back the requests for a URL pattern (see
+    `telemetry.url_pattern`) for `cooldown` seconds after `threshold`
+    temporary failures in a row. After that a request goes through, and
+    if it fails as well, the circuit opens again. It's safe to share
+    between threads. """
+
+    def __init__(self, threshold=5, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = {}
+        self.open_until = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        """ Block while the circuit for `url` is open """
+        pattern = url_pattern(url)
+        with self.lock:
+            delay = self.open_until.get(pattern, 0) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def success(self, url):
+        with self.lock:
+            self.failures.pop(url_pattern(url), None)
+
+    def failure(self, url):
+        pattern = url_pattern(url)
+        with self.lock:
+            failures = self.failures.get(pattern, 0) + 1
+            self.failures[pattern] = failures
+            if failures < self.threshold:
+                return
+            self.open_until[pattern] = time.monotonic() + self.cooldown
+        logger.warn("%d failures in a row for %s, holding back for %d "
+                    "seconds", failures, pattern, self.cooldown)
+
+
+class RateLimiter:
+    """ Token bucket rate limiter with one bucket per host. It's safe to
+    share between threads; `acquire` blocks until a request may be sent.
+    Every host starts at `rate` requests per second; `set_rate` changes
+    the rate of one host, e.g. from an `AdaptiveThrottle`. """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.rates = {}
+        self.lock = threading.Lock()
+
+    def _host(self, url):
+        return urlparse(url).netloc
+
+    def host_rate(self, url):
+        return self.rates.get(self._host(url), self.rate)
+
+    def set_rate(self, url, rate):
+        with self.lock:
+            self.rates[self._host(url)] = rate
+
+    def acquire(self, url):
+        host = self._host(url)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                rate = self.rates.get(host, self.rate)
+                (tokens, last) = self.buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * rate)
+                if tokens >= 1:
+                    self.buckets[host] = (tokens - 1, now)
+                    return
+                self.buckets[host] = (tokens, now)
+                delay = (1 - tokens) / rate
+            time.sleep(delay)
+
+    def refund(self, url):
+        """ Give back a token, e.g. when the response came from cache """
+        host = self._host(url)
+        with self.lock:
+            if host in self.buckets:
+                (tokens, last) = self.buckets[host]
+                self.buckets[host] = (min(self.burst, tokens + 1), last)
+
+
+_local = threading.local()
+
+
+def cdep_html_parser():
+    """ HTML parser for cdep.ro pages, which are iso-8859-2 encoded. lxml
+    parsers must not be shared between threads, so we keep one per thread.
+    """
+    parser = getattr(_local, 'cdep_html_parser', None)
+    if parser is None:
+        parser = lxml.html.HTMLParser(encoding='iso-8859-2')
+        _local.cdep_html_parser = parser
+    return parser
+
+
 class Scraper(object):
 
     use_cdep_opener = True
 
-    def __init__(self, session=None):
-        self.session = session or requests.Session()
+    # read streamed responses in chunks of this many bytes
+    stream_chunk_size = 64 * 1024
 
-    def opener(self, url):
-        # we need to pass in all the hooks because of a bug in requests 2.0.0
-        # https://github.com/kennethreitz/requests/issues/1655
-        resp = self.session.get(url, hooks=self.session.hooks)
+    # make all links absolute right after parsing; scrapers that resolve
+    # only the links they need, with `absolute_url`, turn this off
+    absolute_links = True
+
+    # a `PageFingerprints` store; scrapers that support it skip the pages
+    # that didn't change since the last run
+    fingerprints = None
+
+    def __init__(self, session=None, workers=1, processes=0):
+        self.session = session or requests.Session()
+        self.workers = workers
+        # scrapers that support it parse pages in a `ParsePipeline` with
+        # this many worker processes; 0 means parse them in this process
+        self.processes = processes
+        self._pipeline = None
+
+    def get_pipeline(self):
+        """ The scraper's `ParsePipeline`. It's started on first use and
+        kept for later calls, so that the worker processes start once per
+        run; `close` shuts it down. """
+        if self._pipeline is None:
+            self._pipeline = ParsePipeline(self, self.processes)
+        return self._pipeline
+
+    def close(self):
+        if self._pipeline is not None:
+            self._pipeline.close()
+            self._pipeline = None
+
+    def get_response(self, url, stream=False):
+        """ Download a page. 5xx responses and failed requests are retried
+        according to the session's `retry` policy, and raise `FetchError`
+        if they keep failing; other responses that aren't 200 raise
+        `PageNotFoundError`. """
+        retry = getattr(self.session, 'retry', None)
+        breaker = getattr(self.session, 'breaker', None)
+        telemetry = getattr(self.session, 'telemetry', None)
+        attempts = retry.attempts if retry is not None else 1
+        for attempt in range(attempts):
+            if breaker is not None:
+                breaker.wait(url)
+            try:
+                resp = self._send(url, stream)
+            except requests.RequestException as e:
+                error = repr(e)
+            else:
+                if resp.status_code < 500:
+                    break
+                resp.close()
+                error = "HTTP %d" % resp.status_code
+            if breaker is not None:
+                breaker.failure(url)
+            if attempt + 1 < attempts:
+                delay = retry.delay(attempt)
+                logger.warn("Retrying %s in %.1f seconds after %s",
+                            url, delay, error)
+                if telemetry is not None:
+                    telemetry.record_retry(url)
+                time.sleep(delay)
+        else:
+            raise FetchError("%s failed %d times, last with %s"
+                             % (url, attempts, error))
+        if breaker is not None:
+            breaker.success(url)
         if resp.status_code != 200:
             raise PageNotFoundError
+        return resp
+
+    def _send(self, url, stream):
+        rate_limiter = getattr(self.session, 'rate_limiter', None)
+        telemetry = getattr(self.session, 'telemetry', None)
+        if rate_limiter is not None:
+            t0 = time.monotonic()
+            rate_limiter.acquire(url)
+            if telemetry is not None:
+                telemetry.record_throttle(url, time.monotonic() - t0)
+        # we need to pass in all the hooks because of a bug in requests 2.0.0
+        # https://github.com/kennethreitz/requests/issues/1655
+        t0 = time.monotonic()
+        try:
+            resp = self.session.get(url, hooks=self.session.hooks,
+                                    stream=stream)
+        except requests.RequestException:
+            throttle = getattr(self.session, 'throttle', None)
+            if throttle is not None:
+                throttle.feedback(url, time.monotonic() - t0, ok=False)
+            raise
+        if rate_limiter is not None and getattr(resp, 'from_cache', False):
+            rate_limiter.refund(url)
+        return resp
+
+    def opener(self, url):
+        resp = self.get_response(url)
         if self.use_cdep_opener:
-            text = resp.content.decode('iso-8859-2')
-            # we use utf-16 because the parser's autodetect works fine with it
-            return text.encode('utf-16')
+            return resp.content
         else:
             return resp.text
 
+    def stream_url(self, url):
+        """ Download a page and yield the body in chunks, as it arrives """
+        logger.debug("Streaming URL %s", url)
+        resp = self.get_response(url, stream=True)
+        return resp.iter_content(self.stream_chunk_size)
+
+    def iterparse_url(self, url, tag):
+        """ Stream a page and yield its `tag` elements as they are parsed;
+        see `iterparse_html`. """
+        encoding = 'iso-8859-2' if self.use_cdep_opener else None
+        return iterparse_html(self.stream_url(url), tag, url, encoding)
+
+    def load_page(self, content, url):
+        """ Parse a page; cdep.ro pages are handed to lxml as raw bytes, with
+        the encoding set explicitly, so there's no intermediate string. """
+        if self.use_cdep_opener:
+            root = lxml.html.fromstring(content, base_url=url,
+                                        parser=cdep_html_parser())
+        else:
+            root = lxml.html.fromstring(content, base_url=url)
+        page = pq(root, parser='html')
+        if self.absolute_links:
+            make_links_absolute(page, url)
+        return page
+
     def fetch_url(self, url, args=None):
         if args:
             if '?' not in url:
@@ -61,10 +297,147 @@ class Scraper(object):
                 url += '&'
             url += urlencode(args)
         logger.debug("Fetching URL %s", url)
-        page = pq(url, parser='html', opener=self.opener)
-        page.make_links_absolute()
+        content = self.opener(url)
+        return self.parse_page(content, url)
+
+    def parse_page(self, content, url):
+        """ `load_page`, timed for the session's telemetry """
+        t0 = time.monotonic()
+        page = self.load_page(content, url)
+        telemetry = getattr(self.session, 'telemetry', None)
+        if telemetry is not None:
+            telemetry.record_parse(url, time.monotonic() - t0)
         return page
 
+    def page_changed(self, url, content):
+        """ Check a downloaded page against `fingerprints`; True if it
+        changed since the last run, or if we don't keep fingerprints """
+        if self.fingerprints is None:
+            return True
+        return self.fingerprints.check(url, content)
+
+    def fetch_urls(self, url_list):
+        """ Fetch several pages, in parallel if `workers` > 1, and yield
+        them in the same order as `url_list`. """
+        if self.workers <= 1:
+            for url in url_list:
+                yield self.fetch_url(url)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(self.fetch_url, url_list)
+
+
+class AsyncFetcher:
+    """ Fetch pages from an asyncio event loop. Requests run in a thread
+    pool and at most `max_in_flight` of them are pending at any time. """
+
+    def __init__(self, scraper, max_in_flight=8):
+        self.scraper = scraper
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.semaphore = None
+
+    async def fetch_url(self, url):
+        if self.semaphore is None:
+            # create it lazily so it binds to the running event loop
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self.semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                self.executor,
+                self.scraper.fetch_url,
+                url,
+            )
+
+    def iter_results(self, coroutines, window):
+        """ Run the coroutines on a private event loop, at most `window` of
+        them at a time, and yield their results in order, each as soon as
+        it's ready, so that finished results don't pile up in memory. """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        pending = deque()
+        try:
+            for coroutine in coroutines:
+                pending.append(loop.create_task(coroutine))
+                if len(pending) >= window:
+                    yield loop.run_until_complete(pending.popleft())
+            while pending:
+                yield loop.run_until_complete(pending.popleft())
+        finally:
+            # the consumer may stop early
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(
+                    asyncio.gather(*pending, return_exceptions=True))
+            self.executor.shutdown()
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+class ParsePipeline:
+    """ Download pages with `scraper` in a thread pool and parse them in a
+    pool of `processes` worker processes, so that parsing isn't limited to
+    one core. `parse` is called in a worker as `parse(content, url,
+    *args)`, so it must be a module-level function, and it should return
+    plain picklable records, not parsed pages. At most `max_in_flight`
+    pages are being downloaded or waiting to be parsed at any time. """
+
+    def __init__(self, scraper, processes=None, max_in_flight=None):
+        self.scraper = scraper
+        self.processes = processes or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 2 * self.processes
+        self.parse_pool = ProcessPoolExecutor(max_workers=self.processes)
+        # start the worker processes before there are any fetcher threads;
+        # a process forked while another thread holds a lock can deadlock
+        list(self.parse_pool.map(int, range(self.processes)))
+        self.fetch_pool = ThreadPoolExecutor(max_workers=self.max_in_flight)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.fetch_pool.shutdown()
+        self.parse_pool.shutdown()
+
+    def _fetch_and_parse(self, parse, url, *args):
+        content = self.scraper.opener(url)
+        return self.parse_pool.submit(parse, content, url, *args).result()
+
+    def results(self, parse, url_list, *args):
+        """ Yield `(result, error)` for each url, in the order of
+        `url_list`; `error` is the exception raised while downloading or
+        parsing the page, if any. `args` are lists of extra arguments for
+        `parse`, one item per url. """
+        pending = deque()
+
+        def outcome(future):
+            error = future.exception()
+            if error is not None:
+                return (None, error)
+            return (future.result(), None)
+
+        for item in zip(url_list, *args):
+            pending.append(self.fetch_pool.submit(
+                self._fetch_and_parse, parse, *item))
+            if len(pending) >= self.max_in_flight:
+                yield outcome(pending.popleft())
+
+        while pending:
+            yield outcome(pending.popleft())
+
+    def map(self, parse, url_list, *args):
+        """ Like `results`, but yield only the results, and raise the first
+        error """
+        for (result, error) in self.results(parse, url_list, *args):
+            if error is not None:
+                raise error
+            yield result
+
 
 class GenericModel:
 
@@ -76,17 +449,87 @@ class GenericModel:
         return {k: getattr(self, k, None) for k in keys}
 
 
-def create_throttle(seconds):
-    def hook(response, **extra):
+class AdaptiveThrottle:
+    """ Response hook that adapts the per-host rates of `rate_limiter` to
+    how the server copes: a rate goes up by `increase` after each fast,
+    successful response, and is multiplied by `decrease` after a slow
+    response, a 5xx error or a failed request, at most once per round
+    trip. It always stays between `floor` and `ceiling`. All requests wait
+    for the one limiter, so concurrent fetchers share the adapted rate. """
+
+    def __init__(self, rate_limiter, floor=None, ceiling=None,
+                 increase=None, decrease=0.5, slow=2.0, telemetry=None):
+        rate = rate_limiter.rate
+        self.rate_limiter = rate_limiter
+        self.floor = floor or rate / 4
+        self.ceiling = ceiling or rate * 4
+        self.increase = increase or rate / 10
+        self.decrease = decrease
+        self.slow = slow
+        self.telemetry = telemetry
+        self.last_decrease = {}
+        self.lock = threading.Lock()
+
+    def _host(self, url):
+        return urlparse(url).netloc
+
+    def rate(self, url):
+        return self.rate_limiter.host_rate(url)
+
+    def feedback(self, url, elapsed, ok):
+        """ Adjust the rate after a request to `url` that took `elapsed`
+        seconds """
+        host = self._host(url)
+        now = time.monotonic()
+        with self.lock:
+            rate = self.rate(url)
+            if ok and elapsed < self.slow:
+                new_rate = min(self.ceiling, rate + self.increase)
+
+            else:
+                if now - elapsed < self.last_decrease.get(host, 0):
+                    # the request started before we last backed off
+                    return
+                self.last_decrease[host] = now
+                new_rate = max(self.floor, rate * self.decrease)
+                logger.debug("Backing off %s to %.2f requests/s",
+                             host, new_rate)
+
+            self.rate_limiter.set_rate(url, new_rate)
+
+        if self.telemetry is not None and new_rate != rate:
+            self.telemetry.record_rate(host, new_rate)
+
+    def __call__(self, response, **extra):
         if not getattr(response, 'from_cache', False):
-            # logger.debug("Throttle: %s", seconds)
-            time.sleep(seconds)
+            self.feedback(response.url, response.elapsed.total_seconds(),
+                          response.status_code < 500)
         return response
-    return hook
 
 
-def create_session(cache_name=None, throttle=None, counters=False):
-    if cache_name:
+def create_session(cache_name=None, throttle=None, rate=None,
+                   revalidate=False, archive_name=None, replay=False,
+                   throttle_floor=None, throttle_ceiling=None,
+                   pool_size=None, retries=3,
+                   archive_codec='gzip'):
+    archive = None
+    if archive_name:
+        from mptracker.scraper.archive import PageArchive
+        archive = PageArchive(PROJECT_ROOT / '_data' / archive_name,
+                              compression=archive_codec)
+
+    if replay:
+        from mptracker.scraper.archive import ReplaySession
+        assert archive is not None, "Replay needs an archive"
+        session = ReplaySession(archive)
+        rate = throttle = None
+
+    elif cache_name and revalidate:
+        from mptracker.scraper.httpcache import RevalidatingSession
+        cache_path = PROJECT_ROOT / '_data' / (cache_name + '-http.sqlite')
+        session = RevalidatingSession(cache_path)
+
+    elif cache_name:
         import requests_cache
         cache_path = PROJECT_ROOT / '_data' / cache_name
         session = requests_cache.CachedSession(cache_path)
@@ -94,23 +537,46 @@ def create_session(cache_name=None, throttle=None, counters=False):
     else:
         session = requests.Session()
 
-    if counters:
-        session.counters = counters_data = {
-            'requests': 0,
-            'bytes': 0,
-            'download_time': timedelta(),
-        }
+    if isinstance(session, requests.Session):
+        # requests 2.0 also asks for "compress", which servers don't do
+        session.headers['Accept-Encoding'] = 'gzip, deflate'
+        if pool_size:
+            # keep enough connections alive for all the concurrent fetchers
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+
+    if retries:
+        session.retry = RetryPolicy(attempts=retries + 1)
+        session.breaker = CircuitBreaker()
+
+    if archive is not None and not replay:
+        session.hooks['response'].append(archive.create_hook())
+
+    session.telemetry = Telemetry()
+    session.hooks['response'].insert(0, session.telemetry.create_hook())
 
-        def request_count_hook(response, **extra):
-            counters_data['requests'] += 1
-            counters_data['bytes'] += len(response.content)
-            counters_data['download_time'] += response.elapsed
-            return response
+    if throttle and not rate:
+        # start with one request every `throttle` seconds
+        rate = 1 / throttle
 
-        session.hooks['response'].append(request_count_hook)
+    if rate:
+        # rate-limit before each request instead of sleeping after it, so
+        # that concurrent fetchers share the same budget
+        session.rate_limiter = RateLimiter(rate)
 
     if throttle:
-        session.hooks['response'].append(create_throttle(throttle))
+        # then adapt the limiter's rate to how the server copes
+        session.throttle = AdaptiveThrottle(
+            session.rate_limiter,
+            floor=throttle_floor,
+            ceiling=throttle_ceiling,
+            telemetry=session.telemetry,
+        )
+        session.hooks['response'].append(session.throttle)
 
     return session
 
@@ -161,6 +627,142 @@ def url_args(url):
     return url_decode(url_parse(url).query)
 
 
+def absolute_url(page, href):
+    """ Resolve `href` relative to the url that `page` was fetched from """
+    el = page[0] if isinstance(page, pq) else page
+    return _absolute_url(el.getroottree().docinfo.URL, href)
+
+
+def _absolute_url(base_url, href, origin=None):
+    # nearly all links on cdep.ro are relative to the site root, and
+    # `urljoin` is slow enough to show up in profiles, so special-case them
+    if href and href.startswith('/') and not href.startswith('//') \
+            and '/.' not in href:
+        if origin is None:
+            parts = urlparse(base_url)
+            origin = parts.scheme + '://' + parts.netloc
+        return origin + href
+    if href and (href.startswith('http://') or href.startswith('https://')):
+        return href
+    return urljoin(base_url, href)
+
+
+def make_links_absolute(page, base_url):
+    # same as `PyQuery.make_links_absolute`, which is not thread-safe in
+    # pyquery 1.2.8 because `each` passes `this` through the global namespace
+    parts = urlparse(base_url)
+    origin = parts.scheme + '://' + parts.netloc
+    for el in page:
+        for link in el.iter('a'):
+            link.set('href', _absolute_url(base_url, link.get('href'), origin))
+
+
+def with_content(response, callback):
+    """ Call `callback(content)` with the body of `response`. A streamed
+    response isn't read here: the body is collected as the caller reads
+    it, and `callback` runs once it has been read to the end, so hooks can
+    store streamed pages without holding up the parser. If the caller
+    stops early, `callback` isn't called. """
+    if getattr(response, '_content_consumed', True):
+        callback(response.content)
+        return
+
+    callbacks = getattr(response, 'content_callbacks', None)
+    if callbacks is None:
+        callbacks = response.content_callbacks = []
+        iter_content = response.iter_content
+
+        def tee(*args, **kwargs):
+            chunks = []
+            for chunk in iter_content(*args, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            content = b''.join(chunks)
+            for callback in callbacks:
+                callback(content)
+
+        response.iter_content = tee
+
+    callbacks.append(callback)
+
+
+def iterparse_html(chunks, tag, base_url=None, encoding=None):
+    """ Feed the `chunks` of an HTML page to an incremental parser and yield
+    each `tag` element (a tag name or a tuple of names) as soon as its end
+    tag is parsed. The ancestors of a yielded element are in the tree, but
+    its later siblings are not. Once the caller moves on, outermost matches
+    are cleared, and their earlier siblings dropped, so memory use stays
+    flat however long the page is. """
+    parser = etree.HTMLPullParser(events=['end'], tag=tag,
+                                  base_url=base_url, encoding=encoding)
+
+    def read_events():
+        for (_, el) in parser.read_events():
+            yield el
+            if next(el.iterancestors(tag), None) is None:
+                el.clear()
+                while el.getprevious() is not None:
+                    del el.getparent()[0]
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from read_events()
+    parser.close()
+    yield from read_events()
+
+
+# Precompiled selectors for the hot parsers. PyQuery translates CSS to XPath
+# on every call and wraps each match in a new object; these work on plain
+# lxml elements and return plain strings.
+
+_CONTAINS_TEXT = etree.XPath(
+    'descendant-or-self::*[contains(text(), $text)]')
+
+
+def find_containing(root, text):
+    """ Elements whose first text node contains `text`, which is what
+    `:contains()` matches in pyquery """
+    return _CONTAINS_TEXT(root, text=text)
+
+
+def ancestors(elements, tag=None):
+    """ Ancestors of `elements`, outermost first, without duplicates; same
+    as `PyQuery.parents(tag)` """
+    rv = []
+    seen = set()
+    for el in elements:
+        for parent in reversed(list(el.iterancestors(tag))):
+            if parent not in seen:
+                seen.add(parent)
+                rv.append(parent)
+    return rv
+
+
+def text_content(*elements):
+    """ Same as `PyQuery.text()` """
+    text = []
+
+    def add_text(el, tail=True):
+        if el.text and not isinstance(el, etree._Comment):
+            text.append(el.text)
+        for child in el:
+            add_text(child)
+        if tail and el.tail:
+            text.append(el.tail)
+
+    for el in elements:
+        add_text(el, tail=False)
+    return ' '.join(t.strip() for t in text if t.strip())
+
+
+def inner_html(el):
+    """ Same as `PyQuery.html()` """
+    if not len(el):
+        return el.text
+    return (el.text or '') + ''.join(
+        etree.tostring(child, encoding=str) for child in el)
+
+
 def never(*args, **kwargs):
     return False
 
@@ -169,20 +771,51 @@ def open_scraper_resource(name, mode='rb'):
     return (SCRAPER_PACKAGE / name).open(mode)
 
 
+class Sanitizer:
+    """ Clean up html fragments, with a single `Cleaner`, and one parser
+    per thread, so that it can be shared between scraper threads. """
+
+    def __init__(self):
+        self.cleaner = Cleaner()
+        self.local = threading.local()
+
+    @property
+    def parser(self):
+        if not hasattr(self.local, 'parser'):
+            self.local.parser = HTMLParser(encoding='utf-8')
+        return self.local.parser
+
+    def __call__(self, html):
+        if not html.strip():
+            return ''
+        try:
+            doc = fromstring(html, parser=self.parser)
+        except etree.ParserError:
+            return ''
+        self.cleaner(doc)
+        body = doc.find('.//body')
+        if body is not None:
+            return pq(body).html()
+        return etree.tostring(doc, encoding=str)
+
+    def clean_element(self, el):
+        """ Sanitized html of the content of `el`, or None if it's
+        empty """
+        html = pq(el).html()
+        if not html:
+            return None
+        return self(html)
+
+    def clean_elements(self, elements):
+        """ `clean_element` for each of `elements` """
+        return [self.clean_element(el) for el in elements]
+
+
+_sanitizer = Sanitizer()
+
+
 def sanitize(html):
-    if not html.strip():
-        return ''
-    parser = HTMLParser(encoding='utf-8')
-    try:
-        doc = fromstring(html, parser=parser)
-    except etree.ParserError:
-        return ''
-    cleaned = clean_html(doc)
-    doc = pq(cleaned)
-    if doc.find('body'):
-        return doc.find('body').html()
-    else:
-        return str(doc)
+    return _sanitizer(html)
 
 
 MONTHS = {'ian': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'mai': 5, 'iun': 6,
@@ -224,12 +857,17 @@ def create_csv_url(key):
         return SPREADSHEET_NEW_CSV_URL_TEMPLATE.format(key=key)
 
 
-def get_gdrive_csv(key):
-    url = create_csv_url(key)
-    resp = requests.get(url)
-    assert resp.headers['Content-Type'] == 'text/csv'
-    text = resp.content.decode('utf-8')
-    return csv.DictReader(io.StringIO(text))
+def fetch_gdrive_csv(key, headers=None):
+    """ Export a spreadsheet as CSV. Conditional `headers` may get a 304
+    response, without content. """
+    resp = requests.get(create_csv_url(key), headers=headers)
+    if resp.status_code != 304:
+        assert resp.headers['Content-Type'] == 'text/csv'
+    return resp
+
+
+def csv_reader(content):
+    return csv.DictReader(io.StringIO(content.decode('utf-8')))
 
 
 def parse_interval(start_txt, end_txt):
@@ -241,36 +879,74 @@ def parse_interval(start_txt, end_txt):
     return DateRange(start_date, end_date)
 
 
+TableColumn = namedtuple('TableColumn', ['header_text', 'convert', 'inherit'])
+
+
+def cell_text(td):
+    """ Text of a table cell, or "" if the row has no such cell """
+    if td is None:
+        return ""
+    return text_content(td)
+
+
+def cell_date(fmt):
+    """ Converter for cells with a date in `fmt` (see `parse_date`) """
+    def convert(td):
+        return parse_date(cell_text(td), fmt)
+    return convert
+
+
+def cell_profile(td):
+    """ Name and `ProfileIdent` of the person linked from a cell """
+    assert td is not None, "No profile link column"
+    link = td.find('.//a')
+    assert link is not None, "No profile link"
+    return (text_content(link), parse_profile_url(link.attrib.get('href')))
+
+
+def column(header_text, convert=cell_text, inherit=False):
+    """ A column for `TableParser.columns`, found by a substring of its
+    heading. `convert` gets the cell element, or None if there's no such
+    column. With `inherit`, empty cells take the value from above. """
+    return TableColumn(header_text, convert, inherit)
+
+
+def _has_text(td):
+    return td is not None and bool(td.text_content().strip())
+
+
 class TableRow:
 
-    def __init__(self, headings, tdpq, up_text_values):
-        self.headings = headings
-        self.tdpq = tdpq
-        self.text_values = [td.text() for td in self.tdpq.items()]
-        self.text_or_up_values = [
-            t or ut for t, ut in
-            zip(self.text_values, up_text_values)
-        ]
+    def __init__(self, table, cells, up_row):
+        self.table = table
+        self.cells = cells
+        self.up_row = up_row
 
-    def _find_column(self, text):
-        for n, col_text in enumerate(self.headings):
-            if text in col_text:
-                return n
+    def _cell(self, col):
+        if col is None or col >= len(self.cells):
+            return None
+        return self.cells[col]
 
     def td(self, header_text):
-        col = self._find_column(header_text)
+        col = self.table.column_index(header_text)
         assert col is not None, "No column named %r" % header_text
-        return self.tdpq.eq(col)
+        return pq(self._cell(col))
 
     def text(self, header_text, inherit=False):
-        col = self._find_column(header_text)
+        col = self.table.column_index(header_text)
         if col is None:
             return ""
-        values = self.text_or_up_values if inherit else self.text_values
-        return values[col]
+        row = self
+        if inherit:
+            while row.up_row is not None and not _has_text(row._cell(col)):
+                row = row.up_row
+        return cell_text(row._cell(col))
 
 
 class TableParser:
+    """ Parse a table with a heading row (or two, with `double_header`).
+    Headings are looked up by substring, once per table, and `columns`
+    reads the whole table in a single pass. """
 
     def __init__(self, table_html, double_header=False):
         self.table = pq(table_html)
@@ -294,20 +970,54 @@ class TableParser:
                 td.text() for td in
                 self.table.children('tr').eq(0).children().items()
             ]
+        self._column_index = {}
+
+    def column_index(self, header_text):
+        """ Index of the first column whose heading contains
+        `header_text`, or None """
+        if header_text not in self._column_index:
+            self._column_index[header_text] = next(
+                (n for n, col_text in enumerate(self.headings)
+                 if header_text in col_text),
+                None,
+            )
+        return self._column_index[header_text]
 
-    def __iter__(self):
-        tr_iter = iter(self.table.children('tr').items())
+    def iter_cells(self):
+        """ Yield the list of `td` elements of each row below the
+        headings """
+        tr_iter = self.table[0].iterchildren('tr')
         next(tr_iter)
         if self.double_header:
             next(tr_iter)
-        up_text_values = [""] * len(self.headings)
         for tr in tr_iter:
-            table_row = TableRow(
-                self.headings,
-                tr.children('td'),
-                up_text_values,
-            )
-            up_text_values = table_row.text_or_up_values
+            yield list(tr.iterchildren('td'))
+
+    def columns(self, **spec):
+        """ Read the table into a list of values for each `column` in
+        `spec`, converted by the column's `convert` function """
+        index = {
+            name: self.column_index(col.header_text)
+            for name, col in spec.items()
+        }
+        values = {name: [] for name in spec}
+        above = {}
+        for cells in self.iter_cells():
+            for name, col in spec.items():
+                n = index[name]
+                td = cells[n] if n is not None and n < len(cells) else None
+                if col.inherit:
+                    if _has_text(td):
+                        above[name] = td
+                    else:
+                        td = above.get(name)
+                values[name].append(col.convert(td))
+        return values
+
+    def __iter__(self):
+        table_row = None
+        for cells in self.iter_cells():
+            table_row = TableRow(self, cells, table_row)
             yield table_row
 
 
@@ -322,18 +1032,20 @@ class MembershipParser:
     table_parser_args = {}
 
     def parse_table(self, table_root):
-        for row in TableParser(table_root, **self.table_parser_args):
-            name_link = row.td(self.person_txt).find('a')
+        table = TableParser(table_root, **self.table_parser_args)
+        columns = table.columns(
+            role=column(self.role_txt, inherit=True),
+            person=column(self.person_txt, cell_profile),
+            start_date=column(self.start_date_txt, cell_date(self.date_fmt)),
+            end_date=column(self.end_date_txt, cell_date(self.date_fmt)),
+        )
+        for (role, (mp_name, mp_ident), start_date, end_date) in zip(
+                columns['role'], columns['person'],
+                columns['start_date'], columns['end_date']):
             yield self.member_cls(
-                role=row.text(self.role_txt, inherit=True),
-                mp_name=name_link.text(),
-                mp_ident=parse_profile_url(name_link.attr('href')),
-                start_date=parse_date(
-                    row.text(self.start_date_txt),
-                    self.date_fmt,
-                ),
-                end_date=parse_date(
-                    row.text(self.end_date_txt),
-                    self.date_fmt,
-                ),
+                role=role,
+                mp_name=mp_name,
+                mp_ident=mp_ident,
+                start_date=start_date,
+                end_date=end_date,
             )
@@ -0,0 +1,57 @@
+""" Checkpoints that let long scraper runs resume after a crash """
+
+import json
+import logging
+from contextlib import contextmanager
+from mptracker import models
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class CrawlCursor:
+    """ Progress of a scraper run. Each unit of work (a day of votes, a
+    transcript session, a question) is committed in its own transaction,
+    together with a checkpoint row. When the command is started again with
+    the same parameters, units that are done get skipped. Checkpoints are
+    removed once the run finishes. """
+
+    def __init__(self, crawl, params):
+        self.crawl = crawl
+        self.params = json.dumps(params, sort_keys=True)
+        query = (
+            models.db.session.query(models.CrawlCheckpoint.unit)
+            .filter_by(crawl=self.crawl, params=self.params)
+        )
+        self.done = set(row[0] for row in query)
+        if self.done:
+            logger.info("Resuming %s %s, %d units already done",
+                        self.crawl, self.params, len(self.done))
+
+    def is_done(self, unit):
+        return str(unit) in self.done
+
+    @contextmanager
+    def unit(self, unit):
+        """ Do a unit of work and commit it along with its checkpoint. The
+        transaction is rolled back if the work fails. """
+        try:
+            yield
+            models.db.session.add(models.CrawlCheckpoint(
+                crawl=self.crawl,
+                params=self.params,
+                unit=str(unit),
+            ))
+            models.db.session.commit()
+        except:
+            models.db.session.rollback()
+            raise
+        self.done.add(str(unit))
+
+    def finish(self):
+        (
+            models.CrawlCheckpoint.query
+            .filter_by(crawl=self.crawl, params=self.params)
+            .delete(synchronize_session=False)
+        )
+        models.db.session.commit()
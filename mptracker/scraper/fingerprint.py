@@ -0,0 +1,74 @@
+""" Fingerprints of source pages, to skip the ones that didn't change """
+
+import re
+import hashlib
+import logging
+from datetime import datetime
+import lxml.html
+from lxml import etree
+from mptracker import models
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def page_fingerprint(content):
+    """ Hash of the page markup, without scripts, styles, comments and
+    differences in whitespace """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    root = lxml.html.fromstring(content)
+    etree.strip_elements(root, 'script', 'style', etree.Comment,
+                         with_tail=False)
+    markup = etree.tostring(root)
+    markup = re.sub(br'\s*([<>])\s*', br'\1', markup)
+    markup = re.sub(br'\s+', b' ', markup)
+    return hashlib.sha1(markup).hexdigest()
+
+
+class PageFingerprints:
+    """ Fingerprints of the pages processed by the last successful run of
+    `crawl`. With `force`, every page counts as changed. """
+
+    def __init__(self, crawl, force=False):
+        self.crawl = crawl
+        self.force = force
+        query = (
+            models.db.session.query(
+                models.PageFingerprint.url,
+                models.PageFingerprint.fingerprint,
+            )
+            .filter_by(crawl=self.crawl)
+        )
+        self.known = dict(query)
+        self.seen = {}
+
+    def check(self, url, content):
+        """ Note the page's fingerprint; True if it changed since the last
+        run """
+        fingerprint = page_fingerprint(content)
+        self.seen[url] = fingerprint
+        return self.force or self.known.get(url) != fingerprint
+
+    def save(self):
+        """ Store the fingerprints seen in this run. They are added to the
+        database session, so they only stick if the run gets committed. """
+        now = datetime.utcnow()
+        n_changed = 0
+        for url, fingerprint in sorted(self.seen.items()):
+            if self.known.get(url) == fingerprint:
+                continue
+            row = (
+                models.PageFingerprint.query
+                .filter_by(crawl=self.crawl, url=url)
+                .first()
+            )
+            if row is None:
+                row = models.PageFingerprint(crawl=self.crawl, url=url)
+                models.db.session.add(row)
+            row.fingerprint = fingerprint
+            row.time = now
+            n_changed += 1
+        self.known.update(self.seen)
+        logger.info("%s: %d of %d pages changed",
+                    self.crawl, n_changed, len(self.seen))
@@ -30,8 +30,15 @@ class GroupScraper(Scraper):
 
     index_url = 'http://www.cdep.ro/pls/parlam/structura.gp?leg={}'
 
+    membership_parser_cls = GroupMembershipParser
+
     def fetch(self, year):
-        index_page = self.fetch_url(self.index_url.format(year))
+        """ Groups and their members. Returns None when `fingerprints` show
+        that none of the pages changed since the last run. """
+        index_url = self.index_url.format(year)
+        index_content = self.opener(index_url)
+        changed = self.page_changed(index_url, index_content)
+        index_page = self.parse_page(index_content, index_url)
         headline = index_page.find('td.headline').eq(0)
         parent_table = pq(headline.parents('table')[-2])
         table_current = list(parent_table.items('table'))[-3]
@@ -44,12 +51,24 @@ class GroupScraper(Scraper):
         for link in table_ended.items('a'):
             url_set.add(link.attr('href'))
 
-        group_list = [self.fetch_group(url, year) for url in sorted(url_set)]
+        group_pages = []
+        for url in sorted(url_set):
+            content = self.opener(url)
+            # check every page, so that all the fingerprints get recorded
+            changed = self.page_changed(url, content) or changed
+            group_pages.append((url, content))
+
+        if not changed:
+            return None
+
+        group_list = [
+            self.parse_group(self.parse_page(content, url), url, year)
+            for (url, content) in group_pages
+        ]
         group_list.sort(key=lambda g: g.idg)
         return group_list
 
-    def fetch_group(self, group_url, year):
-        group_page = self.fetch_url(group_url)
+    def parse_group(self, group_page, group_url, year):
         headline = group_page.find('td.headline')
         parent_td = pq(headline.parents('td')[-1])
         mp_tables = list(parent_td.items('table table'))
@@ -65,7 +84,7 @@ class GroupScraper(Scraper):
             year=year,
         )
 
-        membership_parser = GroupMembershipParser()
+        membership_parser = self.membership_parser_cls()
 
         if group.idg == 0:
             # group of unaffiliated MPs
@@ -0,0 +1,174 @@
+""" HTTP cache that revalidates pages with conditional requests """
+
+import re
+import time
+import json
+import sqlite3
+import logging
+import threading
+from datetime import date, datetime, timedelta
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.hooks import dispatch_hook
+from mptracker.scraper.common import url_args, with_content
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FOREVER = None
+ONE_HOUR = 3600
+ONE_DAY = 24 * ONE_HOUR
+
+
+def vote_day_max_age(url):
+    """ The list of votes for a day won't change after a few weeks """
+    day = datetime.strptime(url_args(url)['dat'], '%Y%m%d').date()
+    if date.today() - day > timedelta(days=30):
+        return FOREVER
+    return ONE_HOUR
+
+
+# (url pattern, max age in seconds); the first match wins. Max age may also
+# be a function that receives the URL.
+DEFAULT_MAX_AGE = [
+    (r'/steno/evot\.nominal\?', FOREVER),
+    (r'/steno/evot\.data\?', vote_day_max_age),
+    (r'/steno/steno\.(sumar|stenograma)\?', ONE_DAY),
+    (r'/parlam/interpelari\.detalii\?', 0),
+    (r'/proiecte/upl_pck\.(proiect|lista)\?', 0),
+    (r'', 0),
+]
+
+
+class PageStore:
+    """ Sqlite storage for response bodies and their validators """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS page ('
+                'url TEXT PRIMARY KEY, '
+                'status INTEGER, '
+                'headers TEXT, '
+                'content BLOB, '
+                'etag TEXT, '
+                'last_modified TEXT, '
+                'fetched_at REAL)'
+            )
+
+    def get(self, url):
+        with self.lock, self.conn as conn:
+            row = conn.execute(
+                'SELECT status, headers, content, etag, last_modified, '
+                'fetched_at FROM page WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        keys = ['status', 'headers', 'content', 'etag', 'last_modified',
+                'fetched_at']
+        entry = dict(zip(keys, row))
+        entry['headers'] = json.loads(entry['headers'])
+        return entry
+
+    def save(self, url, response, content):
+        with self.lock, self.conn as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO page VALUES (?, ?, ?, ?, ?, ?, ?)', (
+                    url,
+                    response.status_code,
+                    json.dumps(dict(response.headers)),
+                    content,
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'),
+                    time.time(),
+                ))
+
+    def touch(self, url):
+        with self.lock, self.conn as conn:
+            conn.execute('UPDATE page SET fetched_at = ? WHERE url = ?',
+                         (time.time(), url))
+
+
+class RevalidatingSession(requests.Session):
+    """ A `requests.Session` that caches GET responses. A cached page is
+    served as-is while it's younger than its max age; after that it's
+    revalidated with a conditional request, using the stored ETag and
+    Last-Modified headers, and downloaded again only if it changed. """
+
+    def __init__(self, db_path, max_age=DEFAULT_MAX_AGE):
+        super().__init__()
+        self.store = PageStore(db_path)
+        self.max_age_rules = [(re.compile(p), age) for p, age in max_age]
+        self.cache_stats = {'fresh': 0, 'revalidated': 0, 'refetched': 0}
+        self.stats_lock = threading.Lock()
+
+    def count(self, outcome):
+        # the session is shared between scraper threads
+        with self.stats_lock:
+            self.cache_stats[outcome] += 1
+
+    def max_age(self, url):
+        for pattern, age in self.max_age_rules:
+            if pattern.search(url):
+                return age(url) if callable(age) else age
+        return 0
+
+    def is_fresh(self, url, entry):
+        max_age = self.max_age(url)
+        if max_age is FOREVER:
+            return True
+        return time.time() - entry['fetched_at'] < max_age
+
+    def cached_response(self, url, entry):
+        response = requests.Response()
+        response.url = url
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['content']
+        response._content_consumed = True
+        response.elapsed = timedelta()
+        response.from_cache = True
+        return response
+
+    def request(self, method, url, **kwargs):
+        if method.upper() != 'GET' or kwargs.get('params'):
+            return super().request(method, url, **kwargs)
+
+        entry = self.store.get(url)
+
+        if entry is not None and self.is_fresh(url, entry):
+            self.count('fresh')
+            response = self.cached_response(url, entry)
+            hooks = kwargs.get('hooks') or self.hooks
+            return dispatch_hook('response', hooks, response)
+
+        if entry is not None:
+            headers = dict(kwargs.pop('headers', None) or {})
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            kwargs['headers'] = headers
+
+        response = super().request(method, url, **kwargs)
+        response.from_cache = False
+
+        if entry is not None and response.status_code == 304:
+            self.count('revalidated')
+            self.store.touch(url)
+            return self.cached_response(url, entry)
+
+        self.count('refetched')
+        if response.status_code == 200:
+            # a streamed page is stored once the caller has read it
+            with_content(response,
+                         lambda content: self.store.save(url, response,
+                                                         content))
+        return response
+
+    def log_cache_stats(self):
+        with self.stats_lock:
+            stats = dict(self.cache_stats)
+        logger.info("HTTP cache: %d fresh, %d revalidated, %d refetched",
+                    stats['fresh'], stats['revalidated'], stats['refetched'])
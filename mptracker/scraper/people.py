@@ -22,7 +22,10 @@ class MandateScraper(Scraper):
 
     mandates_url = 'http://www.cdep.ro/pls/parlam/structura.de?leg={year}'
 
-    def parse_mandates(self, table, ended=False):
+    def parse_mandates(self, table, ended=False, listing_changed=True):
+        """ Mandates from a table of the listing page. Unless the listing
+        changed, mandates whose profile page has the same fingerprint as on
+        the last run are skipped. """
         row_list = list(table.children().items())
         uninominal = bool('Colegiul uninominal' in row_list[1].text())
         if uninominal:
@@ -40,7 +43,12 @@ class MandateScraper(Scraper):
             (year, chamber, number) = parse_profile_url(link.attr('href'))
 
             last_first = link.text()
-            person_page = self.fetch_url(link.attr('href'))
+            person_url = link.attr('href')
+            person_content = self.opener(person_url)
+            if not self.page_changed(person_url, person_content) and \
+                    not listing_changed:
+                continue
+            person_page = self.parse_page(person_content, person_url)
             picture = person_page.find('a.highslide')
             first_last = (
                 person_page.find('.headline').html()
@@ -103,7 +111,10 @@ class MandateScraper(Scraper):
             yield mandate
 
     def fetch(self, year=2016):
-        mandates_page = self.fetch_url(self.mandates_url.format(year=year))
+        mandates_url = self.mandates_url.format(year=year)
+        content = self.opener(mandates_url)
+        listing_changed = self.page_changed(mandates_url, content)
+        mandates_page = self.parse_page(content, mandates_url)
         headline_current = mandates_page.find('td.headline')
         parent_td = headline_current.parents('td').eq(-2)
         parent_table = (
@@ -116,6 +127,8 @@ class MandateScraper(Scraper):
         data_tables = parent_table.children('td').eq(0).children('table')
 
         return (
-            list(self.parse_mandates(data_tables.eq(0))) +
-            list(self.parse_mandates(data_tables.eq(1), ended=True))
+            list(self.parse_mandates(data_tables.eq(0),
+                                     listing_changed=listing_changed)) +
+            list(self.parse_mandates(data_tables.eq(1), ended=True,
+                                     listing_changed=listing_changed))
         )
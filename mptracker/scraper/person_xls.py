@@ -1,7 +1,6 @@
 import csv
 import re
 from decimal import Decimal
-from mptracker.scraper import get_gdrive_csv
 
 
 def txtval(val):
@@ -89,8 +88,7 @@ def read_person_xls(xls_path):
             }
 
 
-def read_person_contact(csv_key):
-    reader = get_gdrive_csv(csv_key)
+def read_person_contact(reader):
     for n, row in enumerate(reader, 1):
         name = row['Nume']
         cdep_url = row['Link pagina pers cdep.ro']
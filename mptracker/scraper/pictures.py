@@ -0,0 +1,176 @@
+""" Download MP portraits and make thumbnails in several sizes """
+
+import json
+import shutil
+import hashlib
+import logging
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from mptracker.common import temp_dir
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SIZES = [60, 150, 300]
+FORMATS = ['jpg', 'webp']
+MANIFEST_NAME = 'manifest.json'
+
+
+def thumbnail_name(slug, size, fmt):
+    return '%s-%d.%s' % (slug, size, fmt)
+
+
+def thumbnail_names(slug):
+    """ {size: {format: filename}}, the way it's stored in the manifest """
+    return {
+        str(size): {fmt: thumbnail_name(slug, size, fmt) for fmt in FORMATS}
+        for size in SIZES
+    }
+
+
+def convert_args(orig_path, out_dir, slug):
+    """ A single `convert` call that decodes the portrait once and writes
+    every size, in every format """
+    args = ['convert', str(orig_path)]
+    for size in sorted(SIZES, reverse=True):
+        args += ['(', '+clone',
+                 '-thumbnail', '%dx%d^' % (size, size),
+                 '-quality', '85']
+        for fmt in FORMATS:
+            args += ['-write', str(out_dir / thumbnail_name(slug, size, fmt))]
+        args += ['+delete', ')']
+    args.append('null:')
+    return args
+
+
+def load_manifest(pictures_dir):
+    manifest_path = pictures_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with manifest_path.open() as f:
+        return json.load(f)
+
+
+def save_manifest(pictures_dir, manifest):
+    tmp_path = pictures_dir / (MANIFEST_NAME + '.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path.rename(pictures_dir / MANIFEST_NAME)
+
+
+def download(http_session, url, dest_path, entry):
+    """ Download a portrait to `dest_path`. The request is conditional on
+    the validators from the portrait's manifest `entry`; returns None if
+    the server says it didn't change, else the new entry. """
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    resp = http_session.get(url, headers=headers, stream=True)
+    try:
+        if resp.status_code == 304:
+            return None
+        assert resp.status_code == 200
+        assert resp.headers['Content-Type'] == 'image/jpeg'
+        content_hash = hashlib.sha1()
+        with dest_path.open('wb') as f:
+            for chunk in resp.iter_content(65536):
+                f.write(chunk)
+                content_hash.update(chunk)
+    finally:
+        resp.close()
+
+    return {
+        'url': url,
+        'hash': content_hash.hexdigest(),
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+    }
+
+
+def make_thumbnails(orig_path, out_dir, slug):
+    subprocess.check_call(convert_args(orig_path, out_dir, slug))
+
+
+def update_pictures(pictures, pictures_dir, http_session, workers=4,
+                    force=False):
+    """ Fetch the (slug, url) `pictures` into `pictures_dir`, `workers` at a
+    time, and make thumbnails of the ones whose content changed, running up
+    to `workers` `convert` processes. The manifest lists the thumbnails of
+    each portrait, along with the hash and HTTP validators of the source
+    image. """
+    pictures_dir = Path(str(pictures_dir))
+    if not pictures_dir.exists():
+        pictures_dir.mkdir(parents=True)
+    manifest = load_manifest(pictures_dir)
+    counters = {'new': 0, 'unchanged': 0, 'failed': 0}
+
+    def thumbnails_exist(slug):
+        return all(
+            (pictures_dir / name).exists()
+            for by_format in thumbnail_names(slug).values()
+            for name in by_format.values()
+        )
+
+    def is_fresh(slug, old, entry):
+        return (not force and entry['hash'] == old.get('hash')
+                and thumbnails_exist(slug))
+
+    with temp_dir() as tmp, \
+            ThreadPoolExecutor(max_workers=workers) as download_pool, \
+            ThreadPoolExecutor(max_workers=workers) as convert_pool:
+        tmp = Path(str(tmp))
+        downloads = []
+        for (slug, url) in pictures:
+            old = manifest.get(slug, {})
+            if force or old.get('url') != url or not thumbnails_exist(slug):
+                old = {}
+            (tmp / slug).mkdir()
+            orig_path = tmp / slug / 'orig.jpg'
+            future = download_pool.submit(download, http_session, url,
+                                          orig_path, old)
+            downloads.append((slug, orig_path, future))
+
+        conversions = []
+        for (slug, orig_path, future) in downloads:
+            old = manifest.get(slug, {})
+            try:
+                entry = future.result()
+            except Exception:
+                logger.exception("Failed to download picture of %s", slug)
+                counters['failed'] += 1
+                continue
+
+            if entry is None or is_fresh(slug, old, entry):
+                if entry is not None:
+                    manifest[slug] = dict(old, **entry)
+                counters['unchanged'] += 1
+                continue
+
+            logger.info("Converting picture of %s", slug)
+            future = convert_pool.submit(make_thumbnails, orig_path,
+                                         orig_path.parent, slug)
+            conversions.append((slug, orig_path.parent, entry, future))
+
+        for (slug, out_dir, entry, future) in conversions:
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Failed to convert picture of %s", slug)
+                counters['failed'] += 1
+                continue
+
+            entry['sizes'] = thumbnail_names(slug)
+            for by_format in entry['sizes'].values():
+                for name in by_format.values():
+                    shutil.move(str(out_dir / name), str(pictures_dir / name))
+            manifest[slug] = entry
+            counters['new'] += 1
+
+    save_manifest(pictures_dir, manifest)
+    logger.info("Pictures: %d new, %d unchanged, %d failed",
+                counters['new'], counters['unchanged'], counters['failed'])
+    return manifest
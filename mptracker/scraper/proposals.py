@@ -1,13 +1,15 @@
 import re
 import logging
 from datetime import date, datetime
-from itertools import groupby
+from itertools import groupby, chain
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pyquery import PyQuery as pq
 from werkzeug.urls import url_decode
 from mptracker.scraper.common import (
-    Scraper, pqitems, get_cdep_id, sanitize, url_args, GenericModel,
-    PageNotFoundError,
+    Scraper, pqitems, get_cdep_id, Sanitizer, url_args, GenericModel,
+    PageNotFoundError, absolute_url, find_containing, ancestors,
+    text_content,
 )
 from mptracker.common import fix_local_chars
 
@@ -70,6 +72,17 @@ def extract_modification_date(txt):
     ])
 
 
+def follows_centered_p(el):
+    """ Is `el`, or one of its ancestors, right after a `p[align=center]`?
+    That's where the table of proposals is on the index page. """
+    for parent in chain([el], el.iterancestors()):
+        prev = parent.getprevious()
+        if prev is not None and prev.tag == 'p' and \
+                prev.get('align') == 'center':
+            return True
+    return False
+
+
 class ProposalScraper(Scraper):
 
     mandate_proposal_url = ('http://www.cdep.ro/pls/parlam/structura.mp?'
@@ -77,19 +90,36 @@ class ProposalScraper(Scraper):
 
     list_url = 'http://www.cdep.ro/pls/proiecte/upl_pck.lista?cam={cam}'
 
-    def list_proposals(self, cam, year=None):
+    page_url = 'http://www.cdep.ro/pls/proiecte/upl_pck.proiect?idp=%d&cam=%d'
+
+    sanitizer = Sanitizer()
+
+    def list_proposals(self, cam, year=None, stream=False):
+        """ Proposals from the index page, optionally for a single year.
+        With `stream`, the page is parsed as it downloads, and records are
+        yielded as soon as their table row is complete. """
         list_url = self.list_url.format(cam=cam)
         if year:
             list_url += '&anp=%s' % year
-        page = self.fetch_url(list_url)
-        table = page.find('p[align=center]').next()
-        for tr in pqitems(table, 'tr[valign=top]'):
-            td_list = tr.find('td')
-            link = td_list.eq(1).find('a')
-            args = url_args(link.attr('href'))
+
+        if stream:
+            tr_iter = (
+                tr for tr in self.iterparse_url(list_url, 'tr')
+                if tr.get('valign') == 'top' and follows_centered_p(tr)
+            )
+
+        else:
+            page = self.fetch_url(list_url)
+            table = page.find('p[align=center]').next()
+            tr_iter = table('tr[valign=top]')
+
+        for tr in tr_iter:
+            td_list = tr.findall('.//td')
+            link = td_list[1].find('.//a')
+            args = url_args(absolute_url(tr, link.get('href')))
             assert args.get('cam', type=int) == cam
 
-            date_txt = td_list.eq(3).text()
+            date_txt = text_content(*td_list[3:4])
             try:
                 date = extract_modification_date(date_txt)
             except:
@@ -109,16 +139,14 @@ class ProposalScraper(Scraper):
 
 
     def scrape_proposal_page(self, chamber, pk):
-        rv = {}
-        url = (
-            'http://www.cdep.ro/pls/proiecte/upl_pck.proiect?idp=%d&cam=%d'
-            % (pk, chamber)
-        )
         try:
-            page = self.fetch_url(url)
+            page = self.fetch_url(self.page_url % (pk, chamber))
         except PageNotFoundError:
             return None
+        return self.parse_proposal_page(chamber, pk, page)
 
+    def parse_proposal_page(self, chamber, pk, page):
+        rv = {}
         if chamber == 1:
             rv['pk_senate'] = pk
         else:
@@ -127,8 +155,8 @@ class ProposalScraper(Scraper):
         rv['title'] = pq('.headline', page).text()
         rv['sponsorship'] = []
 
-        [hook_td] = pqitems(page, ':contains("Nr. înregistrare")')
-        metadata_table = pq(hook_td.parents('table')[-1])
+        [hook_td] = find_containing(page[0], "Nr. înregistrare")
+        metadata_table = pq(ancestors([hook_td], 'table')[-1])
         date_texts = []
 
         for row in pqitems(metadata_table.children('tr')):
@@ -210,10 +238,45 @@ class ProposalScraper(Scraper):
 
         return rv
 
+    def scrape_proposal_pages(self, keys):
+        """ Scrape the pages of several (chamber, pk) proposals, `workers`
+        at a time, and yield (chamber, pk, result, error) in the same order.
+        `result` is None for pages that don't exist; `error` is the
+        exception raised if scraping failed. With `processes`, the pages
+        are parsed in a `ParsePipeline`. """
+        if self.processes:
+            yield from self._scrape_proposal_pages_pipeline(keys)
+            return
+
+        def scrape(key):
+            (chamber, pk) = key
+            try:
+                result = self.scrape_proposal_page(chamber, pk)
+            except Exception as e:
+                return (chamber, pk, None, e)
+            return (chamber, pk, result, None)
+
+        if self.workers <= 1:
+            yield from map(scrape, keys)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(scrape, keys)
+
+    def _scrape_proposal_pages_pipeline(self, keys):
+        keys = list(keys)
+        url_list = [self.page_url % (pk, chamber) for (chamber, pk) in keys]
+        results = self.get_pipeline().results(parse_proposal_page, url_list)
+        for ((chamber, pk), (result, error)) in zip(keys, results):
+            if isinstance(error, PageNotFoundError):
+                error = None
+            yield (chamber, pk, result, error)
+
     def get_activity(self, page):
         activity = []
-        headline = page.find(':contains("Derularea procedurii legislative")')
-        table = list(headline.parents('table').items())[-1]
+        headline = find_containing(page[0],
+                                   "Derularea procedurii legislative")
+        table = pq(ancestors(headline, 'table')[-1])
 
         date = None
         seen_data = False
@@ -221,6 +284,7 @@ class ProposalScraper(Scraper):
         location_countdown = 0
         buffer = []
         ac = None
+        cells = []
         for row in table.children().items():
             if location_countdown > 0:
                 location_countdown -= 1
@@ -253,16 +317,29 @@ class ProposalScraper(Scraper):
                 last_col.find('img[src="/img/spacer.gif"]').remove()
                 (last_col.find('img[src="/img/icon_pdf_small.gif"]')
                     .replaceWith('(pdf)'))
-                html = last_col.html()
-                if html:
-                    ac.html += sanitize(html) + '\n'
+                cells.append((ac, cols[-1]))
 
         if ac:
             activity.append(ac)
 
+        cleaned = self.sanitizer.clean_elements([td for (_, td) in cells])
+        for ((ac, _), html) in zip(cells, cleaned):
+            if html is not None:
+                ac.html += html + '\n'
+
         return activity
 
 
+def parse_proposal_page(content, url):
+    """ `ProposalScraper.parse_proposal_page`, for a `ParsePipeline`
+    worker """
+    scraper = ProposalScraper()
+    args = url_args(url)
+    page = scraper.load_page(content, url)
+    return scraper.parse_proposal_page(args.get('cam', type=int),
+                                       args.get('idp', type=int), page)
+
+
 class SingleProposalScraper:
 
     def __init__(self):
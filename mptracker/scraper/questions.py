@@ -7,8 +7,10 @@ import logging
 from path import path
 from flask import json
 from pyquery import PyQuery as pq
+from lxml import etree
 from mptracker.scraper.common import (Scraper, pqitems, get_cached_session,
-                                      parse_cdep_id, never)
+                                      parse_cdep_id, never, absolute_url,
+                                      url_args)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -20,8 +22,23 @@ with open(path(__file__).parent / 'question_exceptions.json') as f:
     pdf_url_skip = set(exceptions['pdf_url_skip'])
 
 
+# same as the '#pageContent table a' selector, for a link in a partly
+# parsed page
+IN_CONTENT_TABLE = etree.XPath(
+    'boolean(ancestor::table[ancestor::*[@id = "pageContent"]])')
+
+
+def question_idi(href):
+    """ The site's id of a question; ids are given out in the order in which
+    questions are registered """
+    return url_args(href).get('idi', type=int)
+
+
 class QuestionScraper(Scraper):
 
+    index_url = ('http://www.cdep.ro/pls/parlam/'
+                 'interpelari.lista?tip=&dat={year}&idl=1')
+
     title_pattern = re.compile(r'^(?P<type>Întrebarea|Interpelarea) '
                                r'(adresată .*)?'
                                r'nr\.')
@@ -121,18 +138,53 @@ class QuestionScraper(Scraper):
         question.update(patch)
         return question
 
-    def run(self, year):
-        index = self.fetch_url('http://www.cdep.ro/pls/parlam/'
-                               'interpelari.lista?tip=&dat={year}&idl=1'
-                               .format(year=year))
-        for link in pqitems(index, '#pageContent table a'):
-            href = link.attr('href')
+    def list_question_urls(self, year, stream=False):
+        """ Links from the year's index page. With `stream`, the page is
+        parsed as it downloads, and links are yielded right away. """
+        url = self.index_url.format(year=year)
+        if stream:
+            for link in self.iterparse_url(url, 'a'):
+                if IN_CONTENT_TABLE(link):
+                    yield absolute_url(link, link.get('href'))
+
+        else:
+            index = self.fetch_url(url)
+            for link in pqitems(index, '#pageContent table a'):
+                yield link.attr('href')
+
+    def run(self, year, stream=False, incremental=False, cursor=None):
+        """ Questions from the year's index, except those that `skip`, or
+        that an interrupted run with the same `cursor` got already.
+        With `incremental`, we stop at the first skipped question once the
+        index is known to list the newest questions first (`idi` going
+        down); since ids are given out in registration order, the rest of
+        the index is older, so we have it already. If the index turns out
+        to be in some other order, every link is checked. """
+        newest_first = None
+        last_idi = None
+        for href in self.list_question_urls(year, stream):
             if href in url_skip:
                 continue
             assert href.startswith('http://www.cdep.ro/pls/'
                                    'parlam/interpelari.detalii')
 
-            if self.skip(href):
+            idi = question_idi(href)
+            if newest_first is not False and last_idi is not None:
+                if idi > last_idi:
+                    logger.info("The question index isn't sorted newest "
+                                "first, checking every question")
+                    newest_first = False
+                elif idi < last_idi:
+                    newest_first = True
+            last_idi = idi
+
+            if cursor is not None and cursor.is_done(href):
+                # older questions, after this one, may still be missing
+                logger.debug('already done in this run: %r', href)
+            elif self.skip(href):
                 logger.debug('skipping %r', href)
+                if incremental and newest_first:
+                    logger.info("Reached questions we already have")
+                    return
             else:
                 yield self.get_question(href)
@@ -0,0 +1,239 @@
+""" Decide which pages to fetch again, based on how often they change """
+
+import re
+import math
+import hashlib
+import threading
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from mptracker import models
+from mptracker.scraper.common import with_content
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PROPOSAL_URL = ('http://www.cdep.ro/pls/proiecte/upl_pck.proiect'
+                '?idp=%d&cam=%d')
+VOTE_DAY_URL = 'http://www.cdep.ro/pls/steno/evot.data?dat=%s'
+
+KINDS = [
+    ('question', re.compile(r'/parlam/interpelari\.detalii\?')),
+    ('proposal', re.compile(r'/proiecte/upl_pck\.proiect\?')),
+    ('vote_day', re.compile(r'/steno/evot\.data\?')),
+]
+
+# expected number of changes per day, before we've seen a page change
+PRIOR_RATE = {
+    ('question', 'unanswered'): 1 / 14,
+    ('question', 'answered'): 1 / 365,
+    ('proposal', 'inprogress'): 1 / 14,
+    ('proposal', 'settled'): 1 / 365,
+    ('vote_day', 'recent'): 1 / 2,
+    ('vote_day', 'settled'): 1 / 60,
+}
+
+# how many days of observation the prior is worth
+PRIOR_DAYS = 30
+
+# vote days fetch every voting session of the day; this is the cost of a
+# day until we have votes in the database to average over
+DEFAULT_VOTE_DAY_COST = 20
+
+
+def page_kind(url):
+    for kind, pattern in KINDS:
+        if pattern.search(url):
+            return kind
+    return None
+
+
+def _days(delta):
+    return delta.total_seconds() / (24 * 3600)
+
+
+def change_probability(row, prior_rate, now):
+    """ Chance that the page changed since we last fetched it. The change
+    rate is a Poisson rate estimated from the changes we saw, starting
+    from `prior_rate`; pages we never fetched count as last seen
+    `PRIOR_DAYS` ago. """
+    if row is None or row.last_fetch is None:
+        return 1 - math.exp(-prior_rate * PRIOR_DAYS)
+    exposure = _days(row.last_fetch - row.first_fetch)
+    rate = ((prior_rate * PRIOR_DAYS + row.change_count) /
+            (PRIOR_DAYS + exposure))
+    return 1 - math.exp(-rate * _days(now - row.last_fetch))
+
+
+class PageTracker:
+    """ Response hook that notes the content hash of each question,
+    proposal and vote day page downloaded by a session. `save` updates
+    their `crawl_page` rows and takes them off the schedule. """
+
+    def __init__(self):
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, response, **extra):
+        first = response.history[0] if response.history else response
+        kind = page_kind(first.url)
+        if kind is None:
+            return response
+
+        url = first.url
+        if response.status_code == 304:
+            # revalidated, so it didn't change
+            self.note(url, kind, None)
+
+        elif response.status_code == 200 and \
+                not getattr(response, 'from_cache', False):
+            # a streamed page is hashed once the caller has read it
+            with_content(response, lambda content: self.note(
+                url, kind, hashlib.sha1(content).hexdigest()))
+
+        return response
+
+    def note(self, url, kind, content_hash):
+        with self.lock:
+            self.seen[url] = (kind, content_hash, datetime.utcnow())
+
+    def save(self):
+        with self.lock:
+            seen = dict(self.seen)
+            self.seen.clear()
+
+        n_changed = 0
+        for url, (kind, content_hash, fetch_time) in sorted(seen.items()):
+            row = models.CrawlPage.query.get(url)
+            if row is None:
+                row = models.CrawlPage(url=url, kind=kind,
+                                       fetch_count=0, change_count=0)
+                models.db.session.add(row)
+            if row.first_fetch is None:
+                row.first_fetch = fetch_time
+            elif content_hash and row.content_hash and \
+                    content_hash != row.content_hash:
+                row.change_count += 1
+                row.last_change = fetch_time
+                n_changed += 1
+            if content_hash:
+                row.content_hash = content_hash
+            row.last_fetch = fetch_time
+            row.fetch_count += 1
+            row.priority = None
+
+        models.db.session.commit()
+        if seen:
+            logger.info("Tracked %d pages, %d changed", len(seen), n_changed)
+
+
+def vote_day_cost():
+    """ Average number of voting sessions in a day with votes, plus the
+    day's own page """
+    (n_sessions, n_days) = models.db.session.query(
+        func.count(models.VotingSession.id),
+        func.count(func.distinct(models.VotingSession.date)),
+    ).one()
+    if not n_days:
+        return DEFAULT_VOTE_DAY_COST
+    return 1 + n_sessions / n_days
+
+
+def iter_candidates(today, vote_days):
+    """ Yield (kind, url, prior change rate, cost) for each page that
+    could be fetched again """
+    question_query = (
+        models.db.session.query(models.Question.url, models.Answer.id)
+        .outerjoin(models.Answer)
+        .filter(models.Question.url != None)
+        .yield_per(1000)
+    )
+    for (url, answer_id) in question_query:
+        if not url:
+            continue
+        state = 'unanswered' if answer_id is None else 'answered'
+        yield ('question', url, PRIOR_RATE['question', state], 1)
+
+    proposal_query = (
+        models.db.session.query(
+            models.Proposal.cdeppk_cdep,
+            models.Proposal.status,
+        )
+        .filter(models.Proposal.cdeppk_cdep != None)
+        .yield_per(1000)
+    )
+    for (pk, status) in proposal_query:
+        state = 'inprogress' if status == 'inprogress' else 'settled'
+        yield ('proposal', PROPOSAL_URL % (pk, 2),
+               PRIOR_RATE['proposal', state], 1)
+
+    cost = vote_day_cost()
+    for n in range(1, vote_days + 1):
+        day = today - timedelta(days=n)
+        state = 'recent' if n <= 7 else 'settled'
+        yield ('vote_day', VOTE_DAY_URL % day.strftime('%Y%m%d'),
+               PRIOR_RATE['vote_day', state], cost)
+
+
+def plan(budget, vote_days=30, now=None):
+    """ Put the pages most likely to have changed on the schedule, as
+    long as their estimated number of requests fits in `budget`. Returns
+    a list of (probability, kind, url). """
+    if now is None:
+        now = datetime.utcnow()
+
+    # only what `change_probability` needs, not whole rows
+    history_query = (
+        models.db.session.query(
+            models.CrawlPage.url,
+            models.CrawlPage.first_fetch,
+            models.CrawlPage.last_fetch,
+            models.CrawlPage.change_count,
+        )
+        .yield_per(1000)
+    )
+    history = {row.url: row for row in history_query}
+    scored = [
+        (change_probability(history.get(url), prior_rate, now),
+         kind, url, cost)
+        for (kind, url, prior_rate, cost)
+        in iter_candidates(now.date(), vote_days)
+    ]
+    scored.sort(key=lambda item: -item[0])
+
+    work_list = []
+    spent = 0
+    for (probability, kind, url, cost) in scored:
+        if spent + cost > budget:
+            continue
+        spent += cost
+        work_list.append((probability, kind, url))
+
+    models.CrawlPage.query.update({'priority': None})
+    for (probability, kind, url) in work_list:
+        row = models.CrawlPage.query.get(url) if url in history else None
+        if row is None:
+            row = models.CrawlPage(url=url, kind=kind,
+                                   fetch_count=0, change_count=0)
+            models.db.session.add(row)
+        row.priority = probability
+    models.db.session.commit()
+
+    kind_count = Counter(kind for (_, kind, _) in work_list)
+    logger.info("Scheduled %s; about %d requests",
+                ', '.join('%d %s' % (n, kind)
+                          for kind, n in sorted(kind_count.items())),
+                spent)
+    return work_list
+
+
+def scheduled_urls(kind):
+    """ Urls of this kind on the schedule, most likely to change first """
+    query = (
+        models.db.session.query(models.CrawlPage.url)
+        .filter_by(kind=kind)
+        .filter(models.CrawlPage.priority != None)
+        .order_by(models.CrawlPage.priority.desc())
+    )
+    return [row[0] for row in query]
@@ -1,7 +1,6 @@
 from pyquery import PyQuery as pq
 from mptracker.scraper.common import (Scraper, url_args, GenericModel,
                                       parse_profile_url, parse_date)
-from mptracker.scraper.common import create_throttle
 
 
 class RomaniaCurata(Scraper):
@@ -27,7 +26,6 @@ class RomaniaCurata(Scraper):
 
         for url in url_set:
             print(url)
-            create_throttle(20)
             main_page = self.fetch_url(url)
 
             name_link = main_page.find('.entry-title').text()
@@ -0,0 +1,81 @@
+""" Google Drive spreadsheets, skipped when they didn't change since the
+last import """
+
+import hashlib
+import logging
+from datetime import datetime
+from mptracker import models
+from mptracker.scraper.common import fetch_gdrive_csv, csv_reader
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class SheetImport:
+    """ The CSV sheets read by one import. The requests are conditional on
+    the validators from the last import, and the content is compared to
+    its hash; `changed` is False if no sheet changed, so the import can be
+    skipped. With `force`, the sheets always count as changed. """
+
+    def __init__(self, name, keys, force=False):
+        self.name = name
+        self.known = {
+            row.key: row for row in
+            models.GdriveSheet.query
+            .filter(models.GdriveSheet.key.in_(keys))
+        }
+        self.fetched = {}
+        for key in keys:
+            self.fetched[key] = self._fetch(key, conditional=not force)
+
+        self.changed = force or any(
+            self._is_new(key, resp) for key, resp in self.fetched.items()
+        )
+
+        if not self.changed:
+            logger.info("%s: sheets didn't change since the last import",
+                        self.name)
+            return
+
+        # other sheets changed, so we need the content of all of them
+        for key, resp in self.fetched.items():
+            if resp.status_code == 304:
+                self.fetched[key] = self._fetch(key, conditional=False)
+
+    def _fetch(self, key, conditional):
+        headers = {}
+        row = self.known.get(key)
+        if conditional and row is not None:
+            if row.etag:
+                headers['If-None-Match'] = row.etag
+            if row.last_modified:
+                headers['If-Modified-Since'] = row.last_modified
+        return fetch_gdrive_csv(key, headers)
+
+    def _is_new(self, key, resp):
+        if resp.status_code == 304:
+            return False
+        row = self.known.get(key)
+        return row is None or self._hash(resp) != row.content_hash
+
+    def _hash(self, resp):
+        return hashlib.sha1(resp.content).hexdigest()
+
+    def reader(self, key):
+        return csv_reader(self.fetched[key].content)
+
+    def save(self):
+        """ Store the hashes and validators of the imported sheets. They
+        are added to the database session, so they only stick if the
+        import gets committed. """
+        now = datetime.utcnow()
+        for key, resp in sorted(self.fetched.items()):
+            row = self.known.get(key)
+            if row is None:
+                row = models.GdriveSheet(key=key)
+                models.db.session.add(row)
+                self.known[key] = row
+            row.content_hash = self._hash(resp)
+            row.etag = resp.headers.get('ETag')
+            row.last_modified = resp.headers.get('Last-Modified')
+            row.time = now
@@ -0,0 +1,158 @@
+""" Per-URL-pattern counters for scraper sessions """
+
+import json
+import time
+import threading
+import logging
+from collections import defaultdict
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def url_pattern(url):
+    """ Group URLs by the last component of their path, e.g.
+    `evot.nominal` or `upl_pck.proiect` """
+    parts = urlparse(url)
+    return parts.path.rsplit('/', 1)[-1] or parts.netloc
+
+
+def latency_bucket(seconds):
+    ms = seconds * 1000
+    for bound in LATENCY_BUCKETS:
+        if ms <= bound:
+            return '<=%d' % bound
+    return '>%d' % LATENCY_BUCKETS[-1]
+
+
+class PatternStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.status = defaultdict(int)
+        self.latency = defaultdict(int)
+        self.bytes = 0
+        self.download_time = 0.0
+        self.throttle_time = 0.0
+        self.parse_time = 0.0
+        self.pages_parsed = 0
+        self.retries = 0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'status': {str(k): v for k, v in sorted(self.status.items())},
+            'latency_ms': dict(self.latency),
+            'bytes': self.bytes,
+            'download_time': round(self.download_time, 3),
+            'throttle_time': round(self.throttle_time, 3),
+            'parse_time': round(self.parse_time, 3),
+            'pages_parsed': self.pages_parsed,
+            'retries': self.retries,
+        }
+
+
+class Telemetry:
+    """ Collects request, cache, latency, throttle and parse statistics for
+    a scraper session. It's safe to share between threads. """
+
+    def __init__(self):
+        self.stats = defaultdict(PatternStats)
+        self.rates = []
+        self.last_rate = {}
+        self.t0 = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record_response(self, response):
+        from_cache = getattr(response, 'from_cache', False)
+        with self.lock:
+            stats = self.stats[url_pattern(response.url)]
+            stats.requests += 1
+            stats.status[response.status_code] += 1
+            if getattr(response, '_content_consumed', True):
+                stats.bytes += len(response.content)
+            else:
+                # don't read the body of a streamed response
+                stats.bytes += int(response.headers.get('Content-Length', 0))
+            if from_cache:
+                stats.cache_hits += 1
+            else:
+                seconds = response.elapsed.total_seconds()
+                stats.download_time += seconds
+                stats.latency[latency_bucket(seconds)] += 1
+
+    def record_throttle(self, url, seconds):
+        with self.lock:
+            self.stats[url_pattern(url)].throttle_time += seconds
+
+    def record_retry(self, url):
+        with self.lock:
+            self.stats[url_pattern(url)].retries += 1
+
+    def record_parse(self, url, seconds):
+        with self.lock:
+            stats = self.stats[url_pattern(url)]
+            stats.parse_time += seconds
+            stats.pages_parsed += 1
+
+    def record_rate(self, host, rate):
+        """ Note the request rate chosen by the throttle; changes of less
+        than 5% are skipped to keep the history short """
+        with self.lock:
+            last = self.last_rate.get(host)
+            if last is not None and abs(rate - last) < last * 0.05:
+                return
+            self.last_rate[host] = rate
+            self.rates.append({
+                'time': round(time.monotonic() - self.t0, 3),
+                'host': host,
+                'rate': round(rate, 3),
+            })
+
+    def create_hook(self):
+        """ Response hook that records every response of the session """
+        def hook(response, **extra):
+            self.record_response(response)
+            return response
+        return hook
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                pattern: stats.as_dict()
+                for pattern, stats in sorted(self.stats.items())
+            }
+
+    def log_summary(self):
+        stats_list = sorted(
+            self.as_dict().items(),
+            key=lambda item: -(item[1]['download_time'] +
+                               item[1]['throttle_time'] +
+                               item[1]['parse_time']),
+        )
+        for host in sorted(self.last_rate):
+            host_rates = [r['rate'] for r in self.rates if r['host'] == host]
+            logger.info("Request rate for %s: %.2f to %.2f, last %.2f "
+                        "requests/s", host, min(host_rates), max(host_rates),
+                        host_rates[-1])
+        if not stats_list:
+            return
+        logger.info("%-24s %8s %8s %10s %10s %10s %10s",
+                    "URL pattern", "requests", "cached", "kb",
+                    "download", "throttle", "parse")
+        for (pattern, stats) in stats_list:
+            logger.info("%-24s %8d %8d %10d %10.2f %10.2f %10.2f",
+                        pattern, stats['requests'], stats['cache_hits'],
+                        stats['bytes'] / 1024, stats['download_time'],
+                        stats['throttle_time'], stats['parse_time'])
+
+    def save(self, json_path):
+        with open(json_path, 'w') as f:
+            data = {'urls': self.as_dict(), 'rates': self.rates}
+            json.dump(data, f, indent=2, sort_keys=True)
@@ -1,10 +1,13 @@
 """ Fetch and parse transcripts """
 
+import asyncio
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 from pyquery import PyQuery as pq
-from mptracker.scraper.common import (Scraper, pqitems, get_cached_session,
-                                      parse_profile_url, open_scraper_resource)
+from mptracker.scraper.common import (Scraper, get_cached_session,
+                                      parse_profile_url, open_scraper_resource,
+                                      AsyncFetcher, absolute_url,
+                                      find_containing, text_content, ancestors)
 
 
 class Session:
@@ -31,19 +34,24 @@ class TranscriptScraper(Scraper):
     transcript_url = ('http://www.cdep.ro/pls/steno/steno.data'
                       '?cam=2&idl=1&dat=%s')
 
+    absolute_links = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def get_session_date(self, page):
-        td = page.find(':contains("Sunteţi în secţiunea")')
-        date_str = td.parent().text().split()[-1]
+        parents = []
+        for td in find_containing(page[0], "Sunteţi în secţiunea"):
+            if td.getparent() not in parents:
+                parents.append(td.getparent())
+        date_str = text_content(*parents).split()[-1]
         if date_str == '>':
             return None
         return datetime.strptime(date_str, '%d-%m-%Y').date()
 
     def chapters_for_session(self, page):
         for link_el in page('td.headlinetext1 b a'):
-            link = link_el.attrib['href']
+            link = absolute_url(page, link_el.attrib['href'])
             plink = urlparse(link)
             assert plink.path == '/pls/steno/steno.stenograma', \
                     "%s -> %s" % (self.cdeppk, link)
@@ -56,13 +64,6 @@ class TranscriptScraper(Scraper):
             headline = pq(headline_el).text()
             yield link, headline
 
-    def get_chapter_serial(self):
-        return '%05d/%02d' % (self.session_cdeppk, self.chapter_serial)
-
-    def next_paragraph_serial(self):
-        self.paragraph_serial += 1
-        return self.get_chapter_serial() + '-%03d' % self.paragraph_serial
-
     def trim_name(self, name):
         name = name.replace(' (din sală)', '')
         for prefix in ['Domnul ', 'Doamna ', 'Domnişoara ']:
@@ -71,66 +72,141 @@ class TranscriptScraper(Scraper):
         else:
             return name
 
-    def parse_transcript_page(self, link):
-        page = self.fetch_url(link)
-        table_rows = pqitems(page, '#pageContent > table tr')
+    def iter_paragraphs(self, page, chapter_serial):
+        """ Walk the chapter page once and yield each paragraph as soon as
+        it's complete. Paragraphs of speakers without a profile link are
+        skipped, but they still get a serial number. """
+        paragraph_serial = 0
         transcript = None
-        transcript_chapter = Chapter()
-
-        def save_paragraph():
-            text = "\n".join(transcript.pop('text_buffer'))
-            transcript['text'] = text
-            transcript_chapter.paragraphs.append(transcript)
-
-        for tr in table_rows:
-            for td in pqitems(tr, 'td'):
-                for paragraph in pqitems(td, 'p'):
-                    speakers = paragraph('b font[color="#0000FF"]')
-                    if speakers:
-                        if transcript:
-                            save_paragraph()
-                        serial = self.next_paragraph_serial()
-                        assert len(speakers) == 1
-                        speaker_name = self.trim_name(speakers.text())
-                        link = speakers.parents('a')
-                        if not link:
-                            transcript = None
-                            continue
-                        (year, chamber, number) = \
-                            parse_profile_url(link.attr('href'))
-                        transcript = Transcript({
-                            'mandate_year': year,
-                            'mandate_chamber': chamber,
-                            'mandate_number': number,
-                            'speaker_name': speaker_name,
-                            'text_buffer': [],
-                            'serial': serial,
-                        })
-
-                    else:
-                        if transcript is None:
-                            continue
-                        text = paragraph.text()
-                        transcript['text_buffer'].append(text)
+        text_buffer = []
+
+        def finish():
+            transcript['text'] = "\n".join(text_buffer)
+            return transcript
+
+        for table in page[0].xpath('//*[@id="pageContent"]/table'):
+            for paragraph in table.iterdescendants('p'):
+                if next(paragraph.iterancestors('td', 'table')).tag != 'td':
+                    continue
+                speakers = paragraph.xpath(
+                    './/b//font[@color="#0000FF"]')
+                if speakers:
+                    if transcript:
+                        yield finish()
+                    transcript = None
+                    text_buffer = []
+                    paragraph_serial += 1
+                    serial = chapter_serial + '-%03d' % paragraph_serial
+                    assert len(speakers) == 1
+                    speaker_name = self.trim_name(text_content(*speakers))
+                    link = ancestors(speakers, 'a')
+                    if not link:
+                        continue
+                    (year, chamber, number) = \
+                        parse_profile_url(link[0].attrib.get('href'))
+                    transcript = Transcript({
+                        'mandate_year': year,
+                        'mandate_chamber': chamber,
+                        'mandate_number': number,
+                        'speaker_name': speaker_name,
+                        'serial': serial,
+                    })
+
+                elif transcript is not None:
+                    text_buffer.append(text_content(paragraph))
 
         if transcript:
-            save_paragraph()
+            yield finish()
 
+    def parse_transcript_page(self, page, chapter_serial):
+        transcript_chapter = Chapter()
+        transcript_chapter.paragraphs = \
+            list(self.iter_paragraphs(page, chapter_serial))
         return transcript_chapter
 
-    def fetch_session(self, cdeppk):
-        self.session_cdeppk = cdeppk
-        self.chapter_serial = 0
+    def iter_chapters(self, cdeppk, session_page, get_chapter_page):
+        """ Yield the chapters of a session, fetching each page only when
+        its chapter is reached. `paragraphs` are generators. """
+        for n, (link, headline) in enumerate(
+                self.chapters_for_session(session_page), 1):
+            transcript_chapter = Chapter()
+            transcript_chapter.headline = headline
+            transcript_chapter.serial = '%05d/%02d' % (cdeppk, n)
+            transcript_chapter.paragraphs = self.iter_paragraphs(
+                get_chapter_page(link), transcript_chapter.serial)
+            yield transcript_chapter
+
+    def parse_session(self, cdeppk, session_page, get_chapter_page,
+                      stream=False):
+        """ Build a `Session` from its summary page. `get_chapter_page` is
+        called, in order, with the link of each chapter. With `stream`,
+        chapters and paragraphs are generators, so a long session is
+        never held in memory at once. """
         transcript_session = Session()
-        session_page = self.fetch_url(self.session_url % self.session_cdeppk)
         transcript_session.date = self.get_session_date(session_page)
         if transcript_session.date is None:
             return None
-        for link, headline in self.chapters_for_session(session_page):
-            self.chapter_serial += 1
-            self.paragraph_serial = 0
-            transcript_chapter = self.parse_transcript_page(link)
+        chapters = self.iter_chapters(cdeppk, session_page, get_chapter_page)
+        if stream:
+            transcript_session.chapters = chapters
+        else:
+            for transcript_chapter in chapters:
+                transcript_chapter.paragraphs = \
+                    list(transcript_chapter.paragraphs)
+                transcript_session.chapters.append(transcript_chapter)
+        return transcript_session
+
+    def fetch_session(self, cdeppk, stream=False):
+        session_page = self.fetch_url(self.session_url % cdeppk)
+        return self.parse_session(cdeppk, session_page, self.fetch_url,
+                                  stream)
+
+    async def fetch_session_async(self, cdeppk, fetcher):
+        session_page = await fetcher.fetch_url(self.session_url % cdeppk)
+        if self.get_session_date(session_page) is None:
+            return None
+        links = [link for link, _ in self.chapters_for_session(session_page)]
+        pages = await asyncio.gather(*[fetcher.fetch_url(l) for l in links])
+        chapter_page = dict(zip(links, pages))
+        return self.parse_session(cdeppk, session_page, chapter_page.get)
+
+    def fetch_session_pipeline(self, cdeppk):
+        """ Like `fetch_session`, but the chapter pages are parsed by the
+        scraper's `ParsePipeline`, several at a time """
+        session_page = self.fetch_url(self.session_url % cdeppk)
+        transcript_session = Session()
+        transcript_session.date = self.get_session_date(session_page)
+        if transcript_session.date is None:
+            return None
+        chapters = list(self.chapters_for_session(session_page))
+        serial_list = ['%05d/%02d' % (cdeppk, n)
+                       for n in range(1, len(chapters) + 1)]
+        paragraphs_list = self.get_pipeline().map(
+            parse_chapter_page, [link for link, _ in chapters], serial_list)
+        for ((link, headline), serial, paragraphs) in \
+                zip(chapters, serial_list, paragraphs_list):
+            transcript_chapter = Chapter()
             transcript_chapter.headline = headline
-            transcript_chapter.serial = self.get_chapter_serial()
+            transcript_chapter.serial = serial
+            transcript_chapter.paragraphs = paragraphs
             transcript_session.chapters.append(transcript_chapter)
         return transcript_session
+
+    def fetch_sessions(self, cdeppk_list, max_in_flight=8):
+        """ Fetch several sessions, and their chapter pages, concurrently.
+        Yields a `Session` object (or `None` for a session without content)
+        for each item of `cdeppk_list`, in order; at most `max_in_flight`
+        sessions are being fetched or waiting to be consumed. """
+        fetcher = AsyncFetcher(self, max_in_flight)
+        return fetcher.iter_results(
+            (self.fetch_session_async(cdeppk, fetcher)
+             for cdeppk in cdeppk_list),
+            window=max_in_flight,
+        )
+
+
+def parse_chapter_page(content, url, chapter_serial):
+    """ The paragraphs of a chapter page, for a `ParsePipeline` worker """
+    scraper = TranscriptScraper()
+    page = scraper.load_page(content, url)
+    return scraper.parse_transcript_page(page, chapter_serial).paragraphs
@@ -1,7 +1,9 @@
 import logging
-from pyquery import PyQuery as pq
+from lxml import etree
 from mptracker.scraper.common import (Scraper, GenericModel, url_args,
-                                      parse_profile_url)
+                                      parse_profile_url, absolute_url,
+                                      find_containing, ancestors,
+                                      text_content, inner_html)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -28,58 +30,84 @@ def parse_choice(text):
         raise RuntimeError("Unknown vote choice %r" % text)
 
 
+PROPOSAL_LINK = etree.XPath('.//a[@target="PROIECTE"]')
+
+
 class VoteScraper(Scraper):
 
     DAY_URL = 'http://www.cdep.ro/pls/steno/evot.data?dat=%s'
     VOTE_URL = 'http://www.cdep.ro/pls/steno/evot.nominal?idv=%d'
 
+    absolute_links = False
+
     def scrape_day(self, day):
         url = self.DAY_URL % day.strftime('%Y%m%d')
         page = self.fetch_url(url)
         table = page.find('#pageContent table')
+        vote_cdeppk_list = []
         for link in table.items('td:nth-child(1) a'):
-            href = link.attr('href')
+            href = absolute_url(page, link.attr('href'))
             assert href.startswith('http://www.cdep.ro/pls/'
                                    'steno/evot.nominal?idv=')
-            vote_cdeppk = url_args(href).get('idv', type=int)
-            yield self.scrape_vote(vote_cdeppk)
+            vote_cdeppk_list.append(url_args(href).get('idv', type=int))
+
+        vote_cdeppk_list.sort()
+        url_list = [self.VOTE_URL % pk for pk in vote_cdeppk_list]
+        if self.processes:
+            yield from self.get_pipeline().map(parse_vote_page, url_list)
+            return
+
+        vote_pages = self.fetch_urls(url_list)
+        for vote_cdeppk, vote_page in zip(vote_cdeppk_list, vote_pages):
+            yield self.parse_vote(vote_cdeppk, vote_page)
 
     def scrape_vote(self, vote_cdeppk):
         url = self.VOTE_URL % vote_cdeppk
         page = self.fetch_url(url)
-        subject_label = list(page.items(':contains("Subiect vot:")'))[0]
-        subject_td = list(subject_label.parent().items('td'))[1]
+        return self.parse_vote(vote_cdeppk, page)
+
+    def parse_vote(self, vote_cdeppk, page):
+        root = page[0]
+        subject_label = find_containing(root, "Subiect vot:")[0]
+        subject_td = list(subject_label.getparent().iter('td'))[1]
         voting_session = VotingSession(
             cdeppk=vote_cdeppk,
-            subject=subject_td.text(),
-            subject_html=subject_td.html(),
+            subject=text_content(subject_td),
+            subject_html=inner_html(subject_td),
             votes=[],
             proposal_cdeppk=None,
         )
-        proposal_link = subject_td.find('a[target=PROIECTE]')
+        proposal_link = PROPOSAL_LINK(subject_td)
         if proposal_link:
-            href = proposal_link.attr('href')
+            href = absolute_url(page, proposal_link[0].get('href'))
             if href.startswith('http://www.cdep.ro/pls/proiecte'
                                '/upl_pck.proiect?idp='):
                 args = url_args(href)
                 voting_session.proposal_cdeppk = args.get('idp', type=int)
 
-        td_nr_crt = page.find(':contains("Nr. Crt.")')
-        table = pq(td_nr_crt.parents().filter('table')[-1])
+        td_nr_crt = find_containing(root, "Nr. Crt.")
+        table = ancestors(td_nr_crt, 'table')[-1]
         role_call = bool(voting_session.subject.startswith('Prezenţă'))
-        for row in list(table.items('tr'))[1:]:
-            link = row.find('a')
-            (year, chamber, number) = parse_profile_url(link.attr('href'))
+        for row in list(table.iter('tr'))[1:]:
+            links = row.findall('.//a')
+            (year, chamber, number) = parse_profile_url(links[0].get('href'))
             assert chamber == 2
-            choice_td = list(row.items('td'))[-1]
+            choice_td = list(row.iter('td'))[-1]
             vote = Vote(
                 mandate_year=year,
                 mandate_number=number,
-                mandate_name=link.text(),
+                mandate_name=text_content(*links),
                 choice=None,
             )
             if not role_call:
-                vote.choice = parse_choice(choice_td.text())
+                vote.choice = parse_choice(text_content(choice_td))
             voting_session.votes.append(vote)
 
         return voting_session
+
+
+def parse_vote_page(content, url):
+    """ `VoteScraper.parse_vote`, for a `ParsePipeline` worker """
+    scraper = VoteScraper()
+    page = scraper.load_page(content, url)
+    return scraper.parse_vote(url_args(url).get('idv', type=int), page)
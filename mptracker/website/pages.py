@@ -33,8 +33,35 @@ def section(name):
     return decorator
 
 
-def picture_url(person):
-    picture_rel_path = path('pictures/2016') / person.picture_filename
+PICTURES_DIR = path('pictures/2016')
+
+_picture_manifest = {'mtime': None, 'entries': {}}
+
+
+def picture_manifest():
+    """ Thumbnails made by `get_pictures`, reloaded when the file changes """
+    manifest_path = (path(flask.current_app.static_folder) /
+                     PICTURES_DIR / 'manifest.json')
+    mtime = manifest_path.mtime if manifest_path.isfile() else None
+    if mtime != _picture_manifest['mtime']:
+        entries = {}
+        if mtime is not None:
+            with open(manifest_path) as f:
+                entries = flask.json.load(f)
+        _picture_manifest.update(mtime=mtime, entries=entries)
+    return _picture_manifest['entries']
+
+
+def _thumbnail_url(filename):
+    return flask.url_for('static', filename=PICTURES_DIR / filename)
+
+
+def picture_url(person, size=300):
+    entry = picture_manifest().get(person.person.slug)
+    if entry is not None:
+        return _thumbnail_url(entry['sizes'][str(size)]['jpg'])
+
+    picture_rel_path = PICTURES_DIR / person.picture_filename
     if (path(flask.current_app.static_folder) / picture_rel_path).isfile():
         return flask.url_for(
             'static',
@@ -42,6 +69,21 @@ def picture_url(person):
         )
 
 
+def picture_srcset(person):
+    """ `srcset` values for the person's thumbnails, by format """
+    entry = picture_manifest().get(person.person.slug)
+    if entry is None:
+        return None
+    sizes = sorted(entry['sizes'].items(), key=lambda item: int(item[0]))
+    return {
+        fmt: ', '.join(
+            '%s %sw' % (_thumbnail_url(by_format[fmt]), size)
+            for (size, by_format) in sizes
+        )
+        for fmt in ['jpg', 'webp']
+    }
+
+
 def logo_url(party):
     picture_rel_path = path('parties') / party.logo_filename
     if (path(flask.current_app.static_folder) / picture_rel_path).isfile():
@@ -161,7 +203,8 @@ def home():
     migration_list = []
     for item in dal.get_migrations(limit=2):
         person = dal.get_person(item['person']['slug'])
-        item['person']['picture_url'] = picture_url(person)
+        item['person']['picture_url'] = picture_url(person, size=60)
+        item['person']['picture_srcset'] = picture_srcset(person)
         migration_list.append(item)
 
     similarity_person = dal.get_person('ponta-victor-viorel')
@@ -298,6 +341,7 @@ def _person_detail_data(person_slug):
     ctx['policy_domains'] = person.get_top_policies()
     ctx['breadcrumb'] = ['Deputați', ctx['name']]
     ctx['picture_url'] = picture_url(person)
+    ctx['picture_srcset'] = picture_srcset(person)
 
     ctx['recent_activity'] = person.get_recent_activity(limit=3, limit_each=2)
     for item in ctx['recent_activity']:
@@ -0,0 +1,26 @@
+import pytest
+import flask
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.dialects.postgresql import UUID, DATERANGE
+
+
+# sqlite has no column types for these, it stores them as text
+@compiles(UUID, 'sqlite')
+@compiles(DATERANGE, 'sqlite')
+def _compile_as_text(type_, compiler, **kw):
+    return 'TEXT'
+
+
+@pytest.fixture
+def models_app(request):
+    """ An app on an in-memory sqlite database, with the tables of
+    `mptracker.models` """
+    from mptracker import models
+    app = flask.Flask('__main__')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    models.db.init_app(app)
+    ctx = app.app_context()
+    ctx.push()
+    request.addfinalizer(ctx.pop)
+    models.db.create_all()
+    return app
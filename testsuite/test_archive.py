@@ -0,0 +1,57 @@
+from datetime import date
+from path import path
+
+PAGES_DIR = path(__file__).abspath().parent / 'pages'
+STENO_URL = 'http://www.cdep.ro/pls/steno/'
+
+
+def test_pages_are_stored_once(tmpdir):
+    from mptracker.scraper.archive import PageArchive
+    archive = PageArchive(str(tmpdir))
+    h1 = archive.save('http://example.com/a', b'hello', fetched_at=1)
+    h2 = archive.save('http://example.com/b', b'hello', fetched_at=2)
+    archive.save('http://example.com/a', b'world', fetched_at=3)
+    assert h1 == h2
+    assert len(list(path(str(tmpdir)).walkfiles('*.gz'))) == 2
+    assert archive.latest('http://example.com/a') == b'world'
+    assert archive.latest('http://example.com/b') == b'hello'
+    assert archive.latest('http://example.com/c') is None
+
+
+class RawCodec:
+
+    suffix = '.raw'
+
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+
+def test_archive_codec(tmpdir, monkeypatch):
+    from mptracker.scraper.archive import PageArchive, CODECS
+    monkeypatch.setitem(CODECS, 'raw', RawCodec)
+    PageArchive(str(tmpdir)).save('http://example.com/a', b'hello')
+    archive = PageArchive(str(tmpdir), compression='raw')
+    archive.save('http://example.com/b', b'world')
+    assert [f.bytes() for f in path(str(tmpdir)).walkfiles('*.raw')] == \
+        [b'world']
+    assert archive.latest('http://example.com/a') == b'hello'
+
+
+def test_replay_transcript(tmpdir):
+    from mptracker.scraper.archive import PageArchive, ReplaySession
+    from mptracker.scraper.transcripts import TranscriptScraper
+    archive = PageArchive(str(tmpdir))
+    archive.save(STENO_URL + 'steno.sumar?ids=7277',
+                 (PAGES_DIR / 'steno.sumar-7277').bytes())
+    for n in range(1, 13):
+        url = STENO_URL + 'steno.stenograma?ids=7277&idm=%d&idl=1' % n
+        archive.save(url, (PAGES_DIR / ('steno.stenograma-7277-%d' % n))
+                          .bytes())
+
+    scraper = TranscriptScraper(ReplaySession(archive))
+    transcript_session = scraper.fetch_session(7277)
+    assert transcript_session.date == date(2013, 6, 10)
+    assert len(transcript_session.chapters) == 12
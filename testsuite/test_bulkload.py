@@ -0,0 +1,70 @@
+from datetime import date
+
+
+def test_chunks():
+    from mptracker.scraper.bulkload import date_chunks, number_chunks
+    assert list(date_chunks(date(2013, 1, 1), date(2013, 3, 1), 30)) == [
+        (date(2013, 1, 1), date(2013, 1, 31)),
+        (date(2013, 1, 31), date(2013, 3, 1)),
+    ]
+    assert list(number_chunks(7270, 7300, 20)) == [(7270, 7289),
+                                                   (7290, 7300)]
+
+
+def test_remove_duplicate_voting_sessions(models_app):
+    from mptracker import models
+    from mptracker.scraper.bulkload import (remove_duplicates,
+                                            count_out_of_order)
+    sessions = [('a', 10, date(2013, 1, 2)), ('b', 10, date(2013, 1, 2)),
+                ('c', 11, date(2013, 1, 1)), ('d', 12, date(2013, 1, 3))]
+    models.db.session.execute(
+        models.VotingSession.__table__.insert(),
+        [{'id': i, 'cdeppk': n, 'date': d, 'subject': ''}
+         for (i, n, d) in sessions],
+    )
+    models.db.session.execute(
+        models.Vote.__table__.insert(),
+        [{'id': 'v' + i, 'voting_session_id': i, 'mandate_id': 'm'}
+         for (i, n, d) in sessions],
+    )
+
+    assert remove_duplicates(
+        models.VotingSession,
+        models.VotingSession.cdeppk,
+        [(models.Vote, models.Vote.voting_session_id)],
+    ) == 1
+    assert sorted(row.id for row in models.VotingSession.query) == \
+        ['a', 'c', 'd']
+    assert sorted(row.id for row in models.Vote.query) == \
+        ['va', 'vc', 'vd']
+    assert count_out_of_order(date(2013, 1, 1), date(2013, 2, 1)) == 1
+
+
+def test_remove_duplicates_keeps_complete_row(models_app):
+    from mptracker import models
+    from mptracker.scraper.bulkload import remove_duplicates
+    models.db.session.execute(
+        models.VotingSession.__table__.insert(),
+        [{'id': 'a', 'cdeppk': 10, 'subject': ''},
+         {'id': 'b', 'cdeppk': 10, 'subject': 'budget'}],
+    )
+    models.db.session.execute(
+        models.Vote.__table__.insert(),
+        [{'id': 'v1', 'voting_session_id': 'b', 'mandate_id': 'm1'},
+         {'id': 'v2', 'voting_session_id': 'b', 'mandate_id': 'm2'},
+         {'id': 'v3', 'voting_session_id': 'a', 'mandate_id': 'm1'}],
+    )
+    models.db.session.execute(
+        models.VotingSessionControversy.__table__.insert(),
+        [{'id': 'x', 'title': 'budget', 'voting_session_id': 'a'}],
+    )
+
+    assert remove_duplicates(
+        models.VotingSession,
+        models.VotingSession.cdeppk,
+        [(models.Vote, models.Vote.voting_session_id)],
+    ) == 1
+    assert [row.id for row in models.VotingSession.query] == ['b']
+    assert sorted(row.id for row in models.Vote.query) == ['v1', 'v2']
+    controversy = models.VotingSessionControversy.query.one()
+    assert controversy.voting_session_id == 'b'
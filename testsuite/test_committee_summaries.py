@@ -0,0 +1,80 @@
+import pytest
+from mock import Mock
+
+LISTING = '''<html><head><meta charset="utf-8"></head><body><table>
+<tr><td>Total: {count} înregistrări găsite:</td></tr>
+<tr><td>Nr. Crt.</td><td>PDF</td><td>Data</td><td>Titlu</td>
+<td>Comisia</td></tr>
+{rows}
+</table></body></html>'''
+
+ROW = '''<tr><td>{n}</td>
+<td><a target="PDF" href="http://www.cdep.ro/comisii/buget/pdf/{n}.pdf">
+pdf</a></td>
+<td>0{n}.03.2016</td><td>Sinteza {n}</td><td>Buget</td></tr>'''
+
+
+def reverse_pdf_text(pdf_bytes):
+    return pdf_bytes.decode('utf-8')[::-1]
+
+
+def listing_scraper():
+    from mptracker.scraper.committee_summaries import SummaryScraper
+
+    class ListingScraper(SummaryScraper):
+        use_cdep_opener = False
+        pdf_to_text = staticmethod(reverse_pdf_text)
+
+        def opener(self, url):
+            if '?nrc=0&' not in url:
+                return LISTING.format(count=0, rows='').encode('utf-8')
+            rows = ''.join(ROW.format(n=n) for n in range(1, 10))
+            return LISTING.format(count=9, rows=rows).encode('utf-8')
+
+    return ListingScraper
+
+
+def test_summaries_keep_listing_order():
+    ListingScraper = listing_scraper()
+    pdf_session = Mock()
+    pdf_session.get = lambda url: Mock(content=url.encode('utf-8'))
+    scraper = ListingScraper(pdf_session=pdf_session, workers=2)
+    rows = list(scraper.fetch_summaries(2016, get_pdf_text=True))
+
+    assert [row['title'] for row in rows] == \
+        ["Sinteza %d" % n for n in range(1, 10)]
+    for row in rows:
+        assert row['committee'] == 'buget'
+        assert row['text'] == row['pdf_url'][::-1]
+
+
+def test_failed_pdf_download_is_not_converted():
+    from requests import HTTPError
+    from mptracker.scraper.committee_summaries import SummaryScraper
+    pdf_to_text = Mock()
+    resp = Mock(content=b'Not found')
+    resp.raise_for_status.side_effect = HTTPError("404 Client Error")
+    scraper = SummaryScraper(pdf_session=Mock(get=Mock(return_value=resp)))
+    scraper.pdf_to_text = pdf_to_text
+    with pytest.raises(HTTPError):
+        scraper.get_pdf_text('http://www.cdep.ro/comisii/buget/pdf/1.pdf')
+    assert not pdf_to_text.called
+
+
+def test_missing_pdf_costs_only_its_text():
+    from requests import HTTPError
+    ListingScraper = listing_scraper()
+
+    def get(url):
+        resp = Mock(content=url.encode('utf-8'))
+        if url.endswith('/4.pdf'):
+            resp.raise_for_status.side_effect = HTTPError("404 Client Error")
+        return resp
+
+    scraper = ListingScraper(pdf_session=Mock(get=get), workers=2)
+    rows = list(scraper.fetch_summaries(2016, get_pdf_text=True))
+
+    assert [row['title'] for row in rows] == \
+        ["Sinteza %d" % n for n in range(1, 10)]
+    assert rows[3]['text'] is None
+    assert rows[4]['text'] == rows[4]['pdf_url'][::-1]
@@ -0,0 +1,25 @@
+import pytest
+
+
+def test_resume_skips_done_units(models_app):
+    from mptracker.scraper.cursor import CrawlCursor
+    cursor = CrawlCursor('get_votes', {'start': None, 'days': 3})
+    with cursor.unit('2013-06-10'):
+        pass
+    with pytest.raises(ValueError):
+        with cursor.unit('2013-06-11'):
+            raise ValueError
+
+    resumed = CrawlCursor('get_votes', {'days': 3, 'start': None})
+    assert resumed.is_done('2013-06-10')
+    assert not resumed.is_done('2013-06-11')
+    assert not CrawlCursor('get_votes', {'start': None, 'days': 5}).done
+
+
+def test_finish_clears_checkpoints(models_app):
+    from mptracker.scraper.cursor import CrawlCursor
+    cursor = CrawlCursor('get_transcripts', {'start': 7277})
+    with cursor.unit(7277):
+        pass
+    cursor.finish()
+    assert not CrawlCursor('get_transcripts', {'start': 7277}).done
@@ -0,0 +1,189 @@
+import time
+import pytest
+from mock import Mock
+from path import path
+
+PAGES_DIR = path(__file__).abspath().parent / 'pages'
+STENO_URL = 'http://www.cdep.ro/pls/steno/steno.stenograma?ids=7277&idm=%d'
+
+
+def test_fetch_urls_keeps_order(session):
+    from mptracker.scraper.common import Scraper
+    url_list = []
+    for n in range(1, 13):
+        url = STENO_URL % n
+        session.url_map[url] = PAGES_DIR / ('steno.stenograma-7277-%d' % n)
+        url_list.append(url)
+
+    serial = [Scraper(session).fetch_url(url).html() for url in url_list]
+    parallel = [p.html() for p in
+                Scraper(session, workers=4).fetch_urls(url_list)]
+    assert parallel == serial
+
+
+def test_rate_limiter_per_host():
+    from mptracker.scraper.common import RateLimiter
+    rate_limiter = RateLimiter(rate=20)
+    t0 = time.monotonic()
+    for n in range(5):
+        rate_limiter.acquire('http://www.cdep.ro/page')
+    rate_limiter.acquire('http://example.com/page')
+    elapsed = time.monotonic() - t0
+    assert 0.15 < elapsed < 0.5
+
+
+def test_adaptive_throttle():
+    from mptracker.scraper.common import AdaptiveThrottle, RateLimiter
+    from mptracker.scraper.telemetry import Telemetry
+    url = 'http://www.cdep.ro/page'
+    telemetry = Telemetry()
+    rate_limiter = RateLimiter(2)
+    throttle = AdaptiveThrottle(rate_limiter, floor=1, ceiling=3,
+                                increase=0.5, telemetry=telemetry)
+    for n in range(5):
+        throttle.feedback(url, 0.1, ok=True)
+    assert throttle.rate(url) == 3
+    assert throttle.rate('http://example.com/') == 2
+
+    throttle.feedback(url, 0.1, ok=False)
+    assert throttle.rate(url) == 1.5
+    # a request that started before the last backoff doesn't count
+    throttle.feedback(url, 10, ok=True)
+    assert throttle.rate(url) == 1.5
+    time.sleep(0.01)
+    throttle.feedback(url, 0.001, ok=False)
+    assert throttle.rate(url) == 1
+    assert rate_limiter.host_rate(url) == 1
+
+    assert [r['rate'] for r in telemetry.rates] == [2.5, 3, 1.5, 1]
+
+
+def test_throttle_adapts_shared_limiter():
+    from mptracker.scraper.common import create_session
+    http_session = create_session(throttle=0.5, rate=4)
+    assert http_session.rate_limiter.rate == 4
+    assert http_session.throttle.rate_limiter is http_session.rate_limiter
+    http_session.throttle.feedback('http://www.cdep.ro/', 10, ok=True)
+    assert http_session.rate_limiter.host_rate('http://www.cdep.ro/') == 2
+
+    http_session = create_session(throttle=0.5)
+    assert http_session.rate_limiter.rate == 2
+    assert not hasattr(create_session(rate=4), 'throttle')
+
+
+def test_pooled_session():
+    from mptracker.scraper.common import create_session
+    http_session = create_session(pool_size=16)
+    adapter = http_session.get_adapter('http://www.cdep.ro/')
+    assert adapter._pool_maxsize == 16
+    assert http_session.headers['Accept-Encoding'] == 'gzip, deflate'
+
+
+class FlakySession:
+    """ Answers each url with the next status in its list """
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.hooks = []
+        self.requests = []
+
+    def get(self, url, hooks=[], stream=False):
+        self.requests.append(url)
+        return Mock(status_code=self.statuses[url].pop(0))
+
+
+def test_retry_temporary_errors():
+    from mptracker.scraper.common import (Scraper, RetryPolicy, FetchError,
+                                          PageNotFoundError)
+    url = 'http://www.cdep.ro/pls/parlam/structura.mp?idm=1'
+    missing = 'http://www.cdep.ro/pls/parlam/structura.mp?idm=2'
+    down = 'http://www.cdep.ro/pls/parlam/structura.mp?idm=3'
+    session = FlakySession({
+        url: [503, 502, 200],
+        missing: [404],
+        down: [500, 500],
+    })
+    session.retry = RetryPolicy(attempts=3, base=0)
+    scraper = Scraper(session)
+
+    assert scraper.get_response(url).status_code == 200
+    assert session.requests == [url] * 3
+
+    with pytest.raises(PageNotFoundError):
+        scraper.get_response(missing)
+    assert session.requests.count(missing) == 1
+
+    session.retry.attempts = 2
+    with pytest.raises(FetchError):
+        scraper.get_response(down)
+
+
+def test_circuit_breaker(monkeypatch):
+    from mptracker.scraper.common import CircuitBreaker
+    from mptracker.scraper.telemetry import url_pattern
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+    breaker = CircuitBreaker(threshold=2, cooldown=30)
+    url = 'http://www.cdep.ro/pls/steno/steno.stenograma?ids=%d'
+    other = 'http://www.cdep.ro/pls/parlam/structura.mp?idm=1'
+
+    breaker.failure(url % 1)
+    breaker.wait(url % 2)
+    assert sleeps == []
+
+    breaker.failure(url % 3)
+    breaker.wait(url % 4)
+    breaker.wait(other)
+    assert len(sleeps) == 1 and 29 < sleeps[0] <= 30
+
+    breaker.success(url % 5)
+    breaker.failure(url % 6)
+    assert breaker.failures == {url_pattern(url % 6): 1}
+
+
+def page_length(content, url, factor):
+    return len(content) * factor
+
+
+def test_parse_pipeline(session):
+    from mptracker.scraper.common import (Scraper, ParsePipeline,
+                                          PageNotFoundError)
+    url_list = [STENO_URL % n for n in range(1, 8)]
+    for url in url_list:
+        session.url_map[url] = PAGES_DIR / 'steno.stenograma-7277-1'
+    size = len((PAGES_DIR / 'steno.stenograma-7277-1').bytes())
+    scraper = Scraper(session)
+
+    with ParsePipeline(scraper, processes=2) as pipeline:
+        assert list(pipeline.map(page_length, url_list, range(7))) == \
+            [size * n for n in range(7)]
+
+        def get_response(url):
+            if url == url_list[3]:
+                raise PageNotFoundError
+            return session.get(url)
+        scraper.get_response = get_response
+        results = list(pipeline.results(page_length, url_list, [1] * 7))
+        assert [result for (result, error) in results] == \
+            [size] * 3 + [None] + [size] * 3
+        assert isinstance(results[3][1], PageNotFoundError)
+
+
+def test_scraper_reuses_pipeline(session):
+    from mptracker.scraper.common import Scraper
+    scraper = Scraper(session, processes=2)
+    pipeline = scraper.get_pipeline()
+    assert scraper.get_pipeline() is pipeline
+    scraper.close()
+    assert scraper.get_pipeline() is not pipeline
+    scraper.close()
+
+
+def test_shared_session_warns_about_ignored_settings(monkeypatch, caplog):
+    from mptracker import scraper
+    shared = Mock()
+    monkeypatch.setattr(scraper, '_run_session', shared)
+    assert scraper._create_session(throttle=None, replay=False) is shared
+    assert "ignoring" not in caplog.text
+    assert scraper._create_session(cache_name='votes', rate=2.0) is shared
+    assert "ignoring cache_name='votes', rate=2.0" in caplog.text
@@ -0,0 +1,41 @@
+from path import path
+
+PAGES_DIR = path(__file__).abspath().parent / 'pages'
+GROUPS_URL = 'http://www.cdep.ro/pls/parlam/structura.gp?'
+
+
+def test_page_fingerprint_ignores_noise():
+    from mptracker.scraper.fingerprint import page_fingerprint
+    page = b'<html><body><p>Membri: <b>12</b></p></body></html>'
+    noisy = (b'<html>\n<body><script>var t = 1;</script>'
+             b'<!-- generated 12:00 -->\n<p>Membri:  <b>12</b></p>'
+             b'</body></html>')
+    changed = b'<html><body><p>Membri: <b>13</b></p></body></html>'
+    assert page_fingerprint(page) == page_fingerprint(noisy)
+    assert page_fingerprint(page) != page_fingerprint(changed)
+
+
+def test_unchanged_groups_are_skipped(models_app, session):
+    from mptracker import models
+    from mptracker.scraper.fingerprint import PageFingerprints
+    from mptracker.scraper.groups import GroupScraper
+    pages = {GROUPS_URL + 'leg=2012': PAGES_DIR / 'structura-index-modified'}
+    for n in [0, 1, 4]:
+        pages[GROUPS_URL + 'idg=%d' % n] = \
+            PAGES_DIR / ('structura-group%d' % n)
+    session.url_map.update(pages)
+
+    last_run = PageFingerprints('get_groups')
+    for url, page_path in pages.items():
+        assert last_run.check(url, page_path.bytes())
+    last_run.save()
+    models.db.session.commit()
+
+    scraper = GroupScraper(session)
+    scraper.fingerprints = PageFingerprints('get_groups')
+    assert scraper.fetch(2012) is None
+    assert sorted(scraper.fingerprints.seen) == sorted(pages)
+
+    forced = PageFingerprints('get_groups', force=True)
+    assert forced.check(GROUPS_URL + 'idg=0',
+                        (PAGES_DIR / 'structura-group0').bytes())
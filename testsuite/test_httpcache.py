@@ -0,0 +1,100 @@
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+
+
+@pytest.fixture
+def server(request):
+    state = {'content': b'first', 'etag': '"1"', 'hits': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            state['hits'] += 1
+            if self.headers.get('If-None-Match') == state['etag']:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', state['etag'])
+            self.send_header('Content-Length', str(len(state['content'])))
+            self.end_headers()
+            self.wfile.write(state['content'])
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    request.addfinalizer(httpd.shutdown)
+    state['url'] = 'http://127.0.0.1:%d' % httpd.server_port
+    return state
+
+
+def test_revalidate_and_refetch(server, tmpdir):
+    from mptracker.scraper.httpcache import RevalidatingSession
+    url = server['url'] + '/pls/proiecte/upl_pck.proiect?idp=1'
+    session = RevalidatingSession(str(tmpdir / 'cache.sqlite'))
+
+    assert session.get(url).content == b'first'
+    resp = session.get(url)
+    assert resp.content == b'first'
+    assert resp.from_cache
+    assert server['hits'] == 2
+
+    server['content'] = b'second'
+    server['etag'] = '"2"'
+    assert session.get(url).content == b'second'
+    assert session.cache_stats == \
+        {'fresh': 0, 'revalidated': 1, 'refetched': 2}
+
+
+def test_max_age(server, tmpdir):
+    from mptracker.scraper.httpcache import RevalidatingSession
+    url = server['url'] + '/pls/steno/evot.nominal?idv=1'
+    session = RevalidatingSession(str(tmpdir / 'cache.sqlite'))
+
+    assert session.get(url).content == b'first'
+    server['content'] = b'second'
+    assert session.get(url).content == b'first'
+    assert server['hits'] == 1
+    assert session.cache_stats['fresh'] == 1
+
+
+def test_streamed_page_is_stored_once_read(server, tmpdir):
+    from mptracker.scraper.httpcache import RevalidatingSession
+    from mptracker.scraper.archive import PageArchive
+    url = server['url'] + '/pls/proiecte/upl_pck.lista?cam=2'
+    session = RevalidatingSession(str(tmpdir / 'cache.sqlite'))
+    archive = PageArchive(str(tmpdir / 'archive'))
+    session.hooks['response'].append(archive.create_hook())
+
+    resp = session.get(url, hooks=session.hooks, stream=True)
+    assert not resp._content_consumed
+    assert archive.latest(url) is None
+    assert session.store.get(url) is None
+
+    assert b''.join(resp.iter_content(2)) == b'first'
+    assert archive.latest(url) == b'first'
+    assert session.store.get(url)['content'] == b'first'
+
+
+def test_cache_stats_from_threads(server, tmpdir):
+    from mptracker.scraper.httpcache import RevalidatingSession
+    url = server['url'] + '/pls/steno/evot.nominal?idv=1'
+    session = RevalidatingSession(str(tmpdir / 'cache.sqlite'))
+    session.get(url)
+
+    def fetch():
+        for _ in range(20):
+            session.get(url)
+
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.cache_stats['fresh'] == 80
+    assert server['hits'] == 1
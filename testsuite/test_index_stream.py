@@ -0,0 +1,120 @@
+from datetime import date
+import pytest
+from path import path
+
+QUESTION_URL = ('http://www.cdep.ro/pls/parlam/'
+                'interpelari.detalii?idi=%d&idl=1')
+PROPOSAL_URL = '/pls/proiecte/upl_pck.proiect?idp=%d&cam=2'
+
+
+def write_page(tmpdir, name, body):
+    page_path = path(str(tmpdir)) / name
+    page_path.write_bytes(('<html><body>%s</body></html>' % body)
+                          .encode('iso-8859-2'))
+    return page_path
+
+
+def test_question_index(session, tmpdir):
+    from mptracker.scraper.questions import QuestionScraper
+    rows = ''.join('<tr><td>%d</td><td><a href="%s">Întrebare</a></td></tr>'
+                   % (n, QUESTION_URL % n) for n in range(300))
+    session.url_map[QuestionScraper.index_url.format(year=2013)] = \
+        write_page(tmpdir, 'index', '<a href="/">home</a>'
+                   '<div id="pageContent"><table>%s</table></div>' % rows)
+
+    scraper = QuestionScraper(session=session)
+    scraper.stream_chunk_size = 100
+    urls = list(scraper.list_question_urls(2013))
+    assert len(urls) == 300
+    assert list(scraper.list_question_urls(2013, stream=True)) == urls
+
+
+def test_incremental_question_index(session, tmpdir):
+    from mptracker.scraper.questions import QuestionScraper
+    index_url = QuestionScraper.index_url.format(year=2013)
+    known = set(QUESTION_URL % n for n in range(250))
+    checked = []
+
+    def skip(url):
+        checked.append(url)
+        return url in known
+
+    def run(order):
+        rows = ''.join('<tr><td><a href="%s">%d</a></td></tr>'
+                       % (QUESTION_URL % n, n) for n in order)
+        session.url_map[index_url] = write_page(
+            tmpdir, 'index',
+            '<div id="pageContent"><table>%s</table></div>' % rows)
+        checked[:] = []
+        scraper = QuestionScraper(session=session, skip=skip)
+        scraper.get_question = lambda url: url
+        return list(scraper.run(2013, stream=True, incremental=True))
+
+    # newest first: stop at the first known question
+    assert run(range(299, -1, -1)) == \
+        [QUESTION_URL % n for n in range(299, 249, -1)]
+    assert len(checked) == 51
+
+    # any other order: check them all
+    order = [(n * 7) % 300 for n in range(300)]
+    assert run(order) == \
+        [QUESTION_URL % n for n in order if n >= 250]
+    assert len(checked) == 300
+
+
+def test_resumed_incremental_run(models_app, session, tmpdir):
+    from mptracker.scraper.questions import QuestionScraper
+    from mptracker.scraper.cursor import CrawlCursor
+    index_url = QuestionScraper.index_url.format(year=2013)
+    rows = ''.join('<tr><td><a href="%s">%d</a></td></tr>'
+                   % (QUESTION_URL % n, n) for n in range(299, -1, -1))
+    session.url_map[index_url] = write_page(
+        tmpdir, 'index',
+        '<div id="pageContent"><table>%s</table></div>' % rows)
+    # questions 0-99 were stored by an earlier run
+    stored = set(QUESTION_URL % n for n in range(100))
+
+    def run(crash_at=None):
+        cursor = CrawlCursor('get_questions', {'year': 2013})
+        scraper = QuestionScraper(session=session,
+                                  skip=lambda url: url in stored)
+
+        def get_question(url):
+            if url == crash_at:
+                raise RuntimeError("crash")
+            return url
+
+        scraper.get_question = get_question
+        fetched = []
+        for url in scraper.run(2013, incremental=True, cursor=cursor):
+            with cursor.unit(url):
+                stored.add(url)
+                fetched.append(url)
+        return fetched
+
+    with pytest.raises(RuntimeError):
+        run(crash_at=QUESTION_URL % 200)
+    assert len(stored) == 199
+
+    assert run() == [QUESTION_URL % n for n in range(200, 99, -1)]
+    assert stored == set(QUESTION_URL % n for n in range(300))
+
+
+def test_proposal_index(session, tmpdir):
+    from mptracker.scraper.proposals import ProposalScraper
+    rows = ''.join('<tr valign="top"><td>%d</td><td><a href="%s">PL-x</a>'
+                   '</td><td>Lege</td><td>Modificat %02d.03.2013</td></tr>'
+                   % (n, PROPOSAL_URL % n, n % 28 + 1) for n in range(300))
+    session.url_map[ProposalScraper.list_url.format(cam=2)] = \
+        write_page(tmpdir, 'lista', '<table><tr valign="top"><td>x</td>'
+                   '</tr></table><p align="center">Proiecte</p>'
+                   '<table>%s<tr valign="top"><td>1</td><td>'
+                   '<a href="%s">PL-x</a></td><td></td></tr></table>'
+                   % (rows, PROPOSAL_URL % 300))
+
+    scraper = ProposalScraper(session)
+    scraper.stream_chunk_size = 100
+    records = list(scraper.list_proposals(2))
+    assert len(records) == 300
+    assert records[5] == {'pk': 5, 'chamber': 2, 'date': date(2013, 3, 6)}
+    assert list(scraper.list_proposals(2, stream=True)) == records
@@ -0,0 +1,58 @@
+from pathlib import Path
+from mock import Mock
+from requests.utils import iter_slices
+
+PORTRAIT = b'\xff\xd8 portrait \xff\xd9'
+
+
+class PictureSession:
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers={}, stream=False):
+        self.requests.append((url, headers))
+        if headers.get('If-None-Match') == 'v1':
+            return Mock(status_code=304, headers={})
+        return Mock(
+            status_code=200,
+            headers={'Content-Type': 'image/jpeg', 'ETag': 'v1'},
+            iter_content=lambda n: iter_slices(PORTRAIT, n),
+        )
+
+
+def fake_thumbnails(orig_path, out_dir, slug):
+    from mptracker.scraper.pictures import thumbnail_names
+    for by_format in thumbnail_names(slug).values():
+        for name in by_format.values():
+            (out_dir / name).write_bytes(orig_path.read_bytes())
+
+
+def test_update_pictures(tmpdir, monkeypatch):
+    from mptracker.scraper import pictures
+    monkeypatch.setattr(pictures, 'make_thumbnails', fake_thumbnails)
+    pictures_dir = Path(str(tmpdir)) / 'pictures'
+    http_session = PictureSession()
+    portraits = [('pop-ion', 'http://www.cdep.ro/parlam/ion.jpg'),
+                 ('ion-ana', 'http://www.cdep.ro/parlam/ana.jpg')]
+
+    manifest = pictures.update_pictures(portraits, pictures_dir,
+                                        http_session, workers=2)
+    assert sorted(manifest) == ['ion-ana', 'pop-ion']
+    assert manifest['pop-ion']['sizes']['60']['webp'] == 'pop-ion-60.webp'
+    assert (pictures_dir / 'ion-ana-150.jpg').read_bytes() == PORTRAIT
+    assert pictures.load_manifest(pictures_dir) == manifest
+
+    # the second run sends the etag and doesn't convert anything
+    monkeypatch.setattr(pictures, 'make_thumbnails', None)
+    assert pictures.update_pictures(portraits, pictures_dir,
+                                    http_session) == manifest
+    assert http_session.requests[-1][1] == {'If-None-Match': 'v1'}
+
+
+def test_convert_args():
+    from mptracker.scraper.pictures import convert_args
+    args = convert_args(Path('orig.jpg'), Path('out'), 'pop-ion')
+    assert args[:2] == ['convert', 'orig.jpg']
+    assert args.count('-write') == 6
+    assert 'out/pop-ion-60.webp' in args
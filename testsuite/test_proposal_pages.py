@@ -0,0 +1,41 @@
+import pickle
+from path import path
+
+PAGES_DIR = path(__file__).abspath().parent / 'pages'
+PROPOSAL_URL = ('http://www.cdep.ro/pls/proiecte/upl_pck.proiect'
+                '?idp=%d&cam=%d')
+
+
+def test_scrape_proposal_pages(session):
+    from mptracker.scraper.proposals import ProposalScraper
+    keys = [(2, 13037), (2, 13330), (2, 13348), (2, 99999)]
+    for (chamber, pk) in keys[:3]:
+        session.url_map[PROPOSAL_URL % (pk, chamber)] = \
+            PAGES_DIR / ('proposal-%d-%d' % (chamber, pk))
+
+    serial = list(ProposalScraper(session).scrape_proposal_pages(keys))
+    parallel = list(ProposalScraper(session, workers=3)
+                    .scrape_proposal_pages(keys))
+    assert [r[:2] for r in parallel] == keys
+    assert ([pickle.dumps(r[2]) for r in parallel] ==
+            [pickle.dumps(r[2]) for r in serial])
+    assert parallel[0][2]['pk_cdep'] == 13037
+    assert parallel[0][3] is None
+    assert isinstance(parallel[3][3], KeyError)
+
+
+def test_save_proposal_pages_in_batches(models_app):
+    from mptracker import models
+    from mptracker.scraper import _save_proposal_pages
+    results = [(2, pk, {'pk_cdep': pk}, None) for pk in range(5)]
+    _save_proposal_pages(results, batch_size=2)
+    _save_proposal_pages([
+        (2, 0, {'pk_cdep': 0, 'title': "new"}, None),
+        (2, 1, None, None),
+        (2, 2, None, ValueError()),
+    ])
+
+    rows = {row.pk: row for row in models.ScrapedProposalPage.query}
+    assert sorted(rows) == [0, 2, 3, 4]
+    assert pickle.loads(rows[0].result)['title'] == "new"
+    assert rows[3].parsed is False
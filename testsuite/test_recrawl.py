@@ -0,0 +1,90 @@
+import hashlib
+from datetime import datetime, timedelta
+from mock import Mock
+
+
+def page_row(first_fetch, last_fetch, change_count):
+    return Mock(first_fetch=first_fetch, last_fetch=last_fetch,
+                change_count=change_count)
+
+
+def test_change_probability():
+    from mptracker.scraper.recrawl import change_probability
+    now = datetime(2016, 3, 1)
+    week_ago = now - timedelta(days=7)
+    year_ago = now - timedelta(days=365)
+    volatile = page_row(year_ago, week_ago, 30)
+    settled = page_row(year_ago, week_ago, 0)
+    fresh = page_row(year_ago, now, 30)
+
+    p_volatile = change_probability(volatile, 1 / 365, now)
+    p_settled = change_probability(settled, 1 / 365, now)
+    assert p_volatile > p_settled > 0
+    assert change_probability(fresh, 1 / 365, now) == 0
+    assert change_probability(None, 1 / 14, now) > \
+        change_probability(None, 1 / 365, now)
+
+
+def test_page_tracker():
+    from mptracker.scraper.recrawl import PageTracker, page_kind
+    question_url = ('http://www.cdep.ro/pls/parlam/'
+                    'interpelari.detalii?idi=1&idl=1')
+    tracker = PageTracker()
+    tracker(Mock(url=question_url, history=[], status_code=200,
+                 content=b'x', from_cache=False))
+    tracker(Mock(url='http://www.cdep.ro/pls/steno/evot.data?dat=20130610',
+                 history=[], status_code=200, content=b'x', from_cache=True))
+    tracker(Mock(url='http://www.cdep.ro/pls/parlam/structura.mp?idm=1',
+                 history=[], status_code=200, content=b'x', from_cache=False))
+    assert list(tracker.seen) == [question_url]
+    assert tracker.seen[question_url][0] == 'question'
+    assert page_kind('http://www.cdep.ro/pls/proiecte/'
+                     'upl_pck.proiect?idp=1&cam=2') == 'proposal'
+
+
+def test_page_tracker_hashes_streamed_page():
+    import io
+    import requests
+    from mptracker.scraper.recrawl import PageTracker
+    question_url = ('http://www.cdep.ro/pls/parlam/'
+                    'interpelari.detalii?idi=1&idl=1')
+    response = requests.Response()
+    response.url = question_url
+    response.status_code = 200
+    response.raw = io.BytesIO(b'question page')
+    tracker = PageTracker()
+    tracker(response)
+    assert not response._content_consumed
+    assert tracker.seen == {}
+
+    assert b''.join(response.iter_content(4)) == b'question page'
+    [(kind, content_hash, _)] = tracker.seen.values()
+    assert kind == 'question'
+    assert content_hash == hashlib.sha1(b'question page').hexdigest()
+
+
+def test_plan(models_app):
+    from mptracker import models
+    from mptracker.scraper.recrawl import plan
+    url = ('http://www.cdep.ro/pls/parlam/'
+           'interpelari.detalii?idi=%d&idl=1')
+    models.db.session.execute(
+        models.Question.__table__.insert(),
+        [{'id': 'q%d' % n, 'url': url % n} for n in range(3)],
+    )
+    models.db.session.execute(
+        models.Answer.__table__.insert(),
+        [{'id': 'a0', 'question_id': 'q0'}],
+    )
+    now = datetime(2016, 3, 1)
+    models.db.session.add(models.CrawlPage(
+        url=url % 1, kind='question', first_fetch=now - timedelta(days=90),
+        last_fetch=now, fetch_count=3, change_count=0))
+    models.db.session.commit()
+
+    work_list = plan(2, vote_days=0, now=now)
+    assert [item_url for (_, _, item_url) in work_list] == \
+        [url % 2, url % 0]
+    priority = {row.url: row.priority for row in models.CrawlPage.query}
+    assert priority[url % 1] is None
+    assert priority[url % 2] > priority[url % 0] > 0
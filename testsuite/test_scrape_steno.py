@@ -1,4 +1,5 @@
 from datetime import date
+import pytest
 from path import path
 
 
@@ -63,3 +64,137 @@ def test_2013_06_10(session):
     assert paragraphs[0]['serial'] == '07277/01-001'
     paragraph_serial_values = [p['serial'] for p in paragraphs]
     assert sorted(set(paragraph_serial_values)) == paragraph_serial_values
+
+
+def test_streaming_matches_serial(session):
+    from types import GeneratorType
+    from mptracker.scraper.transcripts import TranscriptScraper
+    TRANSCRIPT_URL = 'http://www.cdep.ro/pls/steno/'
+    session.url_map[TRANSCRIPT_URL + 'steno.sumar?ids=7277'] = \
+        PAGES_DIR / 'steno.sumar-7277'
+    for n in range(1, 13):
+        url = TRANSCRIPT_URL + 'steno.stenograma?ids=7277&idm=%d&idl=1' % n
+        session.url_map[url] = PAGES_DIR / ('steno.stenograma-7277-%d' % n)
+
+    scraper = TranscriptScraper(session)
+    expected = [
+        (c.serial, c.headline, c.paragraphs)
+        for c in scraper.fetch_session(7277).chapters
+    ]
+
+    transcript_session = scraper.fetch_session(7277, stream=True)
+    assert isinstance(transcript_session.chapters, GeneratorType)
+    streamed = []
+    for transcript_chapter in transcript_session.chapters:
+        assert isinstance(transcript_chapter.paragraphs, GeneratorType)
+        streamed.append((transcript_chapter.serial,
+                         transcript_chapter.headline,
+                         list(transcript_chapter.paragraphs)))
+    assert streamed == expected
+
+
+def test_pipeline_matches_serial(session):
+    from mptracker.scraper.transcripts import TranscriptScraper
+    TRANSCRIPT_URL = 'http://www.cdep.ro/pls/steno/'
+    session.url_map[TRANSCRIPT_URL + 'steno.sumar?ids=7277'] = \
+        PAGES_DIR / 'steno.sumar-7277'
+    for n in range(1, 13):
+        url = TRANSCRIPT_URL + 'steno.stenograma?ids=7277&idm=%d&idl=1' % n
+        session.url_map[url] = PAGES_DIR / ('steno.stenograma-7277-%d' % n)
+
+    scraper = TranscriptScraper(session)
+    expected = [
+        (c.serial, c.headline, c.paragraphs)
+        for c in scraper.fetch_session(7277).chapters
+    ]
+
+    scraper.processes = 2
+    transcript_session = scraper.fetch_session_pipeline(7277)
+    scraper.close()
+    assert [
+        (c.serial, c.headline, c.paragraphs)
+        for c in transcript_session.chapters
+    ] == expected
+
+
+@pytest.fixture
+def steno_server(request):
+    """ Local HTTP stand-in for cdep.ro that serves the recorded pages """
+    import threading
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            qs = parse_qs(url.query)
+            name = url.path.split('/')[-1] + '-' + qs['ids'][0]
+            if 'idm' in qs:
+                name += '-' + qs['idm'][0]
+            page_path = PAGES_DIR / name
+            if not page_path.isfile():
+                self.send_error(404)
+                return
+            content = page_path.bytes()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    request.addfinalizer(server.shutdown)
+    return 'http://127.0.0.1:%d' % server.server_port
+
+
+def test_async_matches_serial(session, steno_server):
+    import requests
+    from mptracker.scraper.transcripts import TranscriptScraper
+
+    def dump(transcript_session):
+        return [
+            (c.serial, c.headline,
+             [(p['serial'], p['mandate_number'], p['text'])
+              for p in c.paragraphs])
+            for c in transcript_session.chapters
+        ]
+
+    class LocalTranscriptScraper(TranscriptScraper):
+        session_url = steno_server + '/pls/steno/steno.sumar?ids=%d'
+
+    scraper = LocalTranscriptScraper(requests.Session())
+    expected = dump(scraper.fetch_session(7277))
+
+    scraper = LocalTranscriptScraper(requests.Session())
+    [transcript_session, again] = \
+        list(scraper.fetch_sessions([7277, 7277], max_in_flight=4))
+
+    assert transcript_session.date == date(2013, 6, 10)
+    assert dump(transcript_session) == expected
+    assert dump(again) == expected
+
+
+def test_fetch_sessions_is_bounded():
+    from mptracker.scraper.transcripts import TranscriptScraper
+    started = []
+
+    class CountingScraper(TranscriptScraper):
+
+        async def fetch_session_async(self, cdeppk, fetcher):
+            started.append(cdeppk)
+            return cdeppk
+
+    sessions = CountingScraper().fetch_sessions(range(10), max_in_flight=3)
+    assert next(sessions) == 0
+    assert started == [0, 1, 2]
+    assert list(sessions) == list(range(1, 10))
+
+    sessions = CountingScraper().fetch_sessions(range(10), max_in_flight=3)
+    next(sessions)
+    sessions.close()
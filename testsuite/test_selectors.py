@@ -0,0 +1,89 @@
+from pyquery import PyQuery as pq
+from path import path
+import pytest
+
+PAGES_DIR = path(__file__).abspath().parent / 'pages'
+
+VOTE_PAGE = """\
+<html><body><div id="pageContent"><table>
+<tr><td>Subiect vot:</td><td>Vot final <b>PL-x 1/2013</b>
+  <a target="PROIECTE" href="/pls/proiecte/upl_pck.proiect?idp=13">x</a>
+  <!-- comment --> tail</td></tr>
+</table><table>
+<tr><td>Nr. Crt.</td><td>Nume</td><td>Vot</td></tr>
+<tr><td>1</td><td><a
+  href="/pls/parlam/structura.mp?idm=1&amp;cam=2&amp;leg=2012">Pop Ion</a></td>
+  <td>DA</td></tr>
+<tr><td>2</td><td><a
+  href="/pls/parlam/structura.mp?idm=2&amp;cam=2&amp;leg=2012">Ion Ana</a></td>
+  <td>Abţinere</td></tr>
+</table></div></body></html>
+"""
+
+
+def load(file_name):
+    from mptracker.scraper.common import Scraper
+    return Scraper().load_page((PAGES_DIR / file_name).bytes(),
+                               'http://www.cdep.ro/pls/')
+
+
+@pytest.mark.parametrize(('file_name', 'text'), [
+    ('steno.sumar-7277', "Sunteţi în secţiunea"),
+    ('proposal-2-13348', "Nr. înregistrare"),
+    ('proposal-2-13348', "Derularea procedurii legislative"),
+    ('proposal-1-17003', "Derularea procedurii legislative"),
+])
+def test_selectors_match_pyquery(file_name, text):
+    from mptracker.scraper.common import (find_containing, ancestors,
+                                          text_content, inner_html)
+    page = load(file_name)
+    expected = page.find(':contains("%s")' % text)
+    found = find_containing(page[0], text)
+    assert found and list(expected) == found
+    assert list(expected.parents('table')) == ancestors(found, 'table')
+    assert expected.parent().text() == \
+        text_content(*[el.getparent() for el in found])
+    for el in ancestors(found, 'td'):
+        assert pq(el).text() == text_content(el)
+        assert pq(el).html() == inner_html(el)
+
+
+def test_parse_vote():
+    from mptracker.scraper.votes import VoteScraper
+    scraper = VoteScraper()
+    page = scraper.load_page(VOTE_PAGE.encode('iso-8859-2'),
+                             'http://www.cdep.ro/pls/steno/evot.nominal?idv=5')
+    voting_session = scraper.parse_vote(5, page)
+    subject_td = pq(page)('td').eq(1)
+    assert voting_session.subject == subject_td.text()
+    assert voting_session.subject_html == subject_td.html()
+    assert voting_session.proposal_cdeppk == 13
+    assert [(v.mandate_number, v.mandate_name, v.choice)
+            for v in voting_session.votes] == \
+        [(1, "Pop Ion", 'yes'), (2, "Ion Ana", 'abstain')]
+
+
+@pytest.mark.parametrize('html', [
+    '', '  ', 'plain', '\n  lead <a href="javascript:x()">y</a> end',
+    '&nbsp;<b>x</b>', ' <a href="x">y</a> ', '<b>x</b> tail',
+    ' <b>x</b><i>y</i>&nbsp;', 'x<div>y</div>z', '&amp;&lt;x',
+    '<font color="red">a</font><br>b <!-- c -->',
+])
+def test_sanitizer_matches_sanitize(html):
+    from lxml.html import fromstring
+    from mptracker.scraper.common import Sanitizer, sanitize
+    td = fromstring('<table><tr><td>%s</td></tr></table>' % html) \
+        .find('.//td')
+    inner_html = pq(td).html()
+    expected = sanitize(inner_html) if inner_html else None
+    assert Sanitizer().clean_element(td) == expected
+
+
+def test_sanitizer_on_proposal_pages():
+    from mptracker.scraper.common import Sanitizer, sanitize
+    sanitizer = Sanitizer()
+    for page_path in PAGES_DIR.files('proposal-[12]-*'):
+        cells = load(page_path.name)('td')
+        expected = [sanitize(pq(td).html() or ' ') for td in cells]
+        assert [html or '' for html in sanitizer.clean_elements(cells)] == \
+            expected
@@ -0,0 +1,71 @@
+from mock import Mock
+
+
+class Sheets(dict):
+    """ Spreadsheet key -> (content, etag) """
+
+
+def test_unchanged_sheets_are_skipped(models_app, monkeypatch):
+    from mptracker import models
+    from mptracker.scraper.sheets import SheetImport
+    store = Sheets(a=(b'slug,name\nx,X\n', '"1"'), b=(b'id\nfoo\n', None))
+    store.requests = []
+
+    def fetch_gdrive_csv(key, headers=None):
+        store.requests.append((key, headers))
+        (content, etag) = store[key]
+        if etag and headers and headers.get('If-None-Match') == etag:
+            return Mock(status_code=304, content=b'', headers={})
+        return Mock(status_code=200, content=content,
+                    headers={'ETag': etag} if etag else {})
+
+    monkeypatch.setattr('mptracker.scraper.sheets.fetch_gdrive_csv',
+                        fetch_gdrive_csv)
+
+    first = SheetImport('test', ['a', 'b'])
+    assert first.changed
+    assert list(first.reader('a')) == [{'slug': 'x', 'name': 'X'}]
+    first.save()
+    models.db.session.commit()
+
+    # `a` answers 304, `b` is byte-identical
+    store.requests[:] = []
+    again = SheetImport('test', ['a', 'b'])
+    assert not again.changed
+    assert store.requests == [('a', {'If-None-Match': '"1"'}), ('b', {})]
+
+    # `b` changed, so `a` is downloaded again for the import
+    store['b'] = (b'id\nfoo\nbar\n', None)
+    store.requests[:] = []
+    changed = SheetImport('test', ['a', 'b'])
+    assert changed.changed
+    assert [row['name'] for row in changed.reader('a')] == ['X']
+    assert store.requests[-1] == ('a', {})
+
+    assert SheetImport('test', ['a'], force=True).changed
+
+
+def test_committee_attendance_skips_unchanged_sheet(models_app, monkeypatch):
+    from mptracker import models
+    from mptracker import scraper
+    from mptracker.scraper.common import csv_reader
+    content = b'Nume,Comisia Permanenta 1,Comisia Permanenta 2\n'
+    monkeypatch.setattr(
+        'mptracker.scraper.sheets.fetch_gdrive_csv',
+        lambda key, headers=None: Mock(status_code=200, content=content,
+                                       headers={}))
+    reads = []
+
+    def read(content):
+        reads.append(content)
+        return csv_reader(content)
+
+    monkeypatch.setattr('mptracker.scraper.sheets.csv_reader', read)
+
+    scraper.get_committee_attendance()
+    assert reads == [content]
+    [sheet] = models.GdriveSheet.query.all()
+    assert sheet.key == scraper.COMMITTEE_ROLL_CALL_CSV_KEY
+
+    scraper.get_committee_attendance()
+    assert reads == [content]
@@ -39,3 +39,25 @@ def test_double_header():
     assert len(rows) == 3
 
     assert rows[1].text("Membru al comisiei | până în data") == "08.10.2013"
+
+
+def test_columns():
+    from mptracker.scraper.common import (TableParser, ProfileIdent, column,
+                                          cell_date, cell_profile)
+    table_html = (PAGES_DIR / 'table_ppdd_members.html').text()
+    table = TableParser(table_html)
+    columns = table.columns(
+        role=column("Funcţia", inherit=True),
+        person=column("Nume", cell_profile),
+        start=column("Membru din", cell_date('ro_short_month')),
+        missing=column("foo bar"),
+    )
+    assert len(columns['role']) == 24
+    assert columns['role'][3] == "Secretari"
+    assert columns['role'][8] == "Membri"
+    assert columns['person'][3] == \
+        ("Mincă Liliana", ProfileIdent(2012, 2, 221))
+    assert columns['start'][3] is None
+    assert columns['missing'] == [""] * 24
+    assert [row.text("Funcţia", inherit=True) for row in table] == \
+        columns['role']
@@ -0,0 +1,46 @@
+from path import path
+
+PAGES_DIR = path(__file__).abspath().parent / 'pages'
+STENO_URL = 'http://www.cdep.ro/pls/steno/'
+
+
+def test_telemetry_per_url_pattern(tmpdir):
+    from mptracker.scraper.archive import PageArchive, ReplaySession
+    from mptracker.scraper.common import Scraper
+    from mptracker.scraper.telemetry import Telemetry
+    archive = PageArchive(str(tmpdir))
+    sumar_url = STENO_URL + 'steno.sumar?ids=7277'
+    archive.save(sumar_url, (PAGES_DIR / 'steno.sumar-7277').bytes())
+    for n in [1, 2]:
+        url = STENO_URL + 'steno.stenograma?ids=7277&idm=%d' % n
+        archive.save(url, (PAGES_DIR / ('steno.stenograma-7277-%d' % n))
+                          .bytes())
+
+    session = ReplaySession(archive)
+    session.telemetry = Telemetry()
+    session.hooks['response'].append(session.telemetry.create_hook())
+    scraper = Scraper(session)
+    scraper.fetch_url(sumar_url)
+    scraper.fetch_url(STENO_URL + 'steno.stenograma?ids=7277&idm=1')
+    scraper.fetch_url(STENO_URL + 'steno.stenograma?ids=7277&idm=2')
+    session.telemetry.record_throttle(sumar_url, 0.5)
+
+    stats = session.telemetry.as_dict()
+    assert sorted(stats) == ['steno.stenograma', 'steno.sumar']
+    assert stats['steno.stenograma']['requests'] == 2
+    assert stats['steno.stenograma']['cache_hits'] == 2
+    assert stats['steno.stenograma']['status'] == {'200': 2}
+    assert stats['steno.stenograma']['pages_parsed'] == 2
+    assert stats['steno.sumar']['bytes'] == \
+        (PAGES_DIR / 'steno.sumar-7277').size
+    assert stats['steno.sumar']['throttle_time'] == 0.5
+
+    session.telemetry.save(str(tmpdir / 'telemetry.json'))
+    assert 'steno.sumar' in (tmpdir / 'telemetry.json').read()
+
+
+def test_latency_bucket():
+    from mptracker.scraper.telemetry import latency_bucket
+    assert latency_bucket(0.01) == '<=50'
+    assert latency_bucket(0.3) == '<=500'
+    assert latency_bucket(60) == '>10000'